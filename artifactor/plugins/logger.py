@@ -13,6 +13,7 @@ artifactor:
 """
 import os
 from logging import makeLogRecord
+import six
 from artifactor import ArtifactorBasePlugin
 from cfme.utils.log import make_file_handler
 
@@ -29,6 +30,7 @@ class Logger(ArtifactorBasePlugin):
         self.register_plugin_hook('start_test', self.start_test)
         self.register_plugin_hook('finish_test', self.finish_test)
         self.register_plugin_hook('log_message', self.log_message)
+        self.register_plugin_hook('log_messages', self.log_messages)
 
     def configure(self):
         self.configured = True
@@ -67,13 +69,45 @@ class Logger(ArtifactorBasePlugin):
 
     @ArtifactorBasePlugin.check_configured
     def log_message(self, log_record, slaveid):
-        # json transport fallout: args must be a dict or a tuple, json makes a tuple into a list
-        args = log_record['args']
-        log_record['args'] = tuple(args) if isinstance(args, list) else args
-        record = makeLogRecord(log_record)
+        self._write([log_record], slaveid)
+
+    @ArtifactorBasePlugin.check_configured
+    def log_messages(self, log_records, slaveid):
+        """Writes a batch of records shipped by :py:class:`cfme.utils.log.ArtifactorHandler`"""
+        self._write(log_records, slaveid)
+
+    def _write(self, log_records, slaveid):
         if not slaveid:
             slaveid = "Master"
-        if slaveid in self.store:
-            handler = self.store[slaveid].handler
-            if handler and record.levelno >= handler.level:
-                handler.handle(record)
+        if slaveid not in self.store:
+            return
+        handler = self.store[slaveid].handler
+        if not handler:
+            return
+        lines = []
+        for log_record in log_records:
+            if log_record['levelno'] < handler.level:
+                continue
+            # json transport fallout: args must be a dict or a tuple, json makes a tuple
+            # into a list
+            args = log_record['args']
+            log_record['args'] = tuple(args) if isinstance(args, list) else args
+            record = makeLogRecord(log_record)
+            if not handler.filter(record):
+                continue
+            try:
+                lines.append(handler.format(record))
+            except Exception:
+                handler.handleError(record)
+        if not lines:
+            return
+        text = u'\n'.join(lines) + u'\n'
+        if six.PY2 and not handler.encoding:
+            text = text.encode('utf-8')
+        # one write and flush of the file per batch instead of one per record
+        handler.acquire()
+        try:
+            handler.stream.write(text)
+            handler.flush()
+        finally:
+            handler.release()
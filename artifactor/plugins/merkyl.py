@@ -10,6 +10,7 @@ artifactor:
             enabled: False
             plugin: merkyl
             port: 8192
+            reset_size: 10485760
             log_files:
                 - /var/www/miq/vmdb/log/evm.log
                 - /var/www/miq/vmdb/log/production.log
@@ -17,11 +18,24 @@ artifactor:
 """
 
 from artifactor import ArtifactorBasePlugin
+from collections import Counter
+from six.moves.queue import Queue
+from threading import Condition, Thread
 import os.path
 import requests
+import time
 
 
 class Merkyl(ArtifactorBasePlugin):
+    """Captures the appliance logs of every test
+
+    The start and end of every test are recorded as offsets of the logs captured by merkyl, the
+    data between them is fetched in a background thread in one compressed request. A capture
+    larger than ``reset_size`` bytes is reset at the start of a test, after the pending fetches
+    of the appliance, so that the files of merkyl do not grow all session. Merkyl deployed before
+    the offsets were supported is reset at the start of every test instead and its logs are
+    fetched one by one.
+    """
 
     class Test(object):
         def __init__(self, ident, ip, port):
@@ -30,11 +44,16 @@ class Merkyl(ArtifactorBasePlugin):
             self.port = port
             self.in_progress = False
             self.extra_files = set()
+            # name -> offset at the start, None when merkyl does not support offsets
+            self.offsets = None
+            # seconds spent on the test's path
+            self.overhead = 0.0
 
     def plugin_initialize(self):
         self.register_plugin_hook('setup_merkyl', self.start_session)
         self.register_plugin_hook('start_test', self.start_test)
         self.register_plugin_hook('finish_test', self.finish_test)
+        self.register_plugin_hook('flush_merkyl', self.flush)
         self.register_plugin_hook('teardown_merkyl', self.finish_session)
         self.register_plugin_hook('get_log_merkyl', self.get_log)
         self.register_plugin_hook('add_log_merkyl', self.add_log)
@@ -42,9 +61,41 @@ class Merkyl(ArtifactorBasePlugin):
     def configure(self):
         self.files = self.data.get('log_files', [])
         self.port = self.data.get('port', '8192')
+        self.reset_size = int(self.data.get('reset_size', 10 * 1024 * 1024))
         self.tests = {}
+        # ip -> names of the extra files being captured
+        self.extra_files = {}
+        self.stats = {'tests': 0, 'overhead': 0.0, 'fetching': 0.0, 'bytes': 0}
+        # Keeps the connections to the appliances alive between the requests
+        self.session = requests.Session()
+        self.fetches = Queue()
+        # ip -> number of the fetches not done yet
+        self.pending = Counter()
+        self.fetched = Condition()
+        fetcher = Thread(target=self._fetch_loop, name='merkyl-fetcher')
+        fetcher.daemon = True
+        fetcher.start()
         self.configured = True
 
+    def _get(self, ip, path):
+        return self.session.get("http://{}:{}/{}".format(ip, self.port, path), timeout=15)
+
+    def _offsets(self, ip):
+        """Returns {name: offset} of the captured logs, None if merkyl does not support it"""
+        response = self._get(ip, 'offsets')
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def _delta(self, ip, ranges):
+        """Returns {name: data} of the logs between the offsets, {name: [start, end]}"""
+        response = self.session.post(
+            "http://{}:{}/delta".format(ip, self.port), json=ranges, timeout=60)
+        response.raise_for_status()
+        # The data is sent decoded as latin-1 so that no byte is lost
+        return {name: data.encode('latin-1') for name, data in response.json().items()}
+
     @ArtifactorBasePlugin.check_configured
     def start_test(self, test_name, test_location, ip):
         test_ident = "{}/{}".format(test_location, test_name)
@@ -54,71 +105,159 @@ class Merkyl(ArtifactorBasePlugin):
                 return None
         else:
             self.tests[test_ident] = self.Test(test_ident, ip, self.port)
-        url = "http://{}:{}/resetall".format(ip, self.port)
-        requests.get(url, timeout=15)
+        start = time.time()
+        test = self.tests[test_ident]
+        test.offsets = self._offsets(ip)
+        if test.offsets is None:
+            self._get(ip, 'resetall')
+        else:
+            self._reset_large(test)
+        test.overhead += time.time() - start
 
-        self.tests[test_ident].in_progress = True
+        test.in_progress = True
+
+    def _reset_large(self, test):
+        """Resets the captures over the reset size, the test then starts at their beginning
+
+        The offsets of the pending fetches and of the other tests in progress on the appliance
+        point into the current captures, so the fetches are waited for and the captures are not
+        reset while another test runs.
+        """
+        large = [name for name, offset in test.offsets.items() if offset > self.reset_size]
+        if not large or any(
+                other.ip == test.ip and other.in_progress for other in self.tests.values()):
+            return
+        with self.fetched:
+            while self.pending[test.ip]:
+                self.fetched.wait()
+        for name in large:
+            self._get(test.ip, 'reset/{}'.format(name))
+            test.offsets[name] = 0
 
     @ArtifactorBasePlugin.check_configured
     def get_log(self, test_name, test_location, filename):
         test_ident = "{}/{}".format(test_location, test_name)
-        ip = self.tests[test_ident].ip
+        test = self.tests[test_ident]
 
         base, tail = os.path.split(filename)
-        url = "http://{}:{}/get/{}".format(ip, self.port, tail)
-        doc = requests.get(url, timeout=15)
-        content = doc.content
+        if test.offsets is not None:
+            content = self._delta(test.ip, {tail: [test.offsets.get(tail, 0), None]}).get(tail, '')
+        else:
+            content = self._get(test.ip, 'get/{}'.format(tail)).content
         return {'merkyl_content': content}, None
 
     @ArtifactorBasePlugin.check_configured
     def add_log(self, test_name, test_location, filename):
         test_ident = "{}/{}".format(test_location, test_name)
-        ip = self.tests[test_ident].ip
+        test = self.tests[test_ident]
+        ip = test.ip
 
-        if filename not in self.files:
-            if filename not in self.tests[test_ident].extra_files:
-                self.tests[test_ident].extra_files.add(filename)
-                url = "http://{}:{}/setup{}".format(ip, self.port, filename)
-                requests.get(url, timeout=15)
+        if filename in self.files or filename in test.extra_files:
+            return
+        start = time.time()
+        test.extra_files.add(filename)
+        _, tail = os.path.split(filename)
+        if test.offsets is None:
+            self._get(ip, 'setup{}'.format(filename))
+        elif tail in self.extra_files.get(ip, set()):
+            # Still captured since an earlier test
+            test.offsets[tail] = self._offsets(ip).get(tail, 0)
+        else:
+            self._get(ip, 'setup{}'.format(filename))
+            self.extra_files.setdefault(ip, set()).add(tail)
+            test.offsets[tail] = 0
+        test.overhead += time.time() - start
 
     @ArtifactorBasePlugin.check_configured
     def finish_test(self, artifact_path, test_name, test_location, ip, slaveid):
         test_ident = "{}/{}".format(test_location, test_name)
-        artifacts = []
-        for filename in self.files:
-            _, tail = os.path.split(filename)
-            url = "http://{}:{}/get/{}".format(ip, self.port, tail)
-            doc = requests.get(url, timeout=15)
-            artifacts.append((tail, doc.content))
-
-        for filename in self.tests[test_ident].extra_files:
-            _, tail = os.path.split(filename)
-            url = "http://{}:{}/get/{}".format(ip, self.port, tail)
-            doc = requests.get(url, timeout=15)
-            artifacts.append((tail, doc.content))
-
-            url = "http://{}:{}/delete/{}".format(ip, self.port, tail)
-            requests.get(url, timeout=15)
-
-        del self.tests[test_ident]
-        for filename, contents in artifacts:
+        start = time.time()
+        test = self.tests.pop(test_ident)
+        names = [os.path.split(filename)[1] for filename in self.files]
+        names.extend(os.path.split(filename)[1] for filename in sorted(test.extra_files))
+        ranges = None
+        if test.offsets is not None:
+            # Fixing the end of the test is one small request, the data is fetched later
+            end = self._offsets(ip)
+            ranges = {name: [test.offsets.get(name, 0), end[name]] for name in names
+                      if name in end}
+        test.overhead += time.time() - start
+        job = (test, ranges, names, test_location, test_name, slaveid)
+        if ranges is None:
+            # The capture is reset by the next test, so it has to be fetched now
+            self._fetch(*job)
+        else:
+            with self.fetched:
+                self.pending[test.ip] += 1
+            self.fetches.put(job)
+        return None, None
+
+    def _fetch_loop(self):
+        while True:
+            job = self.fetches.get()
+            try:
+                self._fetch(*job)
+            except Exception as e:
+                self._rigger_instance.log_message(
+                    "Merkyl: fetching the logs of {} failed: {}".format(job[0].ident, e))
+            finally:
+                with self.fetched:
+                    self.pending[job[0].ip] -= 1
+                    self.fetched.notify_all()
+                self.fetches.task_done()
+
+    def _fetch(self, test, ranges, names, test_location, test_name, slaveid):
+        start = time.time()
+        if ranges is not None:
+            contents = self._delta(test.ip, ranges)
+        else:
+            contents = {}
+            for name in names:
+                contents[name] = self._get(test.ip, 'get/{}'.format(name)).content
+            for filename in test.extra_files:
+                _, tail = os.path.split(filename)
+                self._get(test.ip, 'delete/{}'.format(tail))
+        fetching = time.time() - start
+        size = sum(len(data) for data in contents.values())
+        self.stats['tests'] += 1
+        self.stats['overhead'] += test.overhead
+        self.stats['fetching'] += fetching
+        self.stats['bytes'] += size
+        self._rigger_instance.log_message(
+            "Merkyl: {} took {:.3f}s on the test path, {} bytes fetched in {:.3f}s".format(
+                test.ident, test.overhead, size, fetching))
+
+        for filename in names:
+            if filename not in contents:
+                continue
             self.fire_hook('filedump', test_location=test_location, test_name=test_name,
                 description="Merkyl: {}".format(filename), slaveid=slaveid,
-                contents=contents, file_type="log", display_type="danger",
+                contents=contents[filename], file_type="log", display_type="danger",
                 display_glyph="align-justify", group_id="merkyl")
-        return None, None
+
+    @ArtifactorBasePlugin.check_configured
+    def flush(self):
+        """Waits for the logs of the finished tests to be fetched"""
+        self.fetches.join()
+        tests = self.stats['tests']
+        if tests:
+            self._rigger_instance.log_message(
+                "Merkyl: {} tests, {:.3f}s per test on the test path, {:.3f}s and {} bytes per "
+                "test fetched in the background".format(
+                    tests, self.stats['overhead'] / tests, self.stats['fetching'] / tests,
+                    self.stats['bytes'] // tests))
 
     @ArtifactorBasePlugin.check_configured
     def start_session(self, ip):
         """Session started"""
         for file_name in self.files:
-            url = "http://{}:{}/setup{}".format(ip, self.port, file_name)
-            requests.get(url, timeout=15)
+            self._get(ip, 'setup{}'.format(file_name))
 
     @ArtifactorBasePlugin.check_configured
     def finish_session(self, ip):
         """Session finished"""
-        for filename in self.files:
-            base, tail = os.path.split(filename)
-            url = "http://{}:{}/delete/{}".format(ip, self.port, tail)
-            requests.get(url, timeout=15)
+        self.flush()
+        tails = [os.path.split(filename)[1] for filename in self.files]
+        tails.extend(self.extra_files.pop(ip, ()))
+        for tail in tails:
+            self._get(ip, 'delete/{}'.format(tail))
@@ -11,11 +11,24 @@ artifactor:
             plugin: video
             quality: 10
             display: ":99"
+            mode: session  # session, test
+            keep: failed  # failed, all
+            displays:  # optional, per slave displays
+                gw0: ":100"
+
+In the ``session`` mode, one ffmpeg process per display records the whole session and the clips
+of the tests are cut out of the recording afterwards, only for the failed tests unless ``keep`` is
+``all``. The recording is removed at the end of the session unless ``keep_session`` is set. If
+ffmpeg is not installed, the ``test`` mode is used, recording every test with recordmydesktop.
 """
 
 from artifactor import ArtifactorBasePlugin
+from distutils.spawn import find_executable
+from threading import RLock
 import os
-from cfme.utils.video import Recorder
+import shutil
+import time
+from cfme.utils.video import Recorder, SessionRecorder
 
 
 class Video(ArtifactorBasePlugin):
@@ -25,10 +38,20 @@ class Video(ArtifactorBasePlugin):
             self.ident = ident
             self.in_progress = False
             self.recorder = None
+            self.test_location = None
+            self.test_name = None
+            self.slaveid = None
+            self.clip = None
+            self.start = None
+            self.end = None
+            self.failed = False
+            # Whether all the phases of the test were reported
+            self.reported = False
 
     def plugin_initialize(self):
         self.register_plugin_hook('start_test', self.start_test)
         self.register_plugin_hook('finish_test', self.finish_test)
+        self.register_plugin_hook('report_test', self.report_test)
         self.register_plugin_hook('finish_session', self.finish_session)
 
     def configure(self):
@@ -36,6 +59,61 @@ class Video(ArtifactorBasePlugin):
         self.tests = {}
         self.quality = self.data.get('quality', '10')
         self.display = self.data.get('display', ':0')
+        self.displays = self.data.get('displays', {})
+        self.mode = self.data.get('mode', 'session')
+        self.keep = self.data.get('keep', 'failed')
+        self.keep_session = self.data.get('keep_session', False)
+        self.segment_time = self.data.get('segment_time', 30)
+        if self.mode == 'session' and not find_executable('ffmpeg'):
+            print("ffmpeg not found, recording every test on its own")
+            self.mode = 'test'
+        # display -> SessionRecorder
+        self.recorders = {}
+        # Tests finished in the session mode, waiting for the decision and the clip
+        self.finished = {}
+        self.lock = RLock()
+
+    def _session_recorder(self, display):
+        if display not in self.recorders:
+            directory = os.path.join(
+                self._rigger_instance.log_dir.strpath, 'video-session',
+                display.replace(':', '').replace('.', '_') or 'default')
+            recorder = SessionRecorder(
+                directory, display=display, segment_time=self.segment_time)
+            try:
+                recorder.start()
+            except Exception as e:
+                print(e)
+            self.recorders[display] = recorder
+        return self.recorders[display]
+
+    def _wanted(self, test):
+        return self.keep == 'all' or test.failed
+
+    def _register_clip(self, test):
+        self.fire_hook('filedump', test_location=test.test_location, test_name=test.test_name,
+            description="Video recording", file_type="video",
+            contents="", display_glyph="camera", dont_write=True, os_filename=test.clip,
+                       group_id="misc-artifacts", slaveid=test.slaveid)
+
+    def _cut_clips(self, force=False):
+        """Cuts the clips of the reported tests once the recording covers them"""
+        with self.lock:
+            for test_ident, test in list(self.finished.items()):
+                if not test.reported and not force:
+                    continue
+                if not self._wanted(test):
+                    del self.finished[test_ident]
+                    continue
+                # A second more on both sides, the recording time is not that precise
+                end = test.end + 1
+                if not force and not test.recorder.covers(end):
+                    continue
+                del self.finished[test_ident]
+                try:
+                    test.recorder.cut(test.clip, test.start - 1, end)
+                except Exception as e:
+                    print(e)
 
     @ArtifactorBasePlugin.check_configured
     def start_test(self, artifact_path, test_name, test_location, slaveid):
@@ -47,6 +125,21 @@ class Video(ArtifactorBasePlugin):
         else:
             self.tests[test_ident] = self.Test(test_ident)
             self.tests[test_ident].in_progress = True
+        test = self.tests[test_ident]
+        test.test_location = test_location
+        test.test_name = test_name
+        test.slaveid = slaveid
+        display = self.displays.get(slaveid, self.display)
+        if self.mode == 'session':
+            test.clip = os.path.join(artifact_path, self.ident + ".mp4")
+            if os.path.isfile(test.clip):
+                os.remove(test.clip)
+            with self.lock:
+                test.recorder = self._session_recorder(display)
+            test.start = time.time()
+            test.in_progress = True
+            self._cut_clips()
+            return
         artifacts = []
         os_filename = self.ident + ".ogv"
         os_filename = os.path.join(artifact_path, os_filename)
@@ -54,7 +147,7 @@ class Video(ArtifactorBasePlugin):
             os.remove(os_filename)
         artifacts.append(os_filename)
         try:
-            self.tests[test_ident].recorder = Recorder(os_filename, display=self.display,
+            self.tests[test_ident].recorder = Recorder(os_filename, display=display,
                                                        quality=self.quality)
             self.tests[test_ident].recorder.start()
         except Exception as e:
@@ -70,15 +163,56 @@ class Video(ArtifactorBasePlugin):
     def finish_test(self, artifact_path, test_name, test_location):
         """Finish test"""
         test_ident = "{}/{}".format(test_location, test_name)
+        test = self.tests.pop(test_ident)
+        if self.mode == 'session':
+            test.end = time.time()
+            test.in_progress = False
+            with self.lock:
+                self.finished[test_ident] = test
+                if self.keep == 'all' or test.failed:
+                    self._register_clip(test)
+            return
         try:
-            self.tests[test_ident].recorder.stop()
+            test.recorder.stop()
         except Exception as e:
             print(e)
-        del self.tests[test_ident]
+
+    @ArtifactorBasePlugin.check_configured
+    def report_test(self, test_location, test_name, test_outcome, test_when):
+        """Notes the failed tests, the teardown is the last reported phase"""
+        if self.mode != 'session':
+            return
+        test_ident = "{}/{}".format(test_location, test_name)
+        with self.lock:
+            test = self.tests.get(test_ident) or self.finished.get(test_ident)
+            if test is None:
+                return
+            if test_outcome == 'failed' and not test.failed:
+                test.failed = True
+                # Registered as soon as it is known, the clip is cut a bit later
+                if test_ident in self.finished and self.keep != 'all':
+                    self._register_clip(test)
+            if test_when == 'teardown':
+                test.reported = True
+        self._cut_clips()
 
     def finish_session(self):
         try:
-            for test in self.tests:
-                test.recorder.stop()
+            for test in self.tests.values():
+                if test.recorder is not None and self.mode == 'test':
+                    test.recorder.stop()
         except Exception as e:
             print(e)
+        if self.mode != 'session':
+            return
+        with self.lock:
+            for recorder in self.recorders.values():
+                try:
+                    recorder.stop()
+                except Exception as e:
+                    print(e)
+            self._cut_clips(force=True)
+            if not self.keep_session:
+                for recorder in self.recorders.values():
+                    shutil.rmtree(recorder.directory, ignore_errors=True)
+            self.recorders.clear()
@@ -1,5 +1,6 @@
 import datetime
-from collections import Iterable
+import time
+from collections import Iterable, defaultdict
 
 from manageiq_client.api import APIException
 from widgetastic.widget import View, Text
@@ -18,7 +19,7 @@ from cfme.utils.net import resolve_hostname
 from cfme.utils.stats import tol_check
 from cfme.utils.update import Updateable
 from cfme.utils.varmeth import variable
-from cfme.utils.wait import wait_for, RefreshTimer
+from cfme.utils.wait import wait_for, RefreshTimer, TimedOutError
 from . import PolicyProfileAssignable
 
 
@@ -50,6 +51,96 @@ def provider_db_mapping():
     return {v.db_types[0]: v for k, v in all_types().items()}
 
 
+#: Seconds spent waiting for the provider refreshes, by provider key. Under the parallelizer,
+#: :py:mod:`fixtures.provider` adds up the ones of the slaves on the master.
+refresh_durations = defaultdict(float)
+
+
+class RefreshTracker(object):
+    """Follows one refresh of a provider until it finishes.
+
+    The refresh requested through REST creates a task, so only that task is reloaded until it
+    is finished. The refresh the appliance queues after adding a provider has no task, then only
+    the provider entity is reloaded until its refresh date changes from ``since``. The checks are
+    spread out with an exponential backoff.
+
+    Args:
+        provider: The provider being refreshed.
+        task_id: ID of the refresh task, if there is one.
+        since: Refresh date of the provider before the refresh, ``None`` accepts any refresh.
+    """
+    def __init__(self, provider, task_id=None, since=None):
+        self.provider = provider
+        self.task_id = task_id
+        self.since = since
+        self.error = None
+        self._entity = None
+
+    @property
+    def rest_api(self):
+        return self.provider.appliance.rest_api
+
+    def _task_done(self):
+        task = self.rest_api.get_entity('tasks', self.task_id)
+        task.reload()
+        if task.state.lower() != 'finished':
+            return False
+        if task.status.lower() != 'ok':
+            self.error = getattr(task, 'message', None) or task.status
+        return True
+
+    def _provider_done(self):
+        if self._entity is None:
+            self._entity = self.rest_api.get_entity('providers', self.provider.id)
+        self._entity.reload()
+        refresh_date = getattr(self._entity, 'last_refresh_date', None)
+        self.error = getattr(self._entity, 'last_refresh_error', None)
+        return refresh_date is not None and refresh_date != self.since
+
+    def is_done(self):
+        """Checks the refresh with one request, returns whether it finished."""
+        if self.task_id is not None:
+            return self._task_done()
+        return self._provider_done()
+
+    def wait(self, num_sec=1000, refresh_after=300, delay=5, max_delay=60):
+        """Waits for the refresh to finish and records the time spent.
+
+        Args:
+            num_sec: How long to wait for the refresh.
+            refresh_after: When no refresh task is tracked and the refresh did not finish in this
+                many seconds, request one and follow it instead. ``None`` to never request it.
+            delay: Initial delay between the checks, doubled after every check.
+            max_delay: Upper bound of the delay between the checks.
+
+        Returns:
+            Seconds it took.
+        """
+        start = time.time()
+        while True:
+            try:
+                if self.is_done():
+                    break
+            except Exception:
+                logger.exception('Checking the refresh of provider %s failed, retrying',
+                                 self.provider.key)
+            elapsed = time.time() - start
+            if elapsed >= num_sec:
+                raise TimedOutError('Refresh of provider {} did not finish in {}s'.format(
+                    self.provider.key, num_sec))
+            if self.task_id is None and refresh_after is not None and elapsed >= refresh_after:
+                logger.info('No refresh of provider %s in %ds, requesting one',
+                            self.provider.key, elapsed)
+                self.task_id = self.provider.refresh_provider_relationships().task_id
+                refresh_after = None
+            time.sleep(min(delay, num_sec - elapsed))
+            delay = min(delay * 2, max_delay)
+        duration = time.time() - start
+        refresh_durations[self.provider.key] += duration
+        logger.info('Refresh of provider %s finished in %.1fs', self.provider.key, duration)
+        return duration
+
+
 class BaseProvider(Taggable, Updateable, Navigatable):
     # List of constants that every non-abstract subclass must have defined
     _param_name = ParamClassName('name')
@@ -193,6 +284,7 @@ class BaseProvider(Taggable, Updateable, Navigatable):
                 main_view.flash.assert_no_error()
             else:
                 add_view.add.click()
+                self.appliance.invalidate_provider_index()
                 if main_view.is_displayed:
                     success_text = '{} Providers "{}" was saved'.format(self.string_name,
                                                                         self.name)
@@ -203,6 +295,7 @@ class BaseProvider(Taggable, Updateable, Navigatable):
                                          " filled")
 
         if validate_inventory:
+            # A new provider has no refresh date to compare with, any refresh counts
             self.validate()
 
         return created
@@ -348,6 +441,8 @@ class BaseProvider(Taggable, Updateable, Navigatable):
             self.appliance.rest_api.collections.providers.action.create(**provider_attributes)
         except APIException as err:
             raise AssertionError("Provider wasn't added: {}".format(err))
+        finally:
+            self.appliance.invalidate_provider_index()
 
         response = self.appliance.rest_api.response
         if not response:
@@ -355,6 +450,7 @@ class BaseProvider(Taggable, Updateable, Navigatable):
                 response.status_code))
 
         if validate_inventory:
+            # A new provider has no refresh date to compare with, any refresh counts
             self.validate()
 
         self.appliance.rest_api.response = response
@@ -468,6 +564,7 @@ class BaseProvider(Taggable, Updateable, Navigatable):
         view.toolbar.configuration.item_select(item_title.format(self.string_name),
                                                handle_alert=not cancel)
         if not cancel:
+            self.appliance.invalidate_provider_index()
             msg = ('Delete initiated for 1 {} Provider from '
                    'the {} Database'.format(self.string_name, self.appliance.product_name))
             view.flash.assert_success_message(msg)
@@ -480,6 +577,8 @@ class BaseProvider(Taggable, Updateable, Navigatable):
             provider_rest.action.delete()
         except APIException as err:
             raise AssertionError("Provider wasn't deleted: {}".format(err))
+        finally:
+            self.appliance.invalidate_provider_index()
 
         response = self.appliance.rest_api.response
         if not response:
@@ -524,23 +623,31 @@ class BaseProvider(Taggable, Updateable, Navigatable):
         else:
             return True
 
-    def validate(self):
-        refresh_timer = RefreshTimer(time_for_refresh=300)
+    def validate(self, since=None, refresh_delta=600):
+        """Waits for a refresh of the provider and checks that it had no error
+
+        Args:
+            since: Refresh date of the provider taken before it was added or refreshed, only a
+                newer refresh counts.
+            refresh_delta: Without since, the last refresh counts if it is at most this many
+                seconds old, otherwise a refresh is requested and followed.
+        """
+        tracker = RefreshTracker(self, since=since)
+        if since is None:
+            # the refresh queued after adding the provider, or a recent one, counts
+            rdate = self.last_refresh_date()
+            if rdate and self.appliance.utc_time() - rdate > datetime.timedelta(0, refresh_delta):
+                tracker = self.refresh_provider_relationships()
         try:
-            wait_for(self.is_refreshed,
-                     [refresh_timer],
-                     message="is_refreshed",
-                     num_sec=1000,
-                     delay=60,
-                     handle_exception=True)
+            tracker.wait(num_sec=1000, refresh_after=300)
         except Exception:
             # To see the possible error.
             self.load_details(refresh=True)
             raise
         else:
-            if self.last_refresh_error() is not None:
+            if tracker.error is not None:
                 raise AddProviderError("Cannot validate the provider. Error occured: {}".format(
-                                       self.last_refresh_error()))
+                                       tracker.error))
 
     def validate_stats(self, ui=False):
         """ Validates that the detail page matches the Providers information.
@@ -576,6 +683,7 @@ class BaseProvider(Taggable, Updateable, Navigatable):
 
     @variable(alias='rest')
     def refresh_provider_relationships(self, from_list_view=False):
+        """Requests the refresh, returns :py:class:`RefreshTracker` to wait for it with"""
         # from_list_view is ignored as it is included here for sake of compatibility with UI call.
         logger.debug('Refreshing provider relationships')
         col = self.appliance.rest_api.collections.providers.find_by(name=self.name)
@@ -583,10 +691,17 @@ class BaseProvider(Taggable, Updateable, Navigatable):
             col[0].action.refresh()
         except IndexError:
             raise Exception("Provider collection empty")
+        task_id = self.appliance.rest_api.response.json().get('task_id')
+        return RefreshTracker(
+            self, task_id=task_id, since=getattr(col[0], 'last_refresh_date', None))
 
     @refresh_provider_relationships.variant('ui')
     def refresh_provider_relationships_ui(self, from_list_view=False):
-        """Clicks on Refresh relationships button in provider"""
+        """Clicks on Refresh relationships button in provider
+
+        Returns :py:class:`RefreshTracker` to wait for the refresh with.
+        """
+        tracker = RefreshTracker(self, since=self.last_refresh_date())
         if from_list_view:
             view = navigate_to(self, 'All')
             entity = view.entities.get_entity(name=self.name, surf_pages=True)
@@ -596,6 +711,7 @@ class BaseProvider(Taggable, Updateable, Navigatable):
             view = navigate_to(self, 'Details')
 
         view.toolbar.configuration.item_select(self.refresh_text, handle_alert=True)
+        return tracker
 
     @variable(alias='rest')
     def last_refresh_date(self):
@@ -689,6 +805,7 @@ class BaseProvider(Taggable, Updateable, Navigatable):
 
         logger.info('Waiting for a provider to delete...')
         provider_rest.wait_not_exists(message="Wait provider to disappear", num_sec=1000)
+        self.appliance.invalidate_provider_index()
 
     def load_details(self, refresh=False):
         """To be compatible with the Taggable and PolicyProfileAssignable mixins.
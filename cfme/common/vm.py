@@ -7,7 +7,7 @@ from cfme.infrastructure.provider import InfraProvider
 from cfme.common import Taggable
 from cfme.common.vm_console import VMConsole
 from cfme.common.vm_views import DriftAnalysis, DriftHistory, VMPropertyDetailView
-from cfme.configure.tasks import is_vm_analysis_finished, TasksView
+from cfme.configure.tasks import TaskTracker, wait_analysis_finished
 from cfme.exceptions import (
     VmOrInstanceNotFound, ItemNotFound, OptionNotAvailable, UnknownProviderType)
 from cfme.utils import ParamClassName
@@ -401,12 +401,13 @@ class BaseVM(Pretty, Updateable, PolicyProfileAssignable, Taggable, Navigatable)
         else:
             view = navigate_to(self, 'All')
             self.find_quadicon().check()
+        # earlier scans of the same VM must not count
+        since = TaskTracker(self.appliance).now() if wait_for_task_result else None
         view.toolbar.configuration.item_select('Perform SmartState Analysis',
                                                handle_alert=not cancel)
         if wait_for_task_result:
-            view = self.appliance.browser.create_view(TasksView)
-            wait_for(lambda: is_vm_analysis_finished(self.name),
-                     delay=15, timeout="10m", fail_func=view.reload.click)
+            wait_analysis_finished(self.name, 'vm', timeout='10m', appliance=self.appliance,
+                                   since=since)
 
     def wait_to_disappear(self, timeout=600):
         """Wait for a VM to disappear within CFME
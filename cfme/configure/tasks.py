@@ -3,14 +3,18 @@
 """ Module dealing with Configure/Tasks section.
 """
 import re
+import time
+from collections import namedtuple
+
 from navmazing import NavigateToAttribute
+from sqlalchemy import func, or_
 from widgetastic.utils import Version, VersionPick
 from widgetastic.widget import View
 from widgetastic_patternfly import Dropdown, Tab
 
 from cfme.base.login import BaseLoggedInPage
 from cfme.exceptions import TaskFailedException
-from cfme.utils.appliance import Navigatable
+from cfme.utils.appliance import Navigatable, get_or_create_current_appliance
 from cfme.utils.appliance.implementations.ui import navigator, CFMENavigateStep, navigate_to
 from cfme.utils.log import logger
 from cfme.utils.wait import wait_for, TimedOutError
@@ -46,6 +50,137 @@ TABS_DATA_PER_PROVIDER = {
         'state': "Finished"}
 }
 
+#: Terms in the task message that mean the task did not succeed
+ERROR_TERMS = ('error', 'timed out', 'failed', 'unable to run openscap')
+
+BackendTask = namedtuple('BackendTask', ['name', 'state', 'status', 'message'])
+
+
+def _num_sec(timeout):
+    """Converts the timeout in the ``wait_for`` format, like ``'5M'`` or ``300``, to seconds
+
+    A string without units, like ``'300'``, is in seconds.
+    """
+    if isinstance(timeout, (int, float)):
+        return timeout
+    timeout = timeout.strip().lower()
+    if re.match(r'^\d+(\.\d+)?$', timeout):
+        return float(timeout)
+    units = {'h': 3600, 'm': 60, 's': 1}
+    parts = re.findall(r'(\d+)\s*([hms])', timeout)
+    if not parts:
+        raise ValueError('Could not parse the timeout {!r}'.format(timeout))
+    return sum(int(value) * units[unit] for value, unit in parts)
+
+
+def _check_messages(tasks, silent_failure=False):
+    """Checks the messages of (task name, message) pairs for errors
+
+    Returns False on error with silent_failure, raises otherwise.
+    """
+    for name, message in tasks:
+        message = (message or '').lower()
+        for term in ERROR_TERMS:
+            if term in message:
+                if silent_failure:
+                    logger.warning("Task {} error: {}".format(name, message))
+                    return False
+                elif term == 'timed out':
+                    raise TimedOutError("Task {} timed out: {}".format(name, message))
+                else:
+                    raise TaskFailedException(task_name=name, message=message)
+    return True
+
+
+class TaskTracker(object):
+    """Follows the tasks in the ``miq_tasks`` table of the appliance, without the UI.
+
+    Every check reads name, state, status and message of the matching tasks in one query, the
+    name patterns (postgres regular expressions) are matched by the database. Waiting backs off
+    exponentially between the checks.
+
+    Record :py:meth:`now` before starting the tasks and pass it as ``since``, otherwise finished
+    tasks of the same name from before count too.
+
+    Args:
+        appliance: Appliance running the tasks, the current one by default.
+        since: Only follow the tasks created after this time (in the appliance's UTC time).
+    """
+    def __init__(self, appliance=None, since=None):
+        self.appliance = appliance or get_or_create_current_appliance()
+        self.since = since
+
+    def now(self):
+        """Returns the current UTC time of the appliance database, the time tasks are created in
+        """
+        client = self.appliance.db.client
+        return client.session.query(func.timezone('UTC', func.clock_timestamp())).scalar()
+
+    def read(self, *task_names, **kwargs):
+        """Returns :py:class:`BackendTask` for every task matching any of the name patterns
+
+        Args:
+            state: Only the tasks in this state (case insensitive).
+        """
+        state = kwargs.pop('state', None)
+        client = self.appliance.db.client
+        miq_tasks = client['miq_tasks']
+        query = client.session.query(
+            miq_tasks.name, miq_tasks.state, miq_tasks.status, miq_tasks.message).filter(
+            or_(*[miq_tasks.name.op('~')(task_name) for task_name in task_names]))
+        if state is not None:
+            query = query.filter(func.lower(miq_tasks.state) == state.lower())
+        if self.since is not None:
+            query = query.filter(miq_tasks.created_on >= self.since)
+        return [BackendTask(*row) for row in query]
+
+    def in_state(self, task_name, state='finished'):
+        """Returns the tasks matching the name pattern that are in the state"""
+        return self.read(task_name, state=state)
+
+    def wait_for_tasks(self, task_name, num_tasks, state='finished', timeout=300, delay=5,
+                       max_delay=60):
+        """Waits until at least num_tasks of the tasks matching the name pattern are in the state
+
+        Args:
+            task_name: Name pattern of the tasks.
+            num_tasks: How many of them to wait for.
+            state: State of the task to wait for.
+            timeout: How long to wait, in seconds or the ``wait_for`` format like ``'5M'``.
+            delay: Initial delay between the checks, doubled after every check.
+            max_delay: Upper bound of the delay between the checks.
+
+        Returns:
+            List of the tasks in the state.
+
+        Raises:
+            TimedOutError: When not enough of them got to the state in time.
+        """
+        num_sec = _num_sec(timeout)
+        start = time.time()
+        while True:
+            tasks = self.in_state(task_name, state)
+            elapsed = time.time() - start
+            if len(tasks) >= num_tasks:
+                logger.info('%d of %d tasks %r are %s after %.1fs',
+                            len(tasks), num_tasks, task_name, state, elapsed)
+                return tasks
+            if elapsed >= num_sec:
+                raise TimedOutError('Only {} of {} tasks {!r} are {} after {}s'.format(
+                    len(tasks), num_tasks, task_name, state, num_sec))
+            time.sleep(min(delay, num_sec - elapsed))
+            delay = min(delay * 2, max_delay)
+
+    def check_no_errors(self, task_name, num_tasks, state='finished', silent_failure=False):
+        """Checks that exactly num_tasks of the tasks are in the state and none of them failed"""
+        tasks = self.in_state(task_name, state)
+        if len(tasks) != num_tasks:
+            logger.warn('There is no match between expected number of tasks "{}",'
+                        ' and number of tasks on state "{}'.format(num_tasks, state))
+            return False
+        return _check_messages(
+            ((task.name, task.message) for task in tasks), silent_failure=silent_failure)
+
 
 def is_vm_analysis_finished(name, **kwargs):
     return is_analysis_finished(name=name, task_type='vm', **kwargs)
@@ -109,8 +244,34 @@ def all_tasks_match_status(destination, task_name, expected_status, expected_num
 
 
 def check_tasks_have_no_errors(task_name, task_type, expected_num_of_tasks, silent_failure=False,
-                               clear_tasks_after_success=False):
-    """ Check if all tasks analysis match state with no errors"""
+                               clear_tasks_after_success=False, ui_confirm=False,
+                               appliance=None, since=None):
+    """ Check if all tasks analysis match state with no errors
+
+    The tasks are checked in the database, only the ones created after since if it is set, with
+    ui_confirm also on the Tasks page afterwards.
+    """
+    tabs_data = TABS_DATA_PER_PROVIDER[task_type]
+    destination = tabs_data['tab']
+    tracker = TaskTracker(appliance, since=since)
+    if not tracker.check_no_errors(tabs_data['task'].format(task_name), expected_num_of_tasks,
+                                   state=tabs_data['state'], silent_failure=silent_failure):
+        return False
+
+    if ui_confirm and not check_tasks_have_no_errors_ui(
+            task_name, task_type, expected_num_of_tasks, silent_failure=silent_failure):
+        return False
+
+    if clear_tasks_after_success:
+        # Remove all finished tasks so they wouldn't poison other tests
+        delete_all_tasks(destination)
+
+    return True
+
+
+def check_tasks_have_no_errors_ui(task_name, task_type, expected_num_of_tasks,
+                                  silent_failure=False):
+    """ Check if all tasks analysis match state with no errors on the Tasks page"""
 
     tabs_data = TABS_DATA_PER_PROVIDER[task_type]
     destination = tabs_data['tab']
@@ -145,55 +306,53 @@ def check_tasks_have_no_errors(task_name, task_type, expected_num_of_tasks, sile
         return False
 
     # throw exception if error in message
-    for row in rows:
-        message = row.message.text.lower()
-        for term in ('error', 'timed out', 'failed', 'unable to run openscap'):
-            if term in message:
-                if silent_failure:
-                    logger.warning("Task {} error: {}".format(row.task_name.text, message))
-                    return False
-                elif term == 'timed out':
-                    raise TimedOutError("Task {} timed out: {}".format(row.task_name.text, message))
-                else:
-                    raise TaskFailedException(task_name=row.task_name.text, message=message)
-
-    if clear_tasks_after_success:
-        # Remove all finished tasks so they wouldn't poison other tests
-        delete_all_tasks(destination)
-
-    return True
+    return _check_messages(
+        ((row.task_name.text, row.message.text) for row in rows), silent_failure=silent_failure)
 
 
 def wait_analysis_finished_multiple_tasks(
-        task_name, task_type, expected_num_of_tasks, delay=5, timeout='5M'):
-    """ Wait until analysis is finished (or timeout exceeded)"""
-    row_completed = []
-    # get view for reload button
-    view = navigate_to(Tasks, 'AllTasks')
-
-    def tasks_finished(output_rows, task_name, task_type, expected_num_of_tasks):
+        task_name, task_type, expected_num_of_tasks, delay=5, timeout='5M', appliance=None,
+        since=None):
+    """ Wait until analysis is finished (or timeout exceeded)
 
-        is_succeed, num_of_succeed_tasks = are_all_tasks_match_status(
-            task_name, expected_num_of_tasks, task_type)
-        output_rows.append(num_of_succeed_tasks)
-        return is_succeed
+    Only the tasks created after since count if it is set.
 
+    Returns the number of finished tasks.
+    """
+    tabs_data = TABS_DATA_PER_PROVIDER[task_type]
+    tracker = TaskTracker(appliance, since=since)
     try:
-        wait_for(tasks_finished,
-                 func_kwargs={'output_rows': row_completed,
-                              'task_name': task_name,
-                              'task_type': task_type,
-                              'expected_num_of_tasks': expected_num_of_tasks},
-                 delay=delay,
-                 timeout=timeout,
-                 fail_func=view.reload.click)
-        return row_completed[-1]
-    except TimedOutError, e:
-        logger.error("Only {}  Tasks out of {}, Finished".format(row_completed[-1],
-                                                                 expected_num_of_tasks))
+        tasks = tracker.wait_for_tasks(
+            tabs_data['task'].format(task_name), expected_num_of_tasks,
+            state=tabs_data['state'], timeout=timeout, delay=delay)
+        return len(tasks)
+    except TimedOutError as e:
+        logger.error(str(e))
         raise TimedOutError('exception {}'.format(e))
 
 
+def wait_analysis_finished(name, task_type='vm', timeout='10M', clear_tasks_after_success=True,
+                           appliance=None, since=None):
+    """ Wait until the analysis of one object is finished with no errors
+
+    Args:
+        since: Time the analysis was started at, from :py:meth:`TaskTracker.now`. The tasks of
+            earlier analyses of the same object do not count.
+
+    Raises:
+        TaskFailedException: When the task finished with an error.
+        TimedOutError: When the task did not finish in time.
+    """
+    wait_analysis_finished_multiple_tasks(name, task_type, 1, timeout=timeout,
+                                          appliance=appliance, since=since)
+    if not check_tasks_have_no_errors(name, task_type, expected_num_of_tasks=1,
+                                      clear_tasks_after_success=clear_tasks_after_success,
+                                      appliance=appliance, since=since):
+        raise TaskFailedException(
+            task_name=TABS_DATA_PER_PROVIDER[task_type]['task'].format(name),
+            message='expected exactly one finished analysis task')
+
+
 class TasksView(BaseLoggedInPage):
     # Toolbar
     delete = Dropdown('Delete Tasks')  # dropdown just has icon, use element title
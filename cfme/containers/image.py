@@ -203,6 +203,7 @@ class ImageCollection(GetRandomInstancesMixin, BaseCollection, PolicyProfileAssi
         images_view = navigate_to(self, 'All')
         self.check_image_entities(image_entities)
 
+        since = tasks.TaskTracker(self.appliance).now() if wait_for_finish else None
         images_view.toolbar.configuration.item_select(
             'Perform SmartState Analysis', handle_alert=True)
         for image_entity in image_entities:
@@ -214,12 +215,15 @@ class ImageCollection(GetRandomInstancesMixin, BaseCollection, PolicyProfileAssi
             try:
                 # check all tasks state finished
                 tasks.wait_analysis_finished_multiple_tasks(task_name, task_type,
-                                                            num_of_tasks, timeout=timeout)
+                                                            num_of_tasks, timeout=timeout,
+                                                            appliance=self.appliance,
+                                                            since=since)
 
                 # check all task passed successfully with no error
                 if tasks.check_tasks_have_no_errors(task_name, task_type, num_of_tasks,
                                                     silent_failure=True,
-                                                    clear_tasks_after_success=False):
+                                                    clear_tasks_after_success=False,
+                                                    appliance=self.appliance, since=since):
                     return True
                 else:
                     logger.error('Some Images SSA tasks finished with error message,'
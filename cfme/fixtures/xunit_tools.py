@@ -2,6 +2,8 @@
 
 import re
 import datetime
+from collections import OrderedDict
+from contextlib import contextmanager
 
 from lxml import etree
 
@@ -54,6 +56,9 @@ caselevels = {
 
 test_param = re.compile(r'\[.*\]')
 
+# Testcase metadata shared by all the parametrized variants of a test function
+_function_metadata_cache = {}
+
 
 def pytest_addoption(parser):
     """Adds command line options."""
@@ -117,17 +122,43 @@ def testcase_record(
     return testcase
 
 
-def get_testcase_data(name, tests, processed_test, item, legacy=False):
-    """Gets data for single testcase entry."""
-    if name in processed_test:
-        return
+def _function_metadata(item):
+    """Gets the description and automation script link of the item's test function.
 
-    work_items = []
-    custom_fields = {}
+    The result is cached per test function, so the parametrized variants do not derive it again.
+
+    Returns: Tuple ``(description, automation_script)``.
+    """
+    function = getattr(item, 'function', None)
+    try:
+        return _function_metadata_cache[function]
+    except (KeyError, TypeError):
+        pass
     try:
         description = item.function.func_doc
     except Exception:
         description = ""
+    # The master here should probably link the latest "commit" eventually
+    automation_script = 'http://github.com/{0}/{1}/blob/master/{2}#L{3}'.format(
+        xunit['gh_owner'],
+        xunit['gh_repo'],
+        item.location[0],
+        item.function.func_code.co_firstlineno
+    )
+    result = (description, automation_script)
+    if function is not None:
+        _function_metadata_cache[function] = result
+    return result
+
+
+def get_testcase_data(name, processed_test, item, legacy=False):
+    """Gets data for single testcase entry, None when it was already processed."""
+    if name in processed_test:
+        return None
+
+    work_items = []
+    custom_fields = {}
+    description, automation_script = _function_metadata(item)
     try:
         requirement = item.get_marker('requirement').args[0]
         requirement_id = cfme_data['requirements'][requirement]
@@ -145,13 +176,6 @@ def get_testcase_data(name, tests, processed_test, item, legacy=False):
 
     manual = item.get_marker('manual')
     if not manual:
-        # The master here should probably link the latest "commit" eventually
-        automation_script = 'http://github.com/{0}/{1}/blob/master/{2}#L{3}'.format(
-            xunit['gh_owner'],
-            xunit['gh_repo'],
-            item.location[0],
-            item.function.func_code.co_firstlineno
-        )
         custom_fields['caseautomation'] = "automated"
         custom_fields['automation_script'] = automation_script
         # Description with timestamp and link to test case source.
@@ -163,13 +187,13 @@ def get_testcase_data(name, tests, processed_test, item, legacy=False):
         custom_fields['caseautomation'] = "manualonly"
         description = '{}'.format(description)
 
-    processed_test.append(name)
-    tests.append(dict(
+    processed_test.add(name)
+    return dict(
         test_name=name,
         description=description,
         parameters=param_list,
         linked_items=work_items,
-        custom_fields=custom_fields))
+        custom_fields=custom_fields)
 
 
 def testresult_record(test_name, parameters=None, result=None):
@@ -197,24 +221,36 @@ def testresult_record(test_name, parameters=None, result=None):
     return testcase
 
 
-def get_testresult_data(name, tests, processed_test, item, legacy=False):
-    """Gets data for single test result entry."""
+def get_testresult_data(name, processed_test, item, legacy=False):
+    """Gets data for single test result entry, None when it was already processed."""
     if legacy:
         if name in processed_test:
-            return
+            return None
         param_dict = None
-        processed_test.append(name)
+        processed_test.add(name)
     else:
         try:
             params = item.callspec.params
             param_dict = {p: _get_name(v) for p, v in params.iteritems()}
         except Exception:
             param_dict = {}
-    tests.append({'name': name, 'params': param_dict, 'result': None})
+    return {'name': name, 'params': param_dict, 'result': None}
+
+
+@contextmanager
+def testrun_gen(filename, config, results_count, collectonly=True):
+    """Opens the XML file used for test run import.
 
+    The test results are written out one by one instead of building the whole tree in memory.
 
-def testrun_gen(tests, filename, config, collectonly=True):
-    """Generates content of the XML file used for test run import."""
+    Args:
+        filename: Name of the XML file.
+        config: The pytest config.
+        results_count: Number of the test results that will be written.
+        collectonly: Whether to write the results as skipped.
+
+    Yields: Function writing one test result entry.
+    """
     prop_dict = {
         'testrun-template-id': xunit.get('testrun_template_id'),
         'testrun-title': config.getoption('xmls_testrun_title') or xunit.get('testrun_title'),
@@ -225,8 +261,6 @@ def testrun_gen(tests, filename, config, collectonly=True):
         'lookup-method': xunit['lookup_method']
     }
 
-    testsuites = etree.Element("testsuites")
-    testsuite = etree.Element("testsuite")
     properties = etree.Element("properties")
     property_resp = etree.Element(
         'property', name='polarion-response-{}'.format(
@@ -238,38 +272,36 @@ def testrun_gen(tests, filename, config, collectonly=True):
         prop_el = etree.Element(
             'property', name="polarion-{}".format(prop_name), value=str(prop_value))
         properties.append(prop_el)
-    testsuites.append(properties)
-    testsuites.append(testsuite)
-
-    no_tests = 0
-    results_count = {
-        'passed': 0,
-        'skipped': 0,
-        'failure': 0,
-        'error': 0
-    }
-    for data in tests:
-        no_tests += 1
-        if collectonly:
-            testsuite.append(testresult_record(data['name'], data.get('params')))
-            results_count['skipped'] += 1
-        else:
-            testsuite.append(testresult_record(
-                data['name'], data.get('params'), result=data.get('result')))
-            results_count[data['result']] += 1
-    testsuite.attrib['tests'] = str(no_tests)
-    testsuite.attrib['failures'] = str(results_count['failure'])
-    testsuite.attrib['skipped'] = str(results_count['skipped'])
-    testsuite.attrib['errors'] = str(results_count['error'])
-    testsuite.attrib['name'] = "cfme-tests"
-    xml = etree.ElementTree(testsuites)
-    xml.write(filename, pretty_print=True)
-
-
-def testcases_gen(tests, filename):
-    """Generates content of the XML file used for test cases import."""
-    testcases = etree.Element("testcases")
-    testcases.attrib['project-id'] = xunit['project_id']
+
+    def write(data):
+        result = None if collectonly else data.get('result')
+        xf.write(testresult_record(data['name'], data.get('params'), result=result),
+                 pretty_print=True)
+
+    with etree.xmlfile(filename, encoding='utf-8') as xf:
+        xf.write_declaration()
+        with xf.element("testsuites"):
+            xf.write(properties, pretty_print=True)
+            # The results are not known at collection, all of them are written as skipped
+            testsuite_attrib = OrderedDict([
+                ('tests', str(results_count)),
+                ('failures', '0'),
+                ('skipped', str(results_count)),
+                ('errors', '0'),
+                ('name', "cfme-tests"),
+            ])
+            with xf.element("testsuite", testsuite_attrib):
+                yield write
+
+
+@contextmanager
+def testcases_gen(filename):
+    """Opens the XML file used for test cases import.
+
+    The test cases are written out one by one instead of building the whole tree in memory.
+
+    Yields: Function writing one testcase entry.
+    """
     response_properties = etree.Element("response-properties")
     response_property = etree.Element(
         "response-property", name=xunit['response']['id'], value=xunit['response']['value'])
@@ -279,13 +311,16 @@ def testcases_gen(tests, filename):
     properties.append(lookup)
     dry_run = etree.Element("property", name="dry-run", value=str(xunit.get("dry_run", "false")))
     properties.append(dry_run)
-    testcases.append(response_properties)
-    testcases.append(properties)
 
-    for data in tests:
-        testcases.append(testcase_record(**data))
-    xml = etree.ElementTree(testcases)
-    xml.write(filename, pretty_print=True)
+    def write(data):
+        xf.write(testcase_record(**data), pretty_print=True)
+
+    with etree.xmlfile(filename, encoding='utf-8') as xf:
+        xf.write_declaration()
+        with xf.element("testcases", {'project-id': xunit['project_id']}):
+            xf.write(response_properties, pretty_print=True)
+            xf.write(properties, pretty_print=True)
+            yield write
 
 
 def _get_name(obj):
@@ -333,11 +368,7 @@ def pytest_collection_modifyitems(config, items):
     # all "legacy" conditions can be removed once parametrization is finished
     legacy = config.getoption('generate_legacy_xmls')
 
-    tc_processed = []
-    tc_data = []
-    tr_processed = []
-    tr_data = []
-
+    selected = []
     for item in items:
         if 'cfme/tests' not in item.nodeid:
             continue
@@ -347,10 +378,19 @@ def pytest_collection_modifyitems(config, items):
             continue
 
         legacy_name, parametrized_name = get_polarion_name(item)
-        name = legacy_name if legacy else parametrized_name
-
-        get_testcase_data(name, tc_data, tc_processed, item, legacy)
-        get_testresult_data(name, tr_data, tr_processed, item, legacy)
-
-    testcases_gen(tc_data, 'test_case_import.xml')
-    testrun_gen(tr_data, 'test_run_import.xml', config, collectonly=collectonly)
+        selected.append((legacy_name if legacy else parametrized_name, item))
+    # The test run needs the number of the results before the first one is written
+    results_count = len({name for name, _ in selected}) if legacy else len(selected)
+
+    tc_processed = set()
+    tr_processed = set()
+    with testcases_gen('test_case_import.xml') as write_testcase, \
+            testrun_gen('test_run_import.xml', config, results_count,
+                        collectonly=collectonly) as write_testresult:
+        for name, item in selected:
+            tc_data = get_testcase_data(name, tc_processed, item, legacy)
+            if tc_data is not None:
+                write_testcase(tc_data)
+            tr_data = get_testresult_data(name, tr_processed, item, legacy)
+            if tr_data is not None:
+                write_testresult(tr_data)
@@ -19,7 +19,7 @@ from cfme.common.host_views import (
     HostsView,
     HostTimelinesView
 )
-from cfme.configure.tasks import is_host_analysis_finished, TasksView
+from cfme.configure.tasks import TaskTracker, wait_analysis_finished
 from cfme.exceptions import ItemNotFound
 from cfme.infrastructure.datastore import HostAllDatastoresView
 from cfme.modeling.base import BaseEntity, BaseCollection
@@ -275,12 +275,13 @@ class Host(BaseEntity, Updateable, Pretty, PolicyProfileAssignable, Taggable):
             The host must have valid credentials already set up for this to work.
         """
         view = navigate_to(self, "Details")
+        # earlier scans of the same host must not count
+        since = TaskTracker(self.appliance).now() if wait_for_task_result else None
         view.toolbar.configuration.item_select("Perform SmartState Analysis", handle_alert=True)
         view.flash.assert_success_message('"{}": Analysis successfully initiated'.format(self.name))
         if wait_for_task_result:
-            view = self.appliance.browser.create_view(TasksView)
-            wait_for(lambda: is_host_analysis_finished(self.name),
-                     delay=15, timeout="10m", fail_func=view.reload.click)
+            wait_analysis_finished(self.name, 'host', timeout='10m', appliance=self.appliance,
+                                   since=since)
 
     def check_compliance(self, timeout=240):
         """Initiates compliance check and waits for it to finish."""
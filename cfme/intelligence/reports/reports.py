@@ -313,7 +313,7 @@ class CustomReport(Updateable, Navigatable):
 
 class CustomSavedReportDetailsView(CloudIntelReportsView):
     title = Text("#explorer_title_text")
-    table = VanillaTable(".//div[@id='report_html_div']/table")
+    table = Table(".//div[@id='report_html_div']/table")
     # PaginationPane() is not working on Report Details page
     paginator = View.nested(NonJSPaginationPane)
     view_selector = View.nested(ReportToolBarViewSelector)
@@ -385,24 +385,16 @@ class CustomSavedReport(Updateable, Pretty, Navigatable):
         if 'No records found for this report' in view.flash.read():
             # No data found
             return SavedReportData([], [])
-        view.paginator.set_items_per_page(1000)
+        # Rows with cells spanning more columns (e.g. "Totals: ddd") are left out
+        view.paginator.set_max_items_per_page()
         try:
-            headers = tuple([hdr.encode("utf-8") for hdr in view.table.headers])
-            body = []
-            for _ in view.paginator.pages():
-                for row in view.table.rows():
-                    if not all([c[1].is_displayed for c in row]):
-                        # This is a temporary workaround for cases we have row span
-                        # greater that 1 column (e.g. in case of "Totals: ddd" column).
-                        # TODO: Support this functionality in widgetastic. Issue:
-                        # https://github.com/RedHatQE/widgetastic.core/issues/26
-                        continue
-                    row_data = tuple([row[header].text.encode("utf-8") for header in headers])
-                    body.append(row_data)
+            headers, rows = view.table.read_pages(view.paginator)
         except NoSuchElementException:
             # No data found
             return SavedReportData([], [])
         else:
+            headers = tuple([hdr.encode("utf-8") for hdr in headers])
+            body = [tuple([cell.encode("utf-8") for cell in row]) for row in rows]
             return SavedReportData(headers, body)
 
     def download(self, extension):
@@ -536,26 +528,16 @@ class CannedSavedReport(CustomSavedReport, Navigatable):
 
     def get_saved_canned_reports(self, *path):
         view = navigate_to(self, "Info")
-        results = []
         try:
-            for _ in view.saved_reports.paginator.pages():
-                for row in view.saved_reports.table.rows():
-                    if not all([c[1].is_displayed for c in row]):
-                        # This is a temporary workaround for cases we have row span
-                        # greater that 1 column (e.g. in case of "Totals: ddd" column).
-                        # TODO: Support this functionality in widgetastic. Issue:
-                        # https://github.com/RedHatQE/widgetastic.core/issues/26
-                        continue
-                    results.append(
-                        CannedSavedReport(
-                            path,
-                            row.run_at.text.encode("utf-8"),
-                            row.queued_at.text.encode("utf-8")
-                        )
-                    )
+            headers, rows = view.saved_reports.table.read_pages(view.saved_reports.paginator)
         except NoSuchElementException:
-            pass
-        return results
+            return []
+        if not rows:
+            return []
+        run_at, queued_at = headers.index("Run At"), headers.index("Queued At")
+        return [
+            CannedSavedReport(path, row[run_at].encode("utf-8"), row[queued_at].encode("utf-8"))
+            for row in rows]
 
     def delete(self, cancel=False):
         view = navigate_to(self, "Info")
@@ -36,12 +36,7 @@ def do_vm_provisioning(appliance, template_name, provider, vm_name, provisioning
 
     if smtp_test:
         # Wait for e-mails to appear
-        def verify():
-            approval = dict(subject_like="%%Your Virtual Machine configuration was Approved%%")
-            expected_text = "Your virtual machine request has Completed - VM:%%{}".format(vm_name)
-            return (
-                len(smtp_test.get_emails(**approval)) > 0 and
-                len(smtp_test.get_emails(subject_like=expected_text)) > 0
-            )
-
-        wait_for(verify, message="email receive check", delay=30)
+        approval = dict(subject_like="%%Your Virtual Machine configuration was Approved%%")
+        expected_text = "Your virtual machine request has Completed - VM:%%{}".format(vm_name)
+        smtp_test.wait_for_emails(timeout=120, **approval)
+        smtp_test.wait_for_emails(timeout=120, subject_like=expected_text)
@@ -2,10 +2,155 @@
 classes to manage the cfme test framework configuration
 """
 
+import hashlib
 import os
 import warnings
+from collections import OrderedDict
+from functools import partial
+
 import yaycl
 import attr
+from lya import AttrDict
+from six.moves import cPickle as pickle
+
+#: Files of a configuration, relative to the config dir
+CONFIG_FILES = ('{}.yaml', '{}.local.yaml')
+
+#: Encrypted files of a configuration, loaded by yaycl_crypt, never put in the snapshot
+ENCRYPTED_FILES = ('{}.eyaml', '{}.local.eyaml')
+
+
+def _plain(value):
+    """Converts the AttrDicts to OrderedDicts, which can be pickled"""
+    if isinstance(value, dict):
+        return OrderedDict((k, _plain(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _file_stamp(path):
+    """Identifies the content of the file, ``None`` if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    return stat.st_mtime, stat.st_size, digest
+
+
+class SnapshotConfig(yaycl.Config):
+    """yaycl config loading the configurations from a compiled snapshot
+
+    The snapshot holds every configuration already merged with its local yaml (but not the
+    runtime overrides and inherits, those are applied as usual), together with the stamps of the
+    files it was loaded from. A configuration is loaded from the snapshot only when the stamps of
+    its files still match, otherwise it is loaded from the yaml files.
+
+    The configurations with encrypted (eyaml) files are left out of the snapshot, they are
+    always loaded from their files so that the decrypted secrets are never written to disk.
+
+    The snapshot is written by :py:meth:`compile_snapshot`, the other processes only read it.
+    """
+    def __init__(self, config_dir, snapshot_file=None, **kwargs):
+        super(SnapshotConfig, self).__init__(config_dir, **kwargs)
+        self._snapshot_file = snapshot_file
+        self._snapshot = self._read_snapshot()
+
+    def _read_snapshot(self):
+        if not self._snapshot_file or not os.path.exists(self._snapshot_file):
+            return {}
+        try:
+            with open(self._snapshot_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception as e:
+            warnings.warn('Could not read the config snapshot {}: {}'.format(
+                self._snapshot_file, e))
+            return {}
+
+    def _stamps(self, key):
+        stamps = [
+            (name.format(key), _file_stamp(os.path.join(self._yaycl.config_dir,
+                                                        name.format(key))))
+            for name in CONFIG_FILES]
+        return tuple(stamps)
+
+    def _encrypted(self, key):
+        return any(
+            os.path.exists(os.path.join(self._yaycl.config_dir, name.format(key)))
+            for name in ENCRYPTED_FILES)
+
+    def _load_merged(self, key):
+        """Loads the configuration merged with its local yaml like yaycl does"""
+        yaml_dict = self._load_yaml(key)
+        local_yaml_dict = self._load_yaml('{}.local'.format(key), warn_on_fail=False)
+        if local_yaml_dict:
+            yaml_dict.update_dict(local_yaml_dict)
+        return yaml_dict
+
+    def _populate(self, key):
+        snapshot = self._snapshot.get(key)
+        if snapshot is None or self._encrypted(key) or snapshot[0] != self._stamps(key):
+            return super(SnapshotConfig, self)._populate(key)
+        merged = snapshot[1]
+        if key in self._runtime:
+            yaml_dict = AttrDict()
+            yaml_dict.update(merged)
+            AttrDict(self._runtime)[key]._.apply_flat(
+                partial(self._apply_runtime_overrides, yaml_dict))
+            merged = yaml_dict
+        # Converted to AttrDicts only once, yaycl converts the loaded yaml twice
+        self[key].update(merged)
+        self._inherit(key)
+
+    def config_keys(self):
+        """Names of the configurations in the config dir"""
+        keys = set()
+        for file_name in os.listdir(self._yaycl.config_dir):
+            name, extension = os.path.splitext(file_name)
+            if extension in ('.yaml', '.eyaml') and not name.endswith('.local'):
+                keys.add(name)
+        return sorted(keys)
+
+    def compile_snapshot(self):
+        """Writes the snapshot of the not encrypted configurations, loads only the changed ones
+
+        A configuration that fails to load is left out of the snapshot with a warning, it fails
+        again when (and only if) a test uses it.
+
+        Returns:
+            Names of the configurations that were loaded from the yaml files.
+        """
+        snapshot = {}
+        compiled = []
+        for key in self.config_keys():
+            if self._encrypted(key):
+                continue
+            try:
+                stamps = self._stamps(key)
+                current = self._snapshot.get(key)
+                if current is not None and current[0] == stamps:
+                    snapshot[key] = current
+                    continue
+                snapshot[key] = (stamps, _plain(self._load_merged(key)))
+            except Exception as e:
+                warnings.warn('Could not load the configuration {} for the snapshot: {}'.format(
+                    key, e))
+                continue
+            compiled.append(key)
+        if compiled or set(snapshot) != set(self._snapshot):
+            snapshot_dir = os.path.dirname(self._snapshot_file)
+            if not os.path.isdir(snapshot_dir):
+                os.makedirs(snapshot_dir)
+            temp_file = '{}.{}.tmp'.format(self._snapshot_file, os.getpid())
+            # readable only by the user, like the yaml files it is made of should be
+            fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(snapshot, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(temp_file, self._snapshot_file)
+        self._snapshot = snapshot
+        return compiled
 
 
 class Configuration(object):
@@ -15,13 +160,15 @@ class Configuration(object):
     def __init__(self):
         self.yaycl_config = None
 
-    def configure(self, config_dir, crypt_key_file=None):
+    def configure(self, config_dir, crypt_key_file=None, snapshot_file=None):
         """
         do the defered initial loading of the configuration
 
         :param config_dir: path to the folder with configuration files
         :param crypt_key_file: optional name of a file holding the key for encrypted
             configuration files
+        :param snapshot_file: optional name of the compiled snapshot of the configuration
+            files, see :py:class:`SnapshotConfig`
 
         :raises: AssertionError if called more than once
 
@@ -30,11 +177,23 @@ class Configuration(object):
 
         assert self.yaycl_config is None
         if crypt_key_file and os.path.exists(crypt_key_file):
-            self.yaycl_config = yaycl.Config(
+            self.yaycl_config = SnapshotConfig(
                 config_dir=config_dir,
+                snapshot_file=snapshot_file,
                 crypt_key_file=crypt_key_file)
         else:
-            self.yaycl_config = yaycl.Config(config_dir=config_dir)
+            self.yaycl_config = SnapshotConfig(config_dir=config_dir, snapshot_file=snapshot_file)
+
+    def compile_snapshot(self):
+        """compiles the snapshot of the configuration files for the other processes
+
+        :returns: names of the configurations that changed since the last snapshot
+        """
+        if self.yaycl_config is None:
+            raise RuntimeError('cfme configuration was not initialized')
+        if not self.yaycl_config._snapshot_file:
+            return []
+        return self.yaycl_config.compile_snapshot()
 
     def get_config(self, name):
         """returns a yaycl config object
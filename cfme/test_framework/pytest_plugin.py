@@ -18,6 +18,19 @@ def pytest_configure(config):
     # we might want to remove this one
     config.pluginmanager.set_blocked('warnings')
 
+    # the slaves and the helper processes load the configuration from the compiled snapshot
+    from fixtures.pytest_store import store
+    if store.parallelizer_role != 'slave':
+        from cfme.test_framework.config import global_configuration
+        from cfme.utils.log import logger
+        try:
+            compiled = global_configuration.compile_snapshot()
+        except Exception:
+            logger.exception('Could not compile the configuration snapshot')
+        else:
+            if compiled:
+                logger.info('Compiled the configuration snapshot of: %s', ', '.join(compiled))
+
 
 def pytest_collection_finish(session):
     from fixtures.pytest_store import store
@@ -69,6 +82,7 @@ pytest_plugins = (
     'fixtures.page_screenshots',
     'fixtures.perf',
     'fixtures.provider',
+    'fixtures.provider_order',
     'fixtures.qa_contact',
     'fixtures.randomness',
     'fixtures.rbac',
@@ -77,6 +91,7 @@ pytest_plugins = (
     'fixtures.skip_not_implemented',
     'fixtures.soft_assert',
     'fixtures.ssh_client',
+    'fixtures.vm_pool',
     'fixtures.templateloader',
     'fixtures.terminalreporter',
     'fixtures.ui_coverage',
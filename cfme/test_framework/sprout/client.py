@@ -2,15 +2,18 @@
 import json
 import os
 import requests
+import time
 
 import attr
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
 
 from cfme.utils.version import get_stream
 from cfme.utils.appliance import current_appliance, IPAppliance
 from cfme.utils.conf import credentials, env
 # TODO: use custom wait_for logger fitting sprout
 from cfme.utils.log import logger
-from cfme.utils.wait import wait_for
+from cfme.utils.wait import TimedOutError, wait_for
 
 
 class SproutException(Exception):
@@ -21,6 +24,11 @@ class AuthException(SproutException):
     pass
 
 
+class MethodNotFoundException(SproutException):
+    """The Sprout does not have the method, e.g. it runs an older version"""
+    pass
+
+
 @attr.s
 class APIMethodCall(object):
     _client = attr.ib()
@@ -38,12 +46,28 @@ class SproutClient(object):
     _entry = attr.ib(default="appliances/api")
     _auth = attr.ib(default=None)
 
+    _session = attr.ib(init=False, default=None, repr=False)
+    # Whether the Sprout supports request_check_wait
+    _long_poll = attr.ib(init=False, default=True, repr=False)
+
     @property
     def api_entry(self):
         return "{}://{}:{}/{}".format(self._proto, self._host, self._port, self._entry)
 
+    @property
+    def session(self):
+        """Keep-alive session, retries connection failures with a backoff"""
+        if self._session is None:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_maxsize=4,
+                max_retries=Retry(total=5, connect=5, read=0, backoff_factor=0.5))
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+        return self._session
+
     def _post(self, **data):
-        return requests.post(self.api_entry, data=json.dumps(data))
+        return self.session.post(self.api_entry, data=json.dumps(data))
 
     def _call_post(self, **data):
         """Protect from the Sprout being updated (error 502,503)"""
@@ -64,9 +88,36 @@ class SproutClient(object):
         logger.info("SPROUT: Called {} with {} {}".format(name, args, kwargs))
         if self._auth is not None:
             req_data["auth"] = self._auth
-        result = self._call_post(**req_data)
+        return self._process_result(self._call_post(**req_data))
+
+    def call_methods(self, *calls):
+        """Calls multiple methods in one request.
+
+        Args:
+            *calls: ``(name, args, kwargs)`` tuples, ``args`` and ``kwargs`` can be omitted.
+
+        Returns:
+            A list of the results in the order of ``calls``. If any of the calls fails, the first
+            failure is raised after all of them ran.
+        """
+        req_calls = []
+        for call in calls:
+            name, args, kwargs = (tuple(call) + ((), {}))[:3]
+            req_calls.append({"method": name, "args": args, "kwargs": kwargs})
+        logger.info("SPROUT: Called {}".format(", ".join(call["method"] for call in req_calls)))
+        req_data = {"calls": req_calls}
+        if self._auth is not None:
+            req_data["auth"] = self._auth
+        return [
+            self._process_result(result)
+            for result in self._process_result(self._call_post(**req_data))]
+
+    def _process_result(self, result):
         try:
             if result["status"] == "exception":
+                if (result["result"]["class"] == "NameError" and
+                        result["result"]["message"].endswith(" not found!")):
+                    raise MethodNotFoundException(result["result"]["message"])
                 raise SproutException(
                     "Exception {} raised! {}".format(
                         result["result"]["class"], result["result"]["message"]))
@@ -112,15 +163,60 @@ class SproutClient(object):
             provider_type=provider_type, group=stream, provider=provider, lease_time=lease_time,
             ram=ram, cpu=cpu, count=count
         )
-        wait_for(
-            lambda: self.call_method('request_check', str(request_id))['finished'], num_sec=300,
-            message='provision {} appliance(s) from sprout'.format(count))
-        data = self.call_method('request_check', str(request_id))
+        data = self.wait_for_request(str(request_id), num_sec=300)
         logger.debug(data)
         appliances = []
         for appliance in data['appliances']:
             appliances.append(IPAppliance(hostname=appliance['ip_address']))
         return appliances, request_id
 
+    def request_check_wait(self, request_id, progress=None, timeout=5):
+        """Long-polls the pool status, returns when the progress differs from ``progress``.
+
+        Falls back to ``request_check`` when the Sprout does not have the method yet.
+        """
+        if self._long_poll:
+            try:
+                return self.call_method(
+                    'request_check_wait', request_id, progress=progress, timeout=timeout)
+            except MethodNotFoundException:
+                logger.info("SPROUT: request_check_wait not supported, using request_check")
+                self._long_poll = False
+        return self.request_check(request_id)
+
+    def wait_for_request(self, request_id, num_sec=300, until='finished', delay=5, max_delay=30):
+        """Waits until the pool is finished, checking it with ``request_check_wait``.
+
+        The server waits only a few seconds for a change, so while the progress stays the same
+        the delay between the checks doubles up to ``max_delay``.
+
+        Args:
+            request_id: Pool id.
+            num_sec: How long to wait.
+            until: ``finished`` or ``fulfilled`` key of the pool data to wait for.
+            delay: Delay between the checks after a change of the progress.
+            max_delay: Upper bound of the delay between the checks.
+
+        Returns:
+            The last ``request_check`` data of the pool.
+        """
+        deadline = time.time() + num_sec
+        data = None
+        next_delay = delay
+        while True:
+            progress = data['progress'] if data is not None else None
+            data = self.request_check_wait(request_id, progress=progress)
+            logger.debug("SPROUT: pool %s at %s %%", request_id, data['progress'])
+            if data[until]:
+                return data
+            if data['progress'] != progress:
+                next_delay = delay
+            else:
+                next_delay = min(next_delay * 2, max_delay)
+            if time.time() + next_delay > deadline:
+                raise TimedOutError('Sprout pool {} not {} in {}s'.format(
+                    request_id, until, num_sec))
+            time.sleep(next_delay)
+
     def destroy_pool(self, pool_id):
         self.call_method('destroy_pool', id=pool_id)
@@ -1,4 +1,5 @@
 import re
+import time
 import pytest
 import random
 import attr
@@ -9,7 +10,6 @@ from cfme.utils import at_exit, conf
 from cfme.utils.log import logger as log
 from cfme.utils.path import project_path
 from .client import SproutClient, SproutException
-from cfme.utils.wait import wait_for
 
 
 _appliance_help = '''specify appliance URLs to use for distributed testing.
@@ -159,17 +159,20 @@ class SproutManager(object):
     pool = attr.ib(init=False, default=None)
     lease_time = attr.ib(init=False, default=None, repr=False)
     timer = attr.ib(init=False, default=None, repr=False)
+    progress = attr.ib(init=False, default=None, repr=False)
 
     def request_appliances(self, provision_request):
         self.request_pool(provision_request)
 
+        start = time.time()
         try:
-            result = wait_for(
-                self.check_fullfilled,
-                num_sec=provision_request.provision_timeout * 60,
-                delay=5,
-                message="requesting appliances was fulfilled"
-            )
+            self.client.wait_for_request(
+                self.pool, num_sec=provision_request.provision_timeout * 60, until='fulfilled')
+        except SproutException as e:
+            # TODO: ensure we only exit this way on sprout usage
+            self.destroy_pool()
+            log.error("sprout pool could not be fulfilled\n%s", str(e))
+            pytest.exit(1)
         except Exception:
             pool = self.request_check()
             dump_pool_info(log, pool)
@@ -181,7 +184,7 @@ class SproutManager(object):
             pool = self.request_check()
             dump_pool_info(log, pool)
 
-        log.info("Provisioning took %.1f seconds", result.duration)
+        log.info("Provisioning took %.1f seconds", time.time() - start)
         return pool["appliances"]
 
     def request_pool(self, provision_request):
@@ -226,13 +229,15 @@ class SproutManager(object):
 
     def check_fullfilled(self):
         try:
-            result = self.request_check()
+            # Long poll for a few seconds, a plain check on a Sprout without it
+            result = self.client.request_check_wait(self.pool, progress=self.progress)
         except SproutException as e:
             # TODO: ensure we only exit this way on sprout usage
             self.destroy_pool()
             log.error("sprout pool could not be fulfilled\n%s", str(e))
             pytest.exit(1)
 
+        self.progress = result['progress']
         log.debug("fulfilled at %f %%", result['progress'])
         return result["fulfilled"]
 
@@ -311,11 +316,11 @@ class ShutdownPlugin(object):
             log.debug("Trying to end appliance {}".format(ip_address))
             if config.getoption('--use-sprout'):
                 try:
-                    call_method = config._sprout_mgr.client.call_method
-                    log.debug("appliance data %r", call_method('appliance_data', ip_address))
-                    log.debug(
-                        "destroy appliance result: %r",
-                        call_method('destroy_appliance', ip_address))
+                    data, result = config._sprout_mgr.client.call_methods(
+                        ('appliance_data', (ip_address,)),
+                        ('destroy_appliance', (ip_address,)))
+                    log.debug("appliance data %r", data)
+                    log.debug("destroy appliance result: %r", result)
                 except Exception as e:
                     log.debug('Error trying to end sprout appliance %s', ip_address)
                     log.debug(e)
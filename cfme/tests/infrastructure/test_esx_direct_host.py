@@ -96,5 +96,6 @@ def test_validate(host_provider):
         * The provider should refresh without problems.
     """
     host_provider.create()
+    since = host_provider.last_refresh_date()
     host_provider.refresh_provider_relationships()
-    host_provider.validate()
+    host_provider.validate(since=since)
@@ -39,6 +39,8 @@ from .db import ApplianceDB
 from .implementations.rest import ViaREST
 from .implementations.ssui import ViaSSUI
 from .implementations.ui import ViaUI
+from .pipeline import ConfigurePipeline, ConfigureStep, DB_STEPS, clear_markers
+from .readiness import ReadinessWatcher
 from .services import SystemdService
 
 RUNNING_UNDER_SPROUT = os.environ.get("RUNNING_UNDER_SPROUT", "false") != "false"
@@ -235,6 +237,7 @@ class IPAppliance(object):
     httpd = SystemdService.declare(unit_name='httpd')
     sssd = SystemdService.declare(unit_name='sssd')
     db = ApplianceDB.declare()
+    readiness = ReadinessWatcher.declare()
 
     CONFIG_MAPPING = {
         'hostname': 'hostname',
@@ -469,6 +472,10 @@ class IPAppliance(object):
             key_address: Fetch encryption key from this address if set, generate a new key if
                          ``None`` (default ``None``)
             on_openstack: If appliance is running on Openstack provider (default ``False``)
+            force_configure: Runs also the steps that were already done on the appliance
+                             (default ``False``)
+            extra_steps: Additional :py:class:`cfme.utils.appliance.pipeline.ConfigureStep`
+                         to run, the web UI is waited for after them (default ``()``)
 
         """
 
@@ -479,9 +486,10 @@ class IPAppliance(object):
         key_address = kwargs.pop('key_address', None)
         db_address = kwargs.pop('db_address', None)
         on_openstack = kwargs.pop('on_openstack', False)
-        with self as ipapp:
-            ipapp.wait_for_ssh()
+        force_configure = kwargs.pop('force_configure', False)
+        extra_steps = kwargs.pop('extra_steps', ())
 
+        def audit_rules():
             # Debugging - ifcfg-eth0 overwritten by unknown process
             # Rules are permanent and will be reloade after machine reboot
             self.ssh_client.run_command(
@@ -492,30 +500,59 @@ class IPAppliance(object):
             self.ssh_client.run_command("systemctl daemon-reload", ensure_host=True)
             self.ssh_client.run_command("service auditd restart", ensure_host=True)
 
-            self.deploy_merkyl(start=True, log_callback=log_callback)
-            if fix_ntp_clock and not self.is_pod:
-                self.fix_ntp_clock(log_callback=log_callback)
-                # TODO: Handle external DB setup
-            # This is workaround for Openstack appliances to use only one disk for the VMDB
-            if on_openstack and self.is_downstream and not self.unpartitioned_disks:
-                self.configure_rhos_db_disk()
-
+        def setup_db():
             self.db.setup(region=region, key_address=key_address,
                           db_address=db_address, is_pod=self.is_pod)
-            self.wait_for_evm_service(timeout=1200, log_callback=log_callback)
-
-            # Some conditionally ran items require the evm service be
-            # restarted:
-            restart_evm = False
-            if loosen_pgssl:
-                self.db.loosen_pgssl()
-                restart_evm = True
-            if self.version >= '5.8':
-                self.configure_vm_console_cert(log_callback=log_callback)
-                restart_evm = True
-            if restart_evm:
-                self.restart_evm_service(log_callback=log_callback)
-            self.wait_for_web_ui(timeout=1800, log_callback=log_callback)
+
+        # Steps not depending on each other run concurrently, the ones with a marker are skipped
+        # when they were done on the appliance before with the same arguments. The clock and
+        # merkyl (which is deployed from the local bundle) are always done.
+        # TODO: Handle external DB setup
+        steps = [
+            ConfigureStep('audit_rules', audit_rules, marker=True),
+            ConfigureStep(
+                'merkyl', lambda: self.deploy_merkyl(start=True, log_callback=log_callback)),
+            ConfigureStep(
+                'ntp', lambda: self.fix_ntp_clock(log_callback=log_callback),
+                needed=lambda pipeline: fix_ntp_clock and not self.is_pod),
+            # This is workaround for Openstack appliances to use only one disk for the VMDB
+            ConfigureStep(
+                'rhos_db_disk', self.configure_rhos_db_disk, marker=True,
+                needed=lambda pipeline: (
+                    on_openstack and self.is_downstream and not self.unpartitioned_disks)),
+            # The clock is fixed first so that it does not jump during the database setup
+            ConfigureStep(
+                'db', setup_db, requires=['ntp', 'rhos_db_disk'], marker=True,
+                marker_args=[region, key_address, db_address, on_openstack, self.is_pod]),
+            ConfigureStep(
+                'evm_service',
+                lambda: self.wait_for_evm_service(timeout=1200, log_callback=log_callback),
+                requires=['db']),
+            ConfigureStep(
+                'loosen_pgssl', self.db.loosen_pgssl, requires=['evm_service'], marker=True,
+                needed=lambda pipeline: loosen_pgssl),
+            ConfigureStep(
+                'console_cert', lambda: self.configure_vm_console_cert(log_callback=log_callback),
+                requires=['evm_service'], marker=True,
+                marker_args=dict(conf.cfme_data.get('vm_console', {}).get('cert') or {}),
+                needed=lambda pipeline: self.version >= '5.8'),
+        ]
+        steps.extend(extra_steps)
+        # Some conditionally ran items require the evm service be restarted
+        steps.append(ConfigureStep(
+            'restart_evm', lambda: self.restart_evm_service(log_callback=log_callback),
+            requires=['loosen_pgssl', 'console_cert', 'vddk'],
+            needed=lambda pipeline: bool(
+                pipeline.ran & {'loosen_pgssl', 'console_cert', 'vddk'})))
+        steps.append(ConfigureStep(
+            'web_ui', lambda: self.wait_for_web_ui(timeout=1800, log_callback=log_callback),
+            requires=[step.name for step in steps]))
+        with self:
+            self.wait_for_ssh()
+            # The steps share the client, its lazy connect is not thread safe
+            self.ssh_client.connect()
+            ConfigurePipeline(
+                self, steps, log_callback=log_callback, force=force_configure).run()
 
     def configure_rhos_db_disk(self):
         loopback_script_path = "/usr/local/sbin/loopbacks"
@@ -660,46 +697,61 @@ class IPAppliance(object):
         finally:
             logging.disable(logging.NOTSET)
 
+    def _managed_ems(self):
+        """Returns ``(id, name)`` of the providers of recognized types, in one REST query"""
+        return [
+            (ems['id'], ems['name']) for ems in self.rest_api.collections.providers
+            if any(p_type in ems['type'] for p_type in RECOGNIZED_BY_IP + RECOGNIZED_BY_CREDS)]
+
+    @cached_property
+    def _provider_keys(self):
+        """Keys of all the configured providers by their names, built once per appliance"""
+        from cfme.utils.providers import list_providers
+        providers = list_providers(use_global_filters=False, appliance=self)
+        return {prov.name: prov.key for prov in providers}
+
+    def _index_providers(self, managed):
+        from cfme.utils.providers import ProviderIndex
+        index = ProviderIndex(managed, self._provider_keys, appliance=self)
+        if index.unrecognized:
+            self.log.warning(
+                "Unrecognized managed providers: {}".format(', '.join(index.unrecognized)))
+        self.__dict__['provider_index'] = index
+        return index
+
+    @cached_property
+    def provider_index(self):
+        """:py:class:`cfme.utils.providers.ProviderIndex` of the providers on this appliance
+
+        It is built from a single REST query and invalidated by the provider crud objects
+        when they create or delete a provider. Call :py:meth:`invalidate_provider_index` after
+        changing the providers any other way.
+        """
+        return self._index_providers(self._managed_ems())
+
+    def invalidate_provider_index(self):
+        clear_property_cache(self, 'provider_index')
+
     @property
     def managed_provider_names(self):
         """Returns a list of names for all providers configured on the appliance
 
         Note:
             Unlike ``managed_known_providers``, this will also return names of providers that were
-            not recognized, but are present.
+            not recognized, but are present. It always queries the appliance and refreshes
+            :py:attr:`provider_index`.
         """
-        known_ems_list = []
-        for ems in self.rest_api.collections.providers:
-            if not any(
-                    p_type in ems['type'] for p_type in RECOGNIZED_BY_IP + RECOGNIZED_BY_CREDS):
-                continue
-            known_ems_list.append(ems['name'])
-        return known_ems_list
+        return self._index_providers(self._managed_ems()).names
 
     @property
     def managed_known_providers(self):
-        """Returns a set of provider crud objects of known providers managed by this appliance
+        """Returns a list of provider crud objects of known providers managed by this appliance
 
         Note:
-            Recognized by name only.
+            Recognized by name only, looked up in :py:attr:`provider_index`. The crud objects
+            are created on every call, so changing them does not affect other callers.
         """
-        from cfme.utils.providers import list_providers
-        prov_cruds = list_providers(use_global_filters=False, appliance=self)
-
-        found_cruds = set()
-        unrecognized_ems_names = set()
-        for ems_name in self.managed_provider_names:
-            for prov in prov_cruds:
-                # Name check is authoritative and the only proper way to recognize a known provider
-                if ems_name == prov.name:
-                    found_cruds.add(prov)
-                    break
-            else:
-                unrecognized_ems_names.add(ems_name)
-        if unrecognized_ems_names:
-            self.log.warning(
-                "Unrecognized managed providers: {}".format(', '.join(unrecognized_ems_names)))
-        return list(found_cruds)
+        return self.provider_index.known_providers
 
     @classmethod
     def from_url(cls, url, **kwargs):
@@ -1465,7 +1517,11 @@ class IPAppliance(object):
         for try_num in range(num_of_tries):
             if self._check_appliance_ui_wait_fn():
                 was_running_count += 1
-            sleep(3)
+            if 0 < was_running_count <= try_num:
+                # Both up and down seen already, no need to check further
+                return unsure
+            if try_num < num_of_tries - 1:
+                sleep(3)
 
         if was_running_count == 0:
             return False
@@ -1527,13 +1583,12 @@ class IPAppliance(object):
                     # Don't care if it's still running
                     pass
                 log_callback('killing any remaining processes and restarting postgres')
-                ssh.run_command(
-                    'killall -9 ruby; systemctl restart {}-postgresql'
-                    .format(self.db.postgres_version))
-                log_callback('Waiting for database to be available')
-                wait_for(
-                    lambda: self.db.is_online, num_sec=90, delay=10, fail_condition=False,
-                    message="database to be available")
+                with self.readiness.watch() as watch:
+                    ssh.run_command(
+                        'killall -9 ruby; systemctl restart {}-postgresql'
+                        .format(self.db.postgres_version))
+                    log_callback('Waiting for database to be available')
+                    watch.wait_for('db', lambda: self.db.is_online, timeout=90)
                 self.evmserverd.start()
             else:
                 self.evmserverd.restart()
@@ -1546,9 +1601,8 @@ class IPAppliance(object):
             timeout: Number of seconds to wait until timeout (default ``900``)
         """
         log_callback('Waiting for evmserverd to be running')
-        result, wait = wait_for(self.is_evm_service_running, num_sec=timeout,
-                                fail_condition=False, delay=10)
-        return result
+        self.readiness.wait_for('evm', self.is_evm_service_running, timeout=timeout)
+        return True
 
     @logger_wrap("Rebooting Appliance: {}")
     def reboot(self, wait_for_web_ui=True, log_callback=None):
@@ -1575,6 +1629,10 @@ class IPAppliance(object):
         """
         prefix = "" if running else "dis"
         (log_callback or self.log.info)('Waiting for web UI to ' + prefix + 'appear')
+        if running:
+            # the UI workers announce themselves in evm.log, probe right after that
+            self.readiness.wait_for('ui', self._check_appliance_ui_wait_fn, timeout=timeout)
+            return True
         result, wait = wait_for(self._check_appliance_ui_wait_fn, num_sec=timeout,
             fail_condition=not running, delay=10)
         return result
@@ -2124,6 +2182,7 @@ class IPAppliance(object):
         logger.info('Destroying all appliance providers')
         for prov in self.rest_api.collections.providers:
             prov.action.delete()
+        self.invalidate_provider_index()
 
     def reset_automate_model(self):
         with self.ssh_client as ssh_client:
@@ -2138,12 +2197,15 @@ class IPAppliance(object):
             self.db.postgres_version))
         self.ssh_client.run_command(
             'cd /var/www/miq/vmdb; bin/rake evm:db:reset')
+        clear_markers(self.ssh_client, DB_STEPS)
         self.ssh_client.run_rake_command('db:seed')
         self.ssh_client.run_command('service collectd start')
         self.ssh_client.run_command('rm -rf /var/www/miq/vmdb/log/*.log*')
         self.ssh_client.run_command('rm -rf /var/www/miq/vmdb/log/apache/*.log*')
         self.ssh_client.run_command('service evmserverd start')
         self.wait_for_evm_service()
+        # evm:db:reset removed all the providers
+        self.invalidate_provider_index()
         logger.debug('Cleaned appliance in: {}'.format(round(time() - starttime, 2)))
 
     def set_full_refresh_threshold(self, threshold=100):
@@ -2506,21 +2568,28 @@ class Appliance(IPAppliance):
 
         """
         log_callback("Configuring appliance {} on {}".format(self.vm_name, self.provider_key))
+        vddk_installed = False
         if kwargs:
             with self:
                 self._custom_configure(**kwargs)
         else:
-            # Defer to the IPAppliance.
-            super(Appliance, self).configure(log_callback=log_callback)
+            # Defer to the IPAppliance, the VDDK gets installed alongside the other steps
+            extra_steps = []
+            if setup_fleece and self.is_on_vsphere:
+                extra_steps.append(ConfigureStep(
+                    'vddk', lambda: self.install_vddk(log_callback=log_callback), marker=True))
+                vddk_installed = True
+            super(Appliance, self).configure(log_callback=log_callback, extra_steps=extra_steps)
         # And do configure the fleecing if requested
         if setup_fleece:
-            self.configure_fleecing(log_callback=log_callback)
+            self.configure_fleecing(install_vddk=not vddk_installed, log_callback=log_callback)
 
     @logger_wrap("Configure fleecing: {}")
-    def configure_fleecing(self, log_callback=None):
+    def configure_fleecing(self, install_vddk=True, log_callback=None):
         with self(browser_steal=True):
-            if self.is_on_vsphere:
-                self.install_vddk(reboot=True, log_callback=log_callback)
+            if self.is_on_vsphere and install_vddk:
+                self.install_vddk(log_callback=log_callback)
+                self.restart_evm_service(log_callback=log_callback)
                 self.wait_for_web_ui(log_callback=log_callback)
 
             if self.is_on_rhev:
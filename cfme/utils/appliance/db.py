@@ -8,6 +8,7 @@ from cfme.utils.conf import credentials
 from cfme.utils.path import scripts_path
 from cfme.utils.wait import wait_for
 
+from .pipeline import DB_STEPS, clear_markers
 from .plugin import AppliancePlugin, AppliancePluginException
 
 
@@ -28,7 +29,7 @@ class ApplianceDB(AppliancePlugin):
     @cached_property
     def client(self):
         # slightly crappy: anything that changes self.address should also del(self.client)
-        return db.Db(self.address)
+        return db.Db(self.address, version=self.appliance.version)
 
     @cached_property
     def address(self):
@@ -88,6 +89,7 @@ class ApplianceDB(AppliancePlugin):
                 "psql -l | grep vmdb_production | wc -l", timeout=15)
             return result.success
         wait_for(_db_dropped, delay=5, timeout=60, message="drop the vmdb_production DB")
+        clear_markers(self.appliance.ssh_client, DB_STEPS)
 
     def create(self):
         """ Creates new vmdb_production database
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import json
 import time
+from collections import defaultdict
 from inspect import isclass
 from time import sleep
 
@@ -19,6 +20,7 @@ from widgetastic.widget import Text, View
 from cfme import exceptions
 from cfme.utils.browser import manager
 from cfme.utils.log import logger, create_sublogger
+from cfme.utils.pretty import Pretty
 from cfme.utils.version import Version
 from cfme.utils.wait import wait_for
 from fixtures.pytest_store import store
@@ -206,6 +208,86 @@ class MiqBrowser(Browser):
         return self.appliance.version
 
 
+class NavigationCache(object):
+    """Remembers the URL every navigation landed on, so the next one can go straight there.
+
+    The URLs are kept per appliance, destination and identity of the navigated object. A
+    remembered URL is only trusted when the destination view is displayed after opening it,
+    otherwise it is forgotten and the full navigation runs. Navigations with arguments are not
+    cached, the arguments are not part of the key. Time spent navigating is collected per
+    destination and by the way the destination was reached.
+
+    Set ``DISABLE_NAVIGATION_CACHE`` in the environment to always navigate the full way.
+    """
+    #: URLs depending on the state of the accordion trees rather than on the URL itself
+    UNCACHEABLE_URL_PARTS = ('explorer',)
+
+    def __init__(self):
+        self.urls = {}
+        # destination -> how it was reached -> [durations in ms]
+        self.timings = defaultdict(lambda: defaultdict(list))
+
+    @property
+    def enabled(self):
+        return not os.environ.get('DISABLE_NAVIGATION_CACHE', False)
+
+    @staticmethod
+    def destination(step):
+        obj_class = step.obj if isclass(step.obj) else type(step.obj)
+        return '{}.{}'.format(obj_class.__name__, step._name)
+
+    @classmethod
+    def key(cls, step):
+        """Returns the key of the navigation or None if the object has no stable identity"""
+        identity = None if isclass(step.obj) else repr(step.obj)
+        if identity is not None and ' at 0x' in identity:
+            # default repr, different for every instance of the same object
+            return None
+        if isinstance(step.obj, Pretty) and not step.obj.pretty_attrs:
+            # same repr for every instance of the class
+            return None
+        return step.appliance.hostname, cls.destination(step), identity
+
+    def get(self, step):
+        key = self.key(step)
+        return self.urls.get(key) if key is not None else None
+
+    def remember(self, step, url):
+        key = self.key(step)
+        if key is None or any(part in url for part in self.UNCACHEABLE_URL_PARTS):
+            return
+        self.urls[key] = url
+
+    def forget(self, step):
+        self.urls.pop(self.key(step), None)
+
+    def record(self, step, reached_by, duration):
+        self.timings[self.destination(step)][reached_by].append(duration)
+
+    def merge(self, timings):
+        """Adds the timings collected by another cache, eg. on a parallelizer slave"""
+        for destination, by in timings.items():
+            for reached_by, durations in by.items():
+                self.timings[destination][reached_by].extend(durations)
+
+    def summary(self, limit=20):
+        """Returns lines describing the destinations that took the most time"""
+        totals = sorted(
+            ((sum(sum(d) for d in by.values()), destination, by)
+             for destination, by in self.timings.items()),
+            reverse=True)
+        lines = []
+        for total, destination, by in totals[:limit]:
+            lines.append('{}: {}ms total, {}'.format(destination, total, ', '.join(
+                '{} {}x avg {}ms'.format(
+                    reached_by, len(durations), sum(durations) // len(durations))
+                for reached_by, durations in sorted(by.items()))))
+        return lines
+
+
+navigation_cache = NavigationCache()
+
+
 def can_skip_badness_test(fn):
     """Decorator for setting a noop"""
     fn._can_skip_badness_test = True
@@ -214,6 +296,8 @@ def can_skip_badness_test(fn):
 
 class CFMENavigateStep(NavigateStep):
     VIEW = None
+    #: Whether the URL of the destination can be opened directly, see :py:class:`NavigationCache`
+    CACHE_URL = True
 
     @cached_property
     def view(self):
@@ -435,6 +519,24 @@ class CFMENavigateStep(NavigateStep):
             # If given a "start" nav destination, it won't be valid after quitting the browser
             self.go(_tries, *args, **go_kwargs)
 
+    def go_to_cached_url(self, *args, **kwargs):
+        """Opens the URL this navigation landed on the last time, returns whether it got here"""
+        url = navigation_cache.get(self)
+        if url is None:
+            return False
+        self.log_message("Opening cached URL {}".format(url))
+        self.appliance.browser.widgetastic.url = url
+        self.appliance.browser.widgetastic.plugin.ensure_page_safe()
+        if self.am_i_here():
+            return True
+        self.log_message("Cached URL {} did not lead here, forgetting it".format(url))
+        navigation_cache.forget(self)
+        return False
+
+    @property
+    def use_cached_url(self):
+        return self.CACHE_URL and self.VIEW is not None and navigation_cache.enabled
+
     @can_skip_badness_test
     def resetter(self, *args, **kwargs):
         pass
@@ -452,8 +554,9 @@ class CFMENavigateStep(NavigateStep):
         str_msg = "[UI-NAV/{}/{}]: {}".format(class_name, self._name, msg)
         getattr(logger, level)(str_msg)
 
-    def construct_message(self, here, resetter, view, duration, waited):
-        str_here = "Already Here" if here else "Needed Navigation"
+    def construct_message(self, here, resetter, view, duration, waited, cached=False):
+        str_here = "Already Here" if here else (
+            "Cached URL Used" if cached else "Needed Navigation")
         str_resetter = "Resetter Used" if resetter else "No Resetter"
         str_view = "View Returned" if view else "No View Available"
         str_waited = "Waited on View" if waited else "No Wait on View"
@@ -475,8 +578,10 @@ class CFMENavigateStep(NavigateStep):
         for arg in nav_args:
             if arg in kwargs:
                 nav_args[arg] = kwargs.pop(arg)
+        use_cached_url = self.use_cached_url and not args and not kwargs
         self.check_for_badness(self.pre_navigate, _tries, nav_args, *args, **kwargs)
         here = False
+        cached = False
         resetter_used = False
         waited = False
         try:
@@ -484,7 +589,15 @@ class CFMENavigateStep(NavigateStep):
         except Exception as e:
             self.log_message(
                 "Exception raised [{}] whilst checking if already here".format(e), level="error")
-        if not here:
+        if not here and use_cached_url:
+            try:
+                cached = self.check_for_badness(
+                    self.go_to_cached_url, _tries, nav_args, *args, **kwargs)
+            except Exception as e:
+                self.log_message(
+                    "Exception raised [{}] whilst opening cached URL".format(e), level="error")
+                navigation_cache.forget(self)
+        if not here and not cached:
             self.log_message("Prerequisite Needed")
             self.prerequisite_view = self.prerequisite()
             try:
@@ -502,6 +615,14 @@ class CFMENavigateStep(NavigateStep):
         self.check_for_badness(self.post_navigate, _tries, nav_args, *args, **kwargs)
         view = self.view if self.VIEW is not None else None
         duration = int((time.time() - start_time) * 1000)
+        if here:
+            navigation_cache.record(self, 'here', duration)
+        elif cached:
+            navigation_cache.record(self, 'cached', duration)
+        else:
+            navigation_cache.record(self, 'full', duration)
+            if use_cached_url:
+                navigation_cache.remember(self, self.appliance.browser.widgetastic.url)
         if view and nav_args['wait_for_view'] and not os.environ.get(
                 'DISABLE_NAVIGATE_ASSERT', False):
             waited = True
@@ -510,7 +631,8 @@ class CFMENavigateStep(NavigateStep):
                 message="Waiting for view [{}] to display".format(view.__class__.__name__)
             )
         self.log_message(
-            self.construct_message(here, resetter_used, view, duration, waited), level="info"
+            self.construct_message(here, resetter_used, view, duration, waited, cached),
+            level="info"
         )
         return view
 
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Appliance configuration as a graph of steps.
+
+Every :py:class:`ConfigureStep` declares the steps it requires. :py:class:`ConfigurePipeline`
+runs the steps as soon as their requirements are done, the independent ones concurrently. Steps
+with a marker leave it on the appliance when they finish, so configuring the same appliance again
+with the same arguments skips them. Only the steps whose effect persists on the appliance disk
+should have a marker.
+"""
+import hashlib
+import json
+import sys
+import time
+from collections import OrderedDict
+from threading import Thread
+
+import attr
+import six
+from six.moves.queue import Queue
+
+from cfme.utils.log import logger
+
+#: Directory on the appliance holding the markers of the finished steps
+MARKER_DIR = '/var/lib/cfme_qe/configured'
+
+#: Marked steps whose effect lives in the database, their markers go when it is dropped or reset
+DB_STEPS = ('db', 'loosen_pgssl')
+
+
+def clear_markers(ssh_client, names):
+    """Removes the markers of the steps from the appliance, whatever their arguments were"""
+    ssh_client.run_command('rm -f {}'.format(
+        ' '.join('{}/{}-*'.format(MARKER_DIR, name) for name in names)))
+
+
+@attr.s
+class ConfigureStep(object):
+    """One step of the appliance configuration.
+
+    Args:
+        name: Name of the step, other steps require it by this name.
+        func: Callable doing the step.
+        requires: Names of the steps that have to be done first. Steps that are not in the
+            pipeline count as done.
+        marker: Whether to mark the step done on the appliance and skip it next time.
+        marker_args: Arguments the effect of the step depends on, the step is not skipped if it
+            was done with other arguments. Has to be serializable to json.
+        needed: Callable taking the pipeline, returns whether to run the step at all. Called once
+            the requirements are done.
+    """
+    name = attr.ib()
+    func = attr.ib()
+    requires = attr.ib(default=(), convert=tuple)
+    marker = attr.ib(default=False)
+    needed = attr.ib(default=None)
+    marker_args = attr.ib(default=())
+
+
+class ConfigurePipeline(object):
+    """Runs the configure steps in the order of their dependencies.
+
+    Args:
+        appliance: The appliance being configured.
+        steps: :py:class:`ConfigureStep` instances.
+        log_callback: Callable for the progress messages.
+        workers: How many steps can run at once.
+        force: Run the marked steps even when they are done on the appliance.
+    """
+    def __init__(self, appliance, steps, log_callback=None, workers=4, force=False):
+        self.appliance = appliance
+        self.steps = OrderedDict((step.name, step) for step in steps)
+        self.log_callback = log_callback or logger.info
+        self.workers = workers
+        self.force = force
+        #: Names of the steps that ran in this pipeline
+        self.ran = set()
+        #: Step name -> (outcome, seconds)
+        self.timings = OrderedDict()
+        for step in steps:
+            unknown = [name for name in step.requires if name not in self.steps]
+            if unknown:
+                logger.debug('Step %s requires %s not in the pipeline', step.name, unknown)
+
+    def _marked(self):
+        if self.force or not any(step.marker for step in self.steps.values()):
+            return set()
+        result = self.appliance.ssh_client.run_command('ls -1 {}'.format(MARKER_DIR))
+        return set(result.output.split()) if result.success else set()
+
+    def marker_name(self, step):
+        """Returns the name of the marker of the step, keyed by the appliance and the arguments
+
+        The address is part of the key so that the markers of an appliance made into a template
+        do not count on the appliances deployed from it.
+        """
+        key = json.dumps([self.appliance.hostname, step.marker_args], sort_keys=True, default=str)
+        return '{}-{}'.format(step.name, hashlib.sha1(key.encode('utf-8')).hexdigest()[:12])
+
+    def _mark(self, step):
+        self.appliance.ssh_client.run_command(
+            'mkdir -p {0} && touch {0}/{1}'.format(MARKER_DIR, self.marker_name(step)))
+
+    def _run_step(self, step, results):
+        start = time.time()
+        try:
+            step.func()
+            if step.marker:
+                self._mark(step)
+            results.put((step, None, time.time() - start))
+        except Exception:
+            results.put((step, sys.exc_info(), time.time() - start))
+
+    def _start_ready(self, pending, finished, running, results):
+        """Starts the steps with all the requirements done, as long as there are free workers"""
+        progress = True
+        while progress:
+            progress = False
+            for step in list(pending.values()):
+                if len(running) >= self.workers:
+                    return
+                if any(name in self.steps and name not in finished for name in step.requires):
+                    continue
+                pending.pop(step.name)
+                progress = True
+                if step.needed is not None and not step.needed(self):
+                    self.timings[step.name] = ('not needed', 0.0)
+                    finished.add(step.name)
+                    continue
+                self.log_callback('Configure step {} started'.format(step.name))
+                thread = Thread(target=self._run_step, args=(step, results),
+                                name='configure-{}'.format(step.name))
+                thread.daemon = True
+                running[step.name] = thread
+                thread.start()
+
+    def run(self):
+        """Runs the steps, raises the error of the first failed step after the running ones end
+
+        Returns:
+            The end to end time in seconds.
+        """
+        start = time.time()
+        marked = self._marked()
+        pending = OrderedDict(self.steps)
+        finished = set()
+        for step in list(pending.values()):
+            if step.marker and self.marker_name(step) in marked:
+                self.timings[step.name] = ('done before', 0.0)
+                finished.add(pending.pop(step.name).name)
+        running = {}
+        results = Queue()
+        error = None
+        while True:
+            if error is None:
+                self._start_ready(pending, finished, running, results)
+            if not running:
+                break
+            step, exc_info, duration = results.get()
+            running.pop(step.name).join()
+            if exc_info is None:
+                self.timings[step.name] = ('ran', duration)
+                self.ran.add(step.name)
+                finished.add(step.name)
+                self.log_callback('Configure step {} done in {:.1f}s'.format(
+                    step.name, duration))
+            else:
+                self.timings[step.name] = ('failed', duration)
+                error = error or exc_info
+        duration = time.time() - start
+        self.log_callback(self.report(duration))
+        if error is not None:
+            six.reraise(*error)
+        if pending:
+            raise ValueError('Configure steps {} can never run'.format(', '.join(pending)))
+        return duration
+
+    def report(self, duration):
+        """Returns the timing report of the steps"""
+        lines = ['Configured {} in {:.1f}s:'.format(self.appliance.hostname, duration)]
+        for name, (outcome, seconds) in self.timings.items():
+            lines.append('  {:<20} {:<12} {:.1f}s'.format(name, outcome, seconds))
+        return '\n'.join(lines)
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""Event driven waiting for the appliance services.
+
+Instead of polling every service with a new SSH or HTTP request, :py:class:`ReadinessWatcher`
+follows the systemd journal and ``evm.log`` of the appliance over one streamed SSH channel and
+probes the service as soon as its log says it came online, to confirm it. The probe also runs
+every ``fallback_delay`` seconds like the polling did, so a log message that was missed or
+changed between the versions does not make the waiting slower.
+
+Usage:
+
+    .. code-block:: python
+
+        # Start watching before the action, so that no event is missed
+        with appliance.readiness.watch() as watch:
+            appliance.evmserverd.restart()
+            watch.wait_for('ui', appliance._check_appliance_ui_wait_fn)
+"""
+import re
+import socket
+import time
+from contextlib import contextmanager
+
+import attr
+
+from cfme.utils.wait import TimedOutError
+from .plugin import AppliancePlugin
+
+EVM_LOG = '/var/www/miq/vmdb/log/evm.log'
+
+#: Event name -> patterns of the journal and evm.log lines that announce it
+EVENTS = {
+    'db': [re.compile(r'Started PostgreSQL database server')],
+    'evm': [re.compile(r'Started EVM server daemon')],
+    'ui': [re.compile(r'MiqUiWorker.*\bstarted\b', re.IGNORECASE)],
+}
+
+
+class LogWatch(object):
+    """Streams the new lines of the journal and evm.log over one SSH channel.
+
+    If the channel can not be opened (e.g. pods and containers) or it gets closed (e.g. on
+    reboot), no events are seen and the waiting falls back to probing.
+    """
+    def __init__(self, ssh_client, units, logger):
+        self.logger = logger
+        self.seen = set()
+        self._buffer = ''
+        self.channel = None
+        if ssh_client.is_container or ssh_client.is_pod:
+            return
+        command = 'journalctl --follow --lines=0 --output=cat {} & tail --lines=0 -F {}'.format(
+            ' '.join('--unit={}'.format(unit) for unit in units), EVM_LOG)
+        try:
+            self.channel = ssh_client.get_transport().open_session()
+            # With a pty, the followers get killed when the channel is closed
+            self.channel.get_pty()
+            self.channel.exec_command(command)
+        except Exception as e:
+            self.logger.warning('Could not follow the appliance logs, probing only: %s', e)
+            self.channel = None
+
+    @property
+    def streaming(self):
+        return self.channel is not None and not self.channel.closed
+
+    def close(self):
+        if self.channel is not None:
+            self.channel.close()
+
+    def _match(self, line):
+        for event, patterns in EVENTS.items():
+            if any(pattern.search(line) for pattern in patterns):
+                if event not in self.seen:
+                    self.logger.info('Appliance event %r: %s', event, line)
+                self.seen.add(event)
+
+    def follow(self, seconds):
+        """Processes the lines arriving in the given time, returns early on a new event."""
+        deadline = time.time() + seconds
+        seen = len(self.seen)
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0 or len(self.seen) > seen:
+                return
+            if not self.streaming:
+                time.sleep(remaining)
+                return
+            self.channel.settimeout(remaining)
+            try:
+                data = self.channel.recv(4096)
+            except socket.timeout:
+                return
+            if not data:
+                self.logger.info('Appliance log channel closed')
+                self.close()
+                continue
+            lines = (self._buffer + data).split('\n')
+            self._buffer = lines.pop()
+            for line in lines:
+                self._match(line.rstrip('\r'))
+
+    def wait_for(self, event, confirm, timeout=900, fallback_delay=10, confirm_tries=10,
+                 confirm_delay=3):
+        """Waits for the event in the logs, confirmed by the probe
+
+        Args:
+            event: One of :py:data:`EVENTS`.
+            confirm: Callable probing the service, returns whether it is up.
+            timeout: How long to wait.
+            fallback_delay: How often to probe without the event.
+            confirm_tries: How many times to probe after the event, services usually need a few
+                seconds after announcing themselves.
+            confirm_delay: Delay between those probes.
+
+        Returns:
+            Seconds it took.
+        """
+        start = time.time()
+        deadline = start + timeout
+        next_probe = start
+        while True:
+            now = time.time()
+            if event in self.seen:
+                self.seen.discard(event)
+                for attempt in range(confirm_tries):
+                    if confirm():
+                        return time.time() - start
+                    if time.time() + confirm_delay >= deadline:
+                        break
+                    time.sleep(confirm_delay)
+                next_probe = time.time() + fallback_delay
+            elif now >= next_probe:
+                if confirm():
+                    return time.time() - start
+                next_probe = time.time() + fallback_delay
+            now = time.time()
+            if now >= deadline:
+                raise TimedOutError('{} was not up in {}s'.format(event, timeout))
+            self.follow(min(next_probe, deadline) - now)
+
+
+@attr.s
+class ReadinessWatcher(AppliancePlugin):
+    """Waits for the appliance services by following their logs, see the module docs."""
+
+    @property
+    def units(self):
+        return ['evmserverd', self.appliance.db.service_name]
+
+    @contextmanager
+    def watch(self):
+        """Follows the logs for the duration of the block, yields :py:class:`LogWatch`"""
+        watch = LogWatch(self.appliance.ssh_client, self.units, self.logger)
+        try:
+            yield watch
+        finally:
+            watch.close()
+
+    def wait_for(self, event, confirm, timeout=900, **kwargs):
+        """Waits for the event that might have already happened, see :py:meth:`LogWatch.wait_for`
+        """
+        with self.watch() as watch:
+            duration = watch.wait_for(event, confirm, timeout=timeout, **kwargs)
+        self.logger.info('Appliance %r was up after %.1fs', event, duration)
+        return duration
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Compact, mergeable representation of the simplecov line coverage
+
+The raw ``.resultset.json`` of every appliance process repeats all the covered files, so the
+results of a whole run are big and slow to merge in one place. Line hits of one file are merged
+by adding them up line by line (``null`` marks a line that can not be covered), so the results
+can be reduced anywhere and merged again later in any order.
+
+The reduced results are stored as gzipped JSON lines, one source file per line:
+
+.. code-block:: text
+
+    {"file": "/var/www/miq/vmdb/app/models/vm.rb", "lines": [1, null, 0, 12]}
+
+The module only uses the standard library, so it can be uploaded to an appliance and run there
+to reduce the results of all its processes:
+
+.. code-block:: bash
+
+    python coverage_hits.py reduce /var/www/miq/vmdb/coverage /tmp/ui-coverage-hits.jsonl.gz
+"""
+import gzip
+import json
+import os
+import sys
+import time
+
+#: Key of the merged results in the simplecov resultset, same as the coverage_merger.rb uses
+MERGED_COMMAND_NAME = 'merged-coverage-data'
+
+
+def merge_lines(first, second):
+    """Adds up two lists of line hits of the same file."""
+    if len(first) < len(second):
+        first, second = second, first
+    result = list(first)
+    for index, hits in enumerate(second):
+        if hits is None:
+            continue
+        result[index] = hits if result[index] is None else result[index] + hits
+    return result
+
+
+class LineHits(object):
+    """Line hits of the source files merged together."""
+    def __init__(self):
+        self.files = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def add(self, filename, lines):
+        # Newer rubies store {"lines": [...], "branches": ...} instead of the plain list
+        if isinstance(lines, dict):
+            lines = lines.get('lines') or []
+        current = self.files.get(filename)
+        self.files[filename] = list(lines) if current is None else merge_lines(current, lines)
+
+    def add_resultset(self, path):
+        """Merges in a simplecov ``.resultset.json`` file."""
+        with open(path) as f:
+            resultset = json.load(f)
+        for result in resultset.values():
+            for filename, lines in result.get('coverage', {}).items():
+                self.add(filename, lines)
+
+    def read(self, path):
+        """Merges in the reduced results file, one line at a time."""
+        with gzip.open(path, 'rb') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    self.add(record['file'], record['lines'])
+
+    def write(self, path):
+        """Writes out the reduced results file."""
+        with gzip.open(path, 'wb') as f:
+            for filename in sorted(self.files):
+                f.write(json.dumps({'file': filename, 'lines': self.files[filename]}))
+                f.write('\n')
+
+    def resultset(self):
+        """Returns the merged results as a simplecov resultset to generate the reports from."""
+        return {
+            MERGED_COMMAND_NAME: {
+                'coverage': self.files,
+                'timestamp': int(time.time()),
+            }
+        }
+
+
+def find_resultsets(root):
+    """Yields paths of all the ``.resultset.json`` files under root."""
+    for dirpath, _, filenames in os.walk(root):
+        if '.resultset.json' in filenames:
+            yield os.path.join(dirpath, '.resultset.json')
+
+
+def reduce_results(root, output):
+    """Merges all the simplecov results under root into the reduced results file."""
+    hits = LineHits()
+    for path in find_resultsets(root):
+        hits.add_resultset(path)
+    hits.write(output)
+    return hits
+
+
+def main(argv):
+    if len(argv) != 4 or argv[1] != 'reduce':
+        sys.stderr.write('Usage: {} reduce COVERAGE_ROOT OUTPUT\n'.format(argv[0]))
+        return 2
+    hits = reduce_results(argv[2], argv[3])
+    sys.stdout.write('Reduced results of {} files\n'.format(len(hits)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,7 +1,12 @@
+import fcntl
+import os
+import re
 from collections import Mapping
 from contextlib import contextmanager
 from itertools import izip
 
+from six.moves import cPickle as pickle
+
 from cached_property import cached_property
 from sqlalchemy import MetaData, create_engine, event, inspect
 from sqlalchemy.exc import ArgumentError, DisconnectionError, InvalidRequestError
@@ -12,6 +17,16 @@ from sqlalchemy.pool import Pool
 from fixtures.pytest_store import store
 from cfme.utils import conf
 from cfme.utils.log import logger
+from cfme.utils.path import cache_path
+
+#: Reflected schemas, one file per appliance version and the last migration
+schema_cache_path = cache_path.join('db_schema')
+
+#: Tables reflected together with the first table used, the ones the tests use the most
+PREWARM_TABLES = (
+    'ext_management_systems', 'vms', 'hosts', 'storages', 'hardwares', 'miq_servers',
+    'server_roles', 'miq_tasks', 'miq_ae_namespaces', 'container_projects',
+)
 
 
 @event.listens_for(Pool, "checkout")
@@ -68,11 +83,20 @@ class Db(Mapping):
         a latent connection, this can be extremely slow, which will affect methods that return
         tables, like the mapping interface or :py:meth:`values`.
 
+        The reflected tables are therefore saved in :py:data:`schema_cache_path`, keyed by the
+        appliance version and the last schema migration, and loaded from there by the next
+        ``Db`` objects of the same schema, in any process. The processes merge their tables into
+        the saved ones. The first table reflected is reflected together with
+        :py:data:`PREWARM_TABLES`.
+
     """
-    def __init__(self, hostname=None, credentials=None, port=None):
+    def __init__(self, hostname=None, credentials=None, port=None, version=None):
         self._table_cache = {}
+        self._prewarmed = False
         self.hostname = hostname or store.current_appliance.db.address
         self.port = port or store.current_appliance.db_port
+        #: Appliance version, part of the schema cache key
+        self.version = version
 
         self.credentials = credentials or conf.credentials['database']
 
@@ -133,7 +157,7 @@ class Db(Mapping):
 
     def copy(self):
         """Copy this database instance, keeping the same credentials and hostname"""
-        return type(self)(self.hostname, self.credentials)
+        return type(self)(self.hostname, self.credentials, version=self.version)
 
     def __eq__(self, other):
         """Check if this db is equal to another db"""
@@ -186,7 +210,60 @@ class Db(Mapping):
             use :py:meth:`reflect_table`.
 
         """
-        return MetaData(bind=self.engine)
+        metadata = self._cached_schema.get('metadata') or MetaData()
+        metadata.bind = self.engine
+        return metadata
+
+    @cached_property
+    def schema_key(self):
+        """Identifies the schema by the appliance version and the last migration
+
+        ``None`` if the last migration can not be found, the schema is not cached then.
+        """
+        try:
+            head = self.engine.execute('SELECT max(version) FROM schema_migrations').scalar()
+        except Exception as e:
+            logger.info('[DB] Not caching the schema, no migrations found: %s', e)
+            return None
+        return re.sub(r'[^\w.-]', '_', '{}-{}'.format(self.version or 'unknown', head))
+
+    @cached_property
+    def _cached_schema(self):
+        """The schema loaded from the cache, empty dictionary if there is none"""
+        if self.schema_key is None:
+            return {}
+        schema = _load_schema(schema_cache_path.join('{}.pickle'.format(self.schema_key)))
+        if schema:
+            logger.info('[DB] Loaded %d tables from the cached schema %s',
+                        len(schema['metadata'].tables), self.schema_key)
+        return schema
+
+    def _save_schema(self):
+        """Merges the reflected tables into the cache, replacing it atomically
+
+        The other processes save their tables to the same file, so the merge is done under a lock.
+        """
+        if self.schema_key is None:
+            return
+        schema_cache_path.ensure(dir=True)
+        path = schema_cache_path.join('{}.pickle'.format(self.schema_key))
+        temp_path = '{}.{}.tmp'.format(path.strpath, os.getpid())
+        try:
+            with _schema_lock(path):
+                metadata = _load_schema(path).get('metadata')
+                if metadata is None:
+                    metadata = self.metadata
+                else:
+                    for table in self.metadata.tables.values():
+                        if table.key not in metadata.tables:
+                            table.tometadata(metadata)
+                with open(temp_path, 'wb') as f:
+                    pickle.dump(
+                        {'metadata': metadata, 'table_names': self.table_names}, f,
+                        pickle.HIGHEST_PROTOCOL)
+                os.rename(temp_path, path.strpath)
+        except Exception as e:
+            logger.warning('[DB] Could not save the schema cache %s: %s', path.strpath, e)
 
     @cached_property
     def db_url(self):
@@ -200,7 +277,8 @@ class Db(Mapping):
     def table_names(self):
         """A sorted list of table names available in this database."""
         # rails table names follow similar rules as pep8 identifiers; expose them as such
-        return sorted(inspect(self.engine).get_table_names())
+        return self._cached_schema.get('table_names') or sorted(
+            inspect(self.engine).get_table_names())
 
     @cached_property
     def session(self):
@@ -246,7 +324,19 @@ class Db(Mapping):
             table_name: The name of a table to reflect
 
         """
-        self.metadata.reflect(only=[table_name])
+        self.reflect_tables([table_name])
+
+    def reflect_tables(self, table_names):
+        """Populate :py:attr:`metadata` with information on the tables, reflected in one go
+
+        The reflected tables are saved to the schema cache.
+
+        Args:
+            table_names: The names of the tables to reflect
+
+        """
+        self.metadata.reflect(only=list(table_names))
+        self._save_schema()
 
     def _table(self, table_name):
         """Retrieves, reflects, and caches table objects
@@ -256,7 +346,15 @@ class Db(Mapping):
         try:
             return self._table_cache[table_name]
         except KeyError:
-            self.reflect_table(table_name)
+            if table_name not in self.metadata.tables:
+                table_names = [table_name]
+                if not self._prewarmed:
+                    self._prewarmed = True
+                    table_names.extend(
+                        name for name in PREWARM_TABLES
+                        if name != table_name and name in self.table_names and
+                        name not in self.metadata.tables)
+                self.reflect_tables(table_names)
             table = self.metadata.tables[table_name]
             table_dict = {
                 '__table__': table,
@@ -273,6 +371,29 @@ class Db(Mapping):
                 return None
 
 
+def _load_schema(path):
+    """Loads the cached schema from the path, empty dictionary if there is none"""
+    if not path.check():
+        return {}
+    try:
+        with path.open('rb') as f:
+            return pickle.load(f)
+    except Exception as e:
+        logger.warning('[DB] Could not load the cached schema %s: %s', path.strpath, e)
+        return {}
+
+
+@contextmanager
+def _schema_lock(path):
+    """Serializes the saving of the cached schema between the processes"""
+    with open('{}.lock'.format(path.strpath), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
 @contextmanager
 def database_on_server(hostname, **kwargs):
     db_obj = Db(hostname=hostname, **kwargs)
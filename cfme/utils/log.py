@@ -130,13 +130,17 @@ Members
 ^^^^^^^
 
 """
+import atexit
 import inspect
 import logging
 import sys
+import threading
 import warnings
 from time import time
 from traceback import extract_tb, format_tb
 
+import six
+
 from cfme.utils import conf, safe_string
 from cfme.utils.path import get_rel_path, log_path, project_path
 
@@ -431,22 +435,114 @@ def nth_frame_info(n):
     return inspect.getframeinfo(inspect.stack(1)[n][0])
 
 
+#: Types of the log record values that survive the json transport to the artifactor
+_TRANSPORT_TYPES = (six.string_types, six.integer_types, float, bool, type(None))
+
+
+def _transport_record(record, formatter=logging.Formatter()):
+    """Returns the log record as a dict for the artifactor, with the message rendered
+
+    The record is shipped later from another thread, so the message is rendered now and the
+    values the json transport can't carry (arguments, tracebacks, extras) are made strings.
+    """
+    log_record = dict(record.__dict__)
+    log_record['msg'] = record.getMessage()
+    log_record['args'] = None
+    if record.exc_info:
+        log_record['exc_text'] = record.exc_text or formatter.formatException(record.exc_info)
+    log_record['exc_info'] = None
+    return {
+        key: value if isinstance(value, _TRANSPORT_TYPES) else repr(value)
+        for key, value in log_record.items()}
+
+
 class ArtifactorHandler(logging.Handler):
-    """Logger handler that hands messages off to the artifactor"""
+    """Logger handler that hands messages off to the artifactor
+
+    The records are buffered and a background thread ships them in batches with one
+    ``log_messages`` hook, once ``capacity`` records are buffered or every ``flush_interval``
+    seconds. :py:meth:`flush` ships the buffer before returning, it is called at the test
+    boundaries so that the records end up in the log of the right test, and at exit.
+    """
 
     slaveid = artifactor = None
+    #: Number of buffered records that triggers shipping them
+    capacity = 500
+    #: Maximum seconds the records wait in the buffer
+    flush_interval = 1.0
+    #: Maximum seconds :py:meth:`flush` waits for the records to be shipped
+    flush_timeout = 10.0
+
+    def __init__(self, *args, **kwargs):
+        super(ArtifactorHandler, self).__init__(*args, **kwargs)
+        self._condition = threading.Condition()
+        self._buffer = []
+        # numbers of the records buffered, shipped and requested by flush so far
+        self._buffered = self._shipped = self._flush_target = 0
+        self._thread = None
+        self.stats = {'records': 0, 'batches': 0}
+        atexit.register(self.flush)
 
     def createLock(self):  # NOQA: false positive, base class override
-        # opt out of locking since artifactor hook calling is threadsave
+        # opt out of locking, the buffer has its own
         self.lock = None
 
     def emit(self, record):
-        if self.artifactor:
-            self.artifactor.fire_hook(
-                'log_message',
-                log_record=record.__dict__,
-                slaveid=self.slaveid,
-            )
+        if not self.artifactor:
+            return
+        try:
+            log_record = _transport_record(record)
+        except Exception:
+            self.handleError(record)
+            return
+        with self._condition:
+            self._buffer.append(log_record)
+            self._buffered += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._ship, name='artifactor-log')
+                self._thread.daemon = True
+                self._thread.start()
+            if len(self._buffer) in (1, self.capacity):
+                self._condition.notify_all()
+
+    def _client(self):
+        # the client sockets are thread local, the shipping thread needs its own client
+        client = type(self.artifactor)(self.artifactor.address, self.artifactor.port)
+        client.ready = True
+        return client
+
+    def _ship(self):
+        client = self._client()
+        while True:
+            with self._condition:
+                while not self._buffer:
+                    self._condition.wait()
+                if len(self._buffer) < self.capacity and self._flush_target <= self._shipped:
+                    # give the batch some time to fill up, unless flush is waiting for it
+                    self._condition.wait(self.flush_interval)
+                batch, self._buffer = self._buffer, []
+                buffered = self._buffered
+            client.fire_hook('log_messages', log_records=batch, slaveid=self.slaveid)
+            with self._condition:
+                self._shipped = buffered
+                self.stats['records'] += len(batch)
+                self.stats['batches'] += 1
+                self._condition.notify_all()
+
+    def flush(self):
+        """Ships the buffered records, the hooks fired after it are handled after them"""
+        with self._condition:
+            if self._thread is None or not self._thread.is_alive():
+                return
+            self._flush_target = self._buffered
+            deadline = time() + self.flush_timeout
+            while self._shipped < self._flush_target and time() < deadline:
+                self._condition.notify_all()
+                self._condition.wait(max(deadline - time(), 0))
+
+    def close(self):
+        self.flush()
+        super(ArtifactorHandler, self).close()
 
 
 logger = setup_logger(logging.getLogger('cfme'))
@@ -28,6 +28,9 @@ docs_path = project_path.join('docs')
 #: log storage, ``cfme_tests/log/``
 log_path = project_path.join('log')
 
+#: local caches kept between the runs, ``cfme_tests/.cfme_cache/``
+cache_path = project_path.join('.cfme_cache')
+
 #: results path for performance tests, ``cfme_tests/results/``
 results_path = project_path.join('results')
 
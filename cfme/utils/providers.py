@@ -255,6 +255,40 @@ def list_providers(filters=None, use_global_filters=True, appliance=None):
     return providers
 
 
+class ProviderIndex(object):
+    """ Maps the providers managed by an appliance to the provider keys
+
+    Args:
+        managed: List of ``(id, name)`` tuples of the providers present on the appliance
+        keys: Dict of provider name -> provider key of the configured providers
+        appliance: :py:class:`utils.appliance.IPAppliance` passed to the provider CRUD objects
+
+    Note: Providers are recognized by name only, see
+        :py:attr:`utils.appliance.IPAppliance.managed_known_providers`. Only the keys are kept,
+        the crud objects are created on every access so that they are not shared.
+    """
+    def __init__(self, managed, keys, appliance=None):
+        self.appliance = appliance
+        self.names = [name for _, name in managed]
+        self.by_name = {}
+        self.by_id = {}
+        self.unrecognized = []
+        for ems_id, name in managed:
+            key = keys.get(name)
+            if key is None:
+                self.unrecognized.append(name)
+                continue
+            self.by_name[name] = key
+            self.by_id[int(ems_id)] = key
+
+    @property
+    def known_providers(self):
+        return [get_crud(key, appliance=self.appliance) for key in self.by_name.values()]
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+
 def list_providers_by_class(prov_class, use_global_filters=True, appliance=None):
     """ Lists provider crud objects of a specific class (or its subclasses), global filter optional
 
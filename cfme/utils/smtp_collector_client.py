@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 
 from cfme.utils.timeutil import parsetime
+from cfme.utils.wait import TimedOutError
 import requests
+import time
 
 
 class SMTPCollectorClient(object):
@@ -11,20 +13,41 @@ class SMTPCollectorClient(object):
         host: Host where collector runs (Default: localhost)
         port: Port where the collector query interface listens (Default: 1026)
 
+    Once :py:meth:`set_test_name` was called, the e-mails are queried only from the partition of
+    that test.
     """
+    #: Longest single /messages/wait request, the collector caps it as well
+    WAIT_REQUEST_TIMEOUT = 60
+
     def __init__(self, host="localhost", port=1026):
         self._host = host
         self._port = port
-
-    def _query(self, method, path, **params):
-        return method("http://{}:{}/{}".format(self._host, self._port, path), params=params)
+        self._test_name = None
+        # Keeps the connection to the collector alive between the queries
+        self._session = requests.Session()
+
+    def _query(self, method, path, http_timeout=None, **params):
+        return self._session.request(
+            method, "http://{}:{}/{}".format(self._host, self._port, path), params=params,
+            timeout=http_timeout)
+
+    def _filter(self, filter):
+        if self._test_name is not None:
+            filter.setdefault("test_name", self._test_name)
+        if filter.get("time_from") is not None:
+            if isinstance(filter["time_from"], parsetime):
+                filter["time_from"] = filter["time_from"].to_request_format()
+        if filter.get("time_to") is not None:
+            if isinstance(filter["time_to"], parsetime):
+                filter["time_to"] = filter["time_to"].to_request_format()
+        return filter
 
     def clear_database(self):
         """Clear the database in collector
 
         Returns: :py:class:`bool`
         """
-        return self._query(requests.delete, "messages").json()
+        return self._query("DELETE", "messages").json()
 
     def set_test_name(self, test_name):
         """Set the test name for folder name in the collector.
@@ -33,7 +56,10 @@ class SMTPCollectorClient(object):
             test_name: Name to set
         Returns: :py:class:`bool` with result.
         """
-        return self._query(requests.get, "set_test_name", test_name=test_name).json()
+        result = self._query("GET", "set_test_name", test_name=test_name).json()
+        if result:
+            self._test_name = test_name
+        return result
 
     def get_emails(self, **filter):
         """Get emails. Eventually apply filtering on SQLite level
@@ -52,16 +78,38 @@ class SMTPCollectorClient(object):
             time_to: E-mail arrived before this time.
             text: Text matches exactly.
             text_like: Text is LIKE.
+            test_name: Partition of the test, defaults to the one set by :py:meth:`set_test_name`.
 
         Returns: List of dicts with e-mails matching the criteria.
         """
-        if filter.get("time_from") is not None:
-            if isinstance(filter["time_from"], parsetime):
-                filter["time_from"] = filter["time_from"].to_request_format()
-        if filter.get("time_to") is not None:
-            if isinstance(filter["time_to"], parsetime):
-                filter["time_to"] = filter["time_to"].to_request_format()
-        return self._query(requests.get, "messages", **filter).json()
+        return self._query("GET", "messages", **self._filter(filter)).json()
+
+    def wait_for_emails(self, count=1, timeout=300, **filter):
+        """Wait until at least ``count`` e-mails matching the filter arrive.
+
+        The collector holds the request until the e-mails arrive, so there is no polling.
+
+        Args:
+            count: How many e-mails to wait for.
+            timeout: How many seconds to wait at most.
+            filter: See :py:meth:`get_emails`.
+
+        Returns: List of dicts with e-mails matching the criteria.
+        Raises: :py:class:`TimedOutError` when not enough e-mails arrived in time.
+        """
+        filter = self._filter(filter)
+        deadline = time.time() + timeout
+        while True:
+            wait = max(0, min(deadline - time.time(), self.WAIT_REQUEST_TIMEOUT))
+            emails = self._query(
+                "GET", "messages/wait", http_timeout=wait + 30, count=count, timeout=wait,
+                **filter).json()
+            if len(emails) >= count:
+                return emails
+            if time.time() >= deadline:
+                raise TimedOutError(
+                    "Expected {} e-mails matching {!r}, got {} in {} seconds".format(
+                        count, filter, len(emails), timeout))
 
     def get_html_report(self):
-        return self._query(requests.get, "messages.html").text.strip()
+        return self._query("GET", "messages.html").text.strip()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import logging
+import socket
+
+import pytest
+
+from cfme.utils.appliance import readiness
+from cfme.utils.wait import TimedOutError
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeChannel(object):
+    """Returns the chunks of the logs at the given times of the clock"""
+    def __init__(self, clock, chunks):
+        self.clock = clock
+        self.chunks = list(chunks)
+        self.closed = False
+        self.timeout = None
+
+    def get_pty(self):
+        pass
+
+    def exec_command(self, command):
+        self.command = command
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def recv(self, size):
+        if not self.chunks:
+            self.clock.sleep(self.timeout)
+            raise socket.timeout()
+        at, data = self.chunks[0]
+        if at > self.clock.now + self.timeout:
+            self.clock.sleep(self.timeout)
+            raise socket.timeout()
+        self.chunks.pop(0)
+        self.clock.now = max(self.clock.now, at)
+        return data
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSSHClient(object):
+    is_container = False
+    is_pod = False
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def get_transport(self):
+        return self
+
+    def open_session(self):
+        return self.channel
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(readiness, 'time', clock)
+    return clock
+
+
+def log_watch(clock, chunks):
+    channel = FakeChannel(clock, chunks)
+    return readiness.LogWatch(
+        FakeSSHClient(channel), ['evmserverd'], logging.getLogger('test_appliance_readiness'))
+
+
+class Probe(object):
+    """Records the times of the probes, the service is up from the given time"""
+    def __init__(self, clock, up_at):
+        self.clock = clock
+        self.up_at = up_at
+        self.probes = []
+
+    def __call__(self):
+        self.probes.append(self.clock.now)
+        return self.clock.now >= self.up_at
+
+
+def test_follow_returns_on_event(clock):
+    watch = log_watch(clock, [
+        (5, 'starting\nStarted EVM ser'),
+        (6, 'ver daemon\r\nother\n'),
+        (8, 'MiqUiWorker started\n')])
+    watch.follow(30)
+    assert watch.seen == {'evm'}
+    assert clock.now == 6
+    watch.follow(30)
+    assert watch.seen == {'evm', 'ui'}
+    assert clock.now == 8
+
+
+def test_follow_closed_channel(clock):
+    watch = log_watch(clock, [(5, '')])
+    watch.follow(30)
+    assert not watch.streaming
+    assert clock.now == 30
+
+
+def test_wait_for_confirms_event(clock):
+    watch = log_watch(clock, [(25, 'Started EVM server daemon\n')])
+    probe = Probe(clock, up_at=28)
+    assert watch.wait_for('evm', probe, confirm_delay=3) == 28
+    assert probe.probes == [0, 10, 20, 25, 28]
+
+
+def test_wait_for_missed_event_probes_as_polling(clock):
+    watch = log_watch(clock, [])
+    probe = Probe(clock, up_at=25)
+    assert watch.wait_for('evm', probe) == 30
+    assert probe.probes == [0, 10, 20, 30]
+
+
+def test_wait_for_timeout(clock):
+    watch = log_watch(clock, [])
+    with pytest.raises(TimedOutError):
+        watch.wait_for('ui', Probe(clock, up_at=100), timeout=50)
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import json
+import logging
+import threading
+import time
+
+import pytest
+
+from cfme.utils.log import ArtifactorHandler
+
+
+class FakeClient(object):
+    """Records the hooks, one instance per thread like the artifactor client sockets"""
+    hooks = []
+
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+        self.ready = False
+
+    def fire_hook(self, hook_name, **kwargs):
+        assert self.ready
+        # the hooks are sent as json
+        self.hooks.append((hook_name, json.loads(json.dumps(kwargs)), threading.current_thread()))
+
+
+@pytest.fixture
+def handler():
+    FakeClient.hooks = []
+    handler = ArtifactorHandler()
+    handler.artifactor = FakeClient('127.0.0.1', 21212)
+    handler.slaveid = 'gw0'
+    handler.flush_interval = 60
+    test_logger = logging.getLogger('test_artifactor_handler')
+    test_logger.propagate = False
+    test_logger.setLevel(logging.DEBUG)
+    test_logger.addHandler(handler)
+    yield handler
+    test_logger.removeHandler(handler)
+
+
+def test_flush_ships_batch(handler):
+    test_logger = logging.getLogger('test_artifactor_handler')
+    test_logger.debug('first %s', object)
+    try:
+        raise ValueError('broken')
+    except ValueError:
+        test_logger.exception('second')
+    handler.flush()
+    [(hook_name, kwargs, thread)] = FakeClient.hooks
+    assert hook_name == 'log_messages'
+    assert thread is not threading.current_thread()
+    assert kwargs['slaveid'] == 'gw0'
+    first, second = kwargs['log_records']
+    assert first['msg'] == "first <type 'object'>" or first['msg'] == "first <class 'object'>"
+    assert first['args'] is None
+    assert 'ValueError: broken' in second['exc_text']
+    assert handler.stats == {'records': 2, 'batches': 1}
+
+
+def test_capacity_ships_without_flush(handler):
+    handler.capacity = 3
+    test_logger = logging.getLogger('test_artifactor_handler')
+    for i in range(3):
+        test_logger.info('message %d', i)
+    # the flush interval is a minute, only the full buffer ships it
+    deadline = time.time() + 10
+    while not FakeClient.hooks and time.time() < deadline:
+        time.sleep(0.05)
+    [(_, kwargs, _)] = FakeClient.hooks
+    assert [record['msg'] for record in kwargs['log_records']] == [
+        'message 0', 'message 1', 'message 2']
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import os
+import stat
+
+import pytest
+import yaycl
+
+from cfme.test_framework.config import SnapshotConfig
+
+
+@pytest.fixture
+def config_dir(tmpdir):
+    config_dir = tmpdir.mkdir('conf')
+    config_dir.join('env.yaml').write('browser:\n  webdriver: Remote\nappliances:\n- hostname: a\n')
+    config_dir.join('env.local.yaml').write('browser:\n  webdriver: Firefox\n')
+    config_dir.join('cfme_data.yaml').write('basic_info:\n  app_version: 5.9\n')
+    return config_dir
+
+
+@pytest.fixture
+def snapshot_file(tmpdir, config_dir):
+    snapshot_file = tmpdir.join('cache', 'config_snapshot.pickle').strpath
+    compiled = SnapshotConfig(config_dir.strpath, snapshot_file=snapshot_file).compile_snapshot()
+    assert compiled == ['cfme_data', 'env']
+    return snapshot_file
+
+
+def test_snapshot_matches_yaml(config_dir, snapshot_file, monkeypatch):
+    def load_yaml(*args, **kwargs):
+        raise AssertionError('loaded from the yaml')
+
+    config = SnapshotConfig(config_dir.strpath, snapshot_file=snapshot_file)
+    monkeypatch.setattr(config, '_load_yaml', load_yaml)
+    assert config.env == yaycl.Config(config_dir.strpath).env
+    assert config.env.browser.webdriver == 'Firefox'
+    assert config.env.appliances[0].hostname == 'a'
+    config.runtime['env']['browser']['webdriver'] = 'Chrome'
+    assert config.env.browser.webdriver == 'Chrome'
+    assert config.env.appliances[0].hostname == 'a'
+
+
+def test_changed_file_loaded_from_yaml(config_dir, snapshot_file):
+    config_dir.join('env.local.yaml').write('browser:\n  webdriver: Chrome\n')
+    config = SnapshotConfig(config_dir.strpath, snapshot_file=snapshot_file)
+    assert config.env.browser.webdriver == 'Chrome'
+    assert config.compile_snapshot() == ['env']
+    assert config.compile_snapshot() == []
+
+
+def test_encrypted_and_broken_left_out(tmpdir, config_dir):
+    config_dir.join('credentials.eyaml').write('encrypted')
+    config_dir.mkdir('broken.yaml')
+    snapshot_file = tmpdir.join('config_snapshot.pickle').strpath
+    config = SnapshotConfig(config_dir.strpath, snapshot_file=snapshot_file)
+    with pytest.warns(UserWarning):
+        assert config.compile_snapshot() == ['cfme_data', 'env']
+    assert sorted(config._snapshot) == ['cfme_data', 'env']
+    assert stat.S_IMODE(os.stat(snapshot_file).st_mode) == 0o600
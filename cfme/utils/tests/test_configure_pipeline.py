@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from cfme.utils.appliance.pipeline import ConfigurePipeline, ConfigureStep, MARKER_DIR
+
+
+class FakeResult(object):
+    def __init__(self, output='', success=True):
+        self.output = output
+        self.success = success
+
+
+class FakeSSHClient(object):
+    def __init__(self, marked=()):
+        self.marked = set(marked)
+        self.lock = threading.Lock()
+
+    def run_command(self, command):
+        with self.lock:
+            if command.startswith('ls '):
+                return FakeResult('\n'.join(sorted(self.marked)), success=bool(self.marked))
+            self.marked.add(command.split('{}/'.format(MARKER_DIR))[-1])
+            return FakeResult()
+
+
+class FakeAppliance(object):
+    hostname = '10.0.0.1'
+
+    def __init__(self, marked=()):
+        self.ssh_client = FakeSSHClient(marked)
+
+
+def recorder(order, name, delay=0):
+    def step():
+        time.sleep(delay)
+        order.append(name)
+    return step
+
+
+def test_order_and_markers():
+    order = []
+    appliance = FakeAppliance()
+    steps = [
+        ConfigureStep('first', recorder(order, 'first'), marker=True),
+        ConfigureStep('second', recorder(order, 'second'), requires=['first'], marker=True),
+        ConfigureStep('skipped', recorder(order, 'skipped'), needed=lambda pipeline: False),
+        ConfigureStep('last', recorder(order, 'last'), requires=['second', 'skipped', 'missing']),
+    ]
+    pipeline = ConfigurePipeline(appliance, steps, log_callback=lambda message: None)
+    appliance.ssh_client.marked.add(pipeline.marker_name(steps[0]))
+    pipeline.run()
+    assert order == ['second', 'last']
+    assert pipeline.ran == {'second', 'last'}
+    assert appliance.ssh_client.marked == {
+        pipeline.marker_name(steps[0]), pipeline.marker_name(steps[1])}
+    assert [outcome for outcome, _ in pipeline.timings.values()] == [
+        'done before', 'not needed', 'ran', 'ran']
+
+
+def test_independent_steps_concurrent():
+    # Every step waits for all of them to start, which only happens when they run at once
+    arrived = []
+    all_arrived = threading.Condition()
+
+    def step(name):
+        def wait_for_all():
+            deadline = time.time() + 10
+            with all_arrived:
+                arrived.append(name)
+                all_arrived.notify_all()
+                while len(arrived) < 4:
+                    if time.time() >= deadline:
+                        raise AssertionError('only {} started together'.format(arrived))
+                    all_arrived.wait(deadline - time.time())
+        return wait_for_all
+
+    steps = [ConfigureStep(name, step(name)) for name in 'abcd']
+    pipeline = ConfigurePipeline(FakeAppliance(), steps, log_callback=lambda message: None)
+    pipeline.run()
+    assert sorted(arrived) == list('abcd')
+
+
+def test_error_stops_dependent_steps():
+    order = []
+
+    def fail():
+        raise ValueError('broken')
+
+    steps = [
+        ConfigureStep('broken', fail),
+        ConfigureStep('slow', recorder(order, 'slow', delay=0.2)),
+        ConfigureStep('after', recorder(order, 'after'), requires=['broken']),
+    ]
+    pipeline = ConfigurePipeline(FakeAppliance(), steps, log_callback=lambda message: None)
+    with pytest.raises(ValueError):
+        pipeline.run()
+    assert order == ['slow']
+    assert pipeline.timings['broken'][0] == 'failed'
+
+
+def test_marker_keyed_by_arguments():
+    order = []
+    appliance = FakeAppliance()
+
+    def pipeline(region):
+        step = ConfigureStep('db', recorder(order, region), marker=True, marker_args=[region])
+        return ConfigurePipeline(appliance, [step], log_callback=lambda message: None)
+
+    pipeline(0).run()
+    pipeline(0).run()
+    pipeline(1).run()
+    assert order == [0, 1]
+    assert all(name.startswith('db-') for name in appliance.ssh_client.marked)
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from cfme.utils.coverage_hits import LineHits, MERGED_COMMAND_NAME, merge_lines
+
+
+def test_merge_lines():
+    assert merge_lines([1, None, 0], [2, None, 3, 4]) == [3, None, 3, 4]
+    assert merge_lines([None, 1], [5, None]) == [5, 1]
+
+
+def test_line_hits_round_trip(tmpdir):
+    hits = LineHits()
+    hits.add('a.rb', [1, None, 0])
+    hits.add('a.rb', {'lines': [0, None, 2]})
+    hits.add('b.rb', [None, 3])
+    path = tmpdir.join('hits.jsonl.gz').strpath
+    hits.write(path)
+
+    merged = LineHits()
+    merged.read(path)
+    merged.read(path)
+    assert merged.files == {'a.rb': [2, None, 4], 'b.rb': [None, 6]}
+    assert merged.resultset()[MERGED_COMMAND_NAME]['coverage'] == merged.files
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import pytest
+from sqlalchemy import MetaData, create_engine
+
+from cfme.utils import db
+
+
+@pytest.fixture
+def database(tmpdir, monkeypatch):
+    monkeypatch.setattr(db, 'schema_cache_path', tmpdir.join('cache'))
+    url = 'sqlite:///{}'.format(tmpdir.join('vmdb.sqlite').strpath)
+    engine = create_engine(url)
+    engine.execute('CREATE TABLE schema_migrations (version VARCHAR PRIMARY KEY)')
+    engine.execute("INSERT INTO schema_migrations VALUES ('20170101000000')")
+    engine.execute('CREATE TABLE vms (id INTEGER PRIMARY KEY, name VARCHAR)')
+    engine.execute('CREATE TABLE hosts (id INTEGER PRIMARY KEY, name VARCHAR)')
+    return url
+
+
+def make_db(url, version='5.9.0.1'):
+    credentials = {'username': 'root', 'password': 'pass'}
+    database = db.Db(hostname='localhost', port=5432, credentials=credentials, version=version)
+    database.__dict__['engine'] = create_engine(url)
+    return database
+
+
+def test_schema_cached_between_instances(database, monkeypatch):
+    first = make_db(database)
+    assert first['vms'].__table__.c.name is not None
+    # hosts is reflected together with the first table
+    assert 'hosts' in first.metadata.tables
+
+    def reflect(*args, **kwargs):
+        raise AssertionError('reflected again')
+
+    monkeypatch.setattr(MetaData, 'reflect', reflect)
+    second = make_db(database)
+    assert second['vms'].__table__.c.name is not None
+    assert second['hosts'].__table__.c.name is not None
+    assert second.table_names == ['hosts', 'schema_migrations', 'vms']
+    assert second.session.query(second['vms']).count() == 0
+
+
+def test_schema_cache_keyed_by_version(database):
+    make_db(database)['vms']
+    other = make_db(database, version='5.10.0.1')
+    assert not other.metadata.tables
+    assert other.schema_key == '5.10.0.1-20170101000000'
+
+
+def test_schema_merged_between_processes(database, monkeypatch):
+    engine = create_engine(database)
+    engine.execute('CREATE TABLE zones (id INTEGER PRIMARY KEY, name VARCHAR)')
+    engine.execute('CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR)')
+    # both load the cache before either saves, like the slaves starting together
+    first, second = make_db(database), make_db(database)
+    assert not first.metadata.tables and not second.metadata.tables
+    first['zones']
+    second['users']
+
+    monkeypatch.setattr(MetaData, 'reflect', lambda *args, **kwargs: None)
+    third = make_db(database)
+    assert set(third.metadata.tables) == {'hosts', 'users', 'vms', 'zones'}
+    assert third['zones'].__table__.c.name is not None
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+from cfme.utils.appliance.implementations.ui import NavigationCache
+from cfme.utils.pretty import Pretty
+
+
+class FakeAppliance(object):
+    hostname = '10.0.0.1'
+
+
+class Provider(object):
+    appliance = FakeAppliance()
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'Provider({!r})'.format(self.name)
+
+
+class Collection(Pretty):
+    appliance = FakeAppliance()
+
+
+class FakeStep(object):
+    def __init__(self, obj, name):
+        self.obj = obj
+        self._name = name
+        self.appliance = FakeAppliance()
+
+
+def test_remember_per_object():
+    cache = NavigationCache()
+    first = FakeStep(Provider('first'), 'Details')
+    cache.remember(first, 'https://10.0.0.1/ems_infra/1')
+    assert cache.get(first) == 'https://10.0.0.1/ems_infra/1'
+    assert cache.get(FakeStep(Provider('second'), 'Details')) is None
+    assert cache.get(FakeStep(Provider('first'), 'Edit')) is None
+    cache.forget(first)
+    assert cache.get(first) is None
+
+
+def test_uncacheable():
+    cache = NavigationCache()
+    explorer = FakeStep(Provider('first'), 'Details')
+    cache.remember(explorer, 'https://10.0.0.1/vm_infra/explorer')
+    assert cache.get(explorer) is None
+    anonymous = FakeStep(object(), 'Details')
+    cache.remember(anonymous, 'https://10.0.0.1/ems_infra/1')
+    assert cache.get(anonymous) is None
+    no_attrs = FakeStep(Collection(), 'All')
+    cache.remember(no_attrs, 'https://10.0.0.1/ems_infra/show_list')
+    assert cache.get(no_attrs) is None
+
+
+def test_summary():
+    cache = NavigationCache()
+    step = FakeStep(Provider('first'), 'Details')
+    cache.record(step, 'full', 3000)
+    cache.record(step, 'cached', 500)
+    cache.record(step, 'cached', 700)
+    assert cache.summary() == [
+        'Provider.Details: 4200ms total, cached 2x avg 600ms, full 1x avg 3000ms']
+
+
+def test_merge():
+    cache = NavigationCache()
+    step = FakeStep(Provider('first'), 'Details')
+    cache.record(step, 'full', 3000)
+    slave = NavigationCache()
+    slave.record(step, 'full', 1000)
+    slave.record(FakeStep(Provider('first'), 'Edit'), 'cached', 200)
+    cache.merge(slave.timings)
+    assert cache.summary() == [
+        'Provider.Details: 4000ms total, full 2x avg 2000ms',
+        'Provider.Edit: 200ms total, cached 1x avg 200ms']
@@ -0,0 +1,63 @@
+from fixtures.provider_order import count_setups, reorder
+
+
+class FakeItem(object):
+    def __init__(self, module, name, parent=None, keywords=()):
+        self.module = module
+        self.parent = parent or module
+        self.name = name
+        self.keywords = dict.fromkeys(keywords)
+
+    def __repr__(self):
+        return self.name
+
+
+def _items(module, tests, providers, **kwargs):
+    return [
+        FakeItem(module, '{}[{}]'.format(test, provider), **kwargs)
+        for test in tests for provider in providers]
+
+
+def _requirements(items):
+    return {item: frozenset([item.name.split('[')[1].rstrip(']')]) for item in items}
+
+
+def _setups(items, requirements, limit):
+    return count_setups([requirements[item] for item in items], limit)
+
+
+def test_count_setups_evicts_least_recently_used():
+    requirements = [frozenset(['a']), frozenset(['b']), frozenset(['a']), frozenset(['c']),
+                    frozenset(['b'])]
+    assert count_setups(requirements, 2) == 4
+    assert count_setups(requirements, 0) == 3
+
+
+def test_reorder_groups_providers():
+    items = _items('mod_a', ['test_1', 'test_2', 'test_3'], ['p1', 'p2', 'p3'])
+    requirements = _requirements(items)
+    ordered = reorder(items, requirements, 1)
+    assert set(ordered) == set(items)
+    assert _setups(ordered, requirements, 1) == 3
+    assert _setups(items, requirements, 1) == 9
+    # Stable inside of the provider group
+    assert [item.name for item in ordered[:3]] == ['test_1[p1]', 'test_2[p1]', 'test_3[p1]']
+
+
+def test_reorder_continues_with_resident_provider():
+    first = _items('mod_a', ['test_1'], ['p1', 'p2'])
+    second = _items('mod_b', ['test_2'], ['p3'])
+    third = _items('mod_c', ['test_3'], ['p1', 'p2'])
+    items = first + second + third
+    requirements = _requirements(items)
+    ordered = reorder(items, requirements, 1)
+    # Modules stay together, mod_c reuses p2 left on the appliance by mod_a
+    assert [item.name for item in ordered] == [
+        'test_1[p1]', 'test_1[p2]', 'test_3[p2]', 'test_3[p1]', 'test_2[p3]']
+    assert _setups(ordered, requirements, 1) < _setups(items, requirements, 1)
+
+
+def test_reorder_keeps_requires_test_order():
+    items = _items('mod_a', ['test_1', 'test_2'], ['p1', 'p2'], keywords=['requires_test'])
+    requirements = _requirements(items)
+    assert reorder(items, requirements, 1) == items
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from cfme.configure import tasks
+from cfme.exceptions import TaskFailedException
+from cfme.utils.wait import TimedOutError
+
+
+@pytest.mark.parametrize('timeout, seconds', [
+    (300, 300),
+    ('300', 300),
+    ('5M', 300),
+    ('1h 30m', 5400),
+    ('10s', 10),
+])
+def test_num_sec(timeout, seconds):
+    assert tasks._num_sec(timeout) == seconds
+
+
+def test_num_sec_invalid():
+    with pytest.raises(ValueError):
+        tasks._num_sec('soon')
+
+
+def test_check_messages():
+    assert tasks._check_messages([('scan', 'Completed'), ('other', None)])
+    assert not tasks._check_messages([('scan', 'Unable to run openscap')], silent_failure=True)
+    with pytest.raises(TaskFailedException):
+        tasks._check_messages([('scan', 'Job failed')])
+    with pytest.raises(TimedOutError):
+        tasks._check_messages([('scan', 'Job timed out')])
+
+
+class FakeTracker(tasks.TaskTracker):
+    """Returns one more finished task on every check"""
+    def __init__(self):
+        super(FakeTracker, self).__init__(appliance=object())
+        self.checks = 0
+
+    def in_state(self, task_name, state='finished'):
+        self.checks += 1
+        return [tasks.BackendTask(task_name, state, 'Ok', 'done')] * (self.checks - 1)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(tasks.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def test_wait_for_tasks_backs_off(sleeps):
+    tracker = FakeTracker()
+    found = tracker.wait_for_tasks('Scan from Vm vm1', 3, timeout='10M', delay=5, max_delay=15)
+    assert len(found) == 3
+    assert sleeps == [5, 10, 15]
+
+
+def test_wait_for_tasks_times_out(sleeps, monkeypatch):
+    clock = iter(range(0, 1000, 10))
+    monkeypatch.setattr(tasks.time, 'time', lambda: next(clock))
+    with pytest.raises(TimedOutError):
+        FakeTracker().wait_for_tasks('Scan from Vm vm1', 100, timeout=30, delay=5)
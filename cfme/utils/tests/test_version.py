@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 import pytest
 
-from cfme.utils.version import Version
+from cfme.utils.version import LOWEST, Version, pick
 
 GT = '>'
 LT = '<'
@@ -29,3 +29,24 @@ def test_version(v1, op, v2):
         assert v1 < v2
     elif op == EQ:
         assert v1 == v2
+
+
+@pytest.mark.parametrize(('active', 'expected'), [
+    ('5.7.4', None),
+    ('5.8', 'eight'),
+    ('5.8.3.1', 'eight'),
+    ('5.9.0.22', 'nine'),
+    ('5.10', 'nine'),
+])
+def test_pick(active, expected):
+    assert pick({'5.8': 'eight', '5.9': 'nine'}, Version(active)) == expected
+    # Picked again from the cache
+    assert pick({'5.9': 'nine', '5.8': 'eight'}, Version(active)) == expected
+
+
+def test_pick_takes_current_values():
+    v_dict = {LOWEST: 'lowest', '5.9': 'nine'}
+    assert pick(v_dict, Version('5.9.1')) == 'nine'
+    v_dict['5.9'] = 'changed'
+    assert pick(v_dict, Version('5.9.1')) == 'changed'
+    assert pick(v_dict, '5.8') == 'lowest'
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from cfme.utils.video import clip_plan
+
+SEGMENTS = [('s0.ts', 0.0, 30.0), ('s1.ts', 30.0, 60.0), ('s2.ts', 60.0, 90.0)]
+
+
+def test_clip_in_one_segment():
+    assert clip_plan(SEGMENTS, 35.0, 45.0) == (['s1.ts'], 5.0, 10.0)
+
+
+def test_clip_across_segments():
+    assert clip_plan(SEGMENTS, 25.0, 65.0) == (['s0.ts', 's1.ts', 's2.ts'], 25.0, 40.0)
+
+
+def test_clip_clamped_to_recording():
+    assert clip_plan(SEGMENTS, 80.0, 120.0) == (['s2.ts'], 20.0, 10.0)
+    assert clip_plan(SEGMENTS, -5.0, 10.0) == (['s0.ts'], 0.0, 10.0)
+
+
+def test_clip_not_recorded():
+    assert clip_plan(SEGMENTS, 95.0, 100.0) is None
+    assert clip_plan([], 0.0, 10.0) is None
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from fixtures import vm_pool
+
+
+class FakeMgmt(object):
+    def __init__(self, can_rename=True):
+        self.vms = set()
+        self.can_rename = can_rename
+
+    def deploy_template(self, template, vm_name, timeout):
+        self.vms.add(vm_name)
+        return vm_name
+
+    def rename_vm(self, vm_name, new_name):
+        if not self.can_rename:
+            raise NotImplementedError('rename_vm')
+        self.vms.remove(vm_name)
+        self.vms.add(new_name)
+        return new_name
+
+    def delete_vm(self, vm_name):
+        self.vms.discard(vm_name)
+
+
+class FakeProvider(object):
+    def __init__(self, mgmt):
+        self.mgmt = mgmt
+
+    def deployment_helper(self, deploy_args):
+        return {}
+
+
+@pytest.fixture
+def mgmt(monkeypatch):
+    mgmt = FakeMgmt()
+    monkeypatch.setattr(vm_pool, 'get_crud', lambda provider_key: FakeProvider(mgmt))
+    return mgmt
+
+
+def filled_pool(size=2, demand=3):
+    pool = vm_pool.VMPool(size=size)
+    pool.demand[('vsphere', 'tpl')] = demand
+    pool.fill()
+    for thread in pool._threads:
+        thread.join()
+    return pool
+
+
+def test_take_and_refill(mgmt):
+    pool = filled_pool()
+    assert len(mgmt.vms) == 2
+    assert pool.take('vsphere', 'tpl', 'test-vm-1') == 'test-vm-1'
+    assert 'test-vm-1' in mgmt.vms
+    assert pool.take('vsphere', 'other', 'test-vm-2') is None
+    for thread in pool._threads:
+        thread.join()
+    assert len(pool.ready[('vsphere', 'tpl')]) == 2
+    pool.close()
+    assert mgmt.vms == {'test-vm-1'}
+    assert pool.stats['handed_out'] == 1
+    assert pool.stats['reaped'] == 2
+
+
+def test_demand_limits_clones(mgmt):
+    pool = filled_pool(size=5, demand=1)
+    assert len(mgmt.vms) == 1
+    pool.consume([('vsphere', 'tpl')])
+    assert pool.demand[('vsphere', 'tpl')] == 0
+    pool.close()
+    assert not mgmt.vms
+
+
+def test_rename_unsupported(mgmt):
+    mgmt.can_rename = False
+    pool = filled_pool()
+    assert pool.take('vsphere', 'tpl', 'test-vm-1') is None
+    assert ('vsphere', 'tpl') in pool.broken
+    assert pool.take('vsphere', 'tpl', 'test-vm-2') is None
+    pool.close()
+    assert not mgmt.vms
+
+
+class FakeItem(object):
+    def __init__(self, fixturenames):
+        self.fixturenames = fixturenames
+
+
+class FakeTemplateProvider(object):
+    key = 'vsphere'
+    type_name = 'virtualcenter'
+    data = {'templates': {'small_template': {'name': 'small'}, 'full_template': {'name': 'full'}}}
+
+
+def test_pool_keys_from_template_fixtures(monkeypatch):
+    monkeypatch.setattr(vm_pool, 'extract_provider', lambda item: FakeTemplateProvider())
+    assert vm_pool.pool_keys(FakeItem(['provider', 'small_template_modscope'])) == (
+        ('vsphere', 'small'),)
+    assert vm_pool.pool_keys(FakeItem(['provider', 'full_template', 'small_template'])) == (
+        ('vsphere', 'full'), ('vsphere', 'small'))
+    assert vm_pool.pool_keys(FakeItem(['provider', 'setup_provider'])) == ()
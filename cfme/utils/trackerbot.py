@@ -5,6 +5,7 @@ import six.moves.urllib.parse
 import urllib
 from collections import defaultdict, namedtuple
 from datetime import date, datetime
+from multiprocessing.pool import ThreadPool
 
 import attr
 import slumber
@@ -353,8 +354,22 @@ def trackerbot_add_provider_template(stream, provider, template_name, custom_dat
         print('{}: Error occured while template sync to trackerbot'.format(provider))
 
 
-def depaginate(api, result):
-    """Depaginate the first (or only) page of a paginated result"""
+def _next_page_request(api, next_url):
+    """Returns the resource and the query params to get the page at next_url"""
+    next_url = six.moves.urllib.parse.urlparse(next_url)
+    # ugh...need to find the word after 'api/' in the next URL to
+    # get the resource endpoint name; not sure how to make this better
+    next_endpoint = next_url.path.strip('/').split('/')[-1]
+    next_params = {k: v[0] for k, v in six.moves.urllib.parse.parse_qs(next_url.query).items()}
+    return getattr(api, next_endpoint), next_params
+
+
+def depaginate(api, result, workers=1):
+    """Depaginate the first (or only) page of a paginated result
+
+    With more than one worker, the remaining pages are requested concurrently, their offsets
+    are computed from the ``total_count`` of the first page.
+    """
     meta = result['meta']
     if meta['next'] is None:
         # No pages means we're done
@@ -366,16 +381,25 @@ def depaginate(api, result):
     # while we pull more records
     ret_meta = meta.copy()
     ret_objects = result['objects']
-    while meta['next']:
-        # parse out url bits for constructing the new api req
-        next_url = six.moves.urllib.parse.urlparse(meta['next'])
-        # ugh...need to find the word after 'api/' in the next URL to
-        # get the resource endpoint name; not sure how to make this better
-        next_endpoint = next_url.path.strip('/').split('/')[-1]
-        next_params = {k: v[0] for k, v in six.moves.urllib.parse.parse_qs(next_url.query).items()}
-        result = getattr(api, next_endpoint).get(**next_params)
-        ret_objects.extend(result['objects'])
-        meta = result['meta']
+    if workers > 1 and meta.get('total_count') is not None:
+        resource, params = _next_page_request(api, meta['next'])
+        offsets = range(meta['offset'] + meta['limit'], meta['total_count'], meta['limit'])
+
+        def get_page(offset):
+            return resource.get(**dict(params, offset=offset))['objects']
+
+        pool = ThreadPool(max(1, min(workers, len(offsets))))
+        try:
+            for objects in pool.map(get_page, offsets):
+                ret_objects.extend(objects)
+        finally:
+            pool.close()
+    else:
+        while meta['next']:
+            resource, params = _next_page_request(api, meta['next'])
+            result = resource.get(**params)
+            ret_objects.extend(result['objects'])
+            meta = result['meta']
 
     # fix meta up to not tell lies
     ret_meta['total_count'] = len(ret_objects)
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from bisect import bisect_right
 from datetime import date, datetime
 
 import multimethods as mm
@@ -129,19 +130,52 @@ def dependent(default_function):
     return m
 
 
+# Interned Version objects of the pick() keys
+_key_versions = {}
+# frozenset of pick() keys -> (sorted versions, keys in the same order)
+_pick_tables = {}
+# (frozenset of pick() keys, active version) -> the key picked
+_picked_keys = {}
+_NOTHING = object()
+
+
+def _key_version(key):
+    try:
+        return _key_versions[key]
+    except KeyError:
+        version = _key_versions[key] = get_version(key)
+        return version
+
+
+def _pick_table(keys):
+    try:
+        return _pick_tables[keys]
+    except KeyError:
+        pairs = sorted(((_key_version(k), k) for k in keys), key=lambda pair: pair[0])
+        table = _pick_tables[keys] = ([v for v, _ in pairs], [k for _, k in pairs])
+        return table
+
+
 def pick(v_dict, active_version=None):
     """
     Collapses an ambiguous series of objects bound to specific versions
     by interrogating the CFME Version and returning the correct item.
+
+    The dispatch is compiled once per set of keys and resolved with bisect, then the picked key
+    is remembered per active version. Only the keys are cached, the value is always taken from
+    ``v_dict``, so dictionaries built on every call or modified later are safe.
     """
-    # convert keys to Versions
     active_version = active_version or current_version()
-
-    v_dict = {get_version(k): v for (k, v) in v_dict.items()}
-    versions = v_dict.keys()
-    sorted_matching_versions = sorted((v for v in versions if v <= active_version),
-                                      reverse=True)
-    return v_dict.get(sorted_matching_versions[0]) if sorted_matching_versions else None
+    if not isinstance(active_version, Version):
+        active_version = _key_version(active_version)
+    keys = frozenset(v_dict)
+    try:
+        key = _picked_keys[keys, active_version]
+    except KeyError:
+        versions, sorted_keys = _pick_table(keys)
+        index = bisect_right(versions, active_version)
+        key = _picked_keys[keys, active_version] = sorted_keys[index - 1] if index else _NOTHING
+    return None if key is _NOTHING else v_dict[key]
 
 
 # Compare Versions using > for dispatch
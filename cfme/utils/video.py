@@ -10,10 +10,16 @@ Configuration for this module + fixture:
           display: ":99"
           quality: 10
 
+:py:class:`Recorder` records one video per use with ``recordmydesktop``.
+:py:class:`SessionRecorder` records the display with ``ffmpeg`` for the whole session into MPEG-TS
+segments and cuts the clips of a time range out of them afterwards, without encoding again.
 """
 
+import csv
 import os
+import re
 import subprocess
+import time
 
 from signal import SIGINT
 
@@ -96,3 +102,136 @@ class Recorder(object):
     def __del__(self):
         """If the reference is lost and the object is destroyed ..."""
         self.stop()
+
+
+def clip_plan(segments, start, end):
+    """Plans cutting a clip out of the segments
+
+    Args:
+        segments: ``(path, start, end)`` of the segments in order, in seconds of the recording.
+        start: Start of the clip in seconds of the recording.
+        end: End of the clip in seconds of the recording.
+
+    Returns:
+        ``(paths, seek, duration)`` - paths of the segments to join, where to seek in them and how
+        long the clip is. ``None`` when the segments do not cover any of the range.
+    """
+    selected = [segment for segment in segments if segment[2] > start and segment[1] < end]
+    if not selected:
+        return None
+    first_start = selected[0][1]
+    start = max(start, first_start)
+    end = min(end, selected[-1][2])
+    return [path for path, _, _ in selected], start - first_start, end - start
+
+
+class SessionRecorder(object):
+    """Records the display for the whole session into MPEG-TS segments
+
+    The segments are finished every ``segment_time`` seconds and listed in ``segments.csv``, so
+    the clips can be cut while the recording goes on. The keyframe is every second, the clips
+    are cut with that precision.
+
+    Usage:
+
+        recorder = SessionRecorder('/tmp/session', display=':99')
+        recorder.start()
+        started = time.time()
+        # do something
+        ended = time.time()
+        recorder.cut('/tmp/clip.mp4', started, ended)
+        recorder.stop()
+    """
+    FRAMERATE = 5
+
+    def __init__(self, directory, display=None, crf=30, segment_time=30):
+        self.directory = directory
+        self.display = display or vid_options["display"]
+        self.crf = crf
+        self.segment_time = segment_time
+        self.proc = None
+        #: Wall clock time of the start of the recording
+        self.started = None
+
+    @property
+    def segment_list(self):
+        return os.path.join(self.directory, 'segments.csv')
+
+    @property
+    def running(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def _video_size(self):
+        try:
+            output = subprocess.check_output(['xdpyinfo', '-display', str(self.display)])
+        except (OSError, subprocess.CalledProcessError):
+            return None
+        match = re.search(r'dimensions:\s+(\d+x\d+)', output)
+        return match.group(1) if match else None
+
+    def start(self):
+        """Starts recording, raises :py:class:`OSError` if ffmpeg is not installed"""
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+        cmd_line = ['ffmpeg', '-loglevel', 'error', '-y',
+                    '-f', 'x11grab', '-framerate', str(self.FRAMERATE)]
+        video_size = self._video_size()
+        if video_size:
+            cmd_line.extend(['-video_size', video_size])
+        cmd_line.extend([
+            '-i', str(self.display),
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', str(self.crf),
+            '-pix_fmt', 'yuv420p', '-g', str(self.FRAMERATE),
+            '-f', 'segment', '-segment_time', str(self.segment_time),
+            '-segment_format', 'mpegts', '-reset_timestamps', '0',
+            '-segment_list', self.segment_list, '-segment_list_type', 'csv',
+            os.path.join(self.directory, 'segment-%05d.ts')])
+        with open(os.path.join(self.directory, 'ffmpeg.log'), 'w') as log:
+            self.proc = subprocess.Popen(cmd_line, stdin=subprocess.PIPE, stdout=log, stderr=log)
+        # The recording time starts with the first frame, written into the first segment
+        first_segment = os.path.join(self.directory, 'segment-00000.ts')
+        deadline = time.time() + 10
+        while not os.path.exists(first_segment) and self.running and time.time() < deadline:
+            time.sleep(0.1)
+        self.started = time.time()
+
+    def stop(self):
+        """Stops recording, the last segment is finished"""
+        if self.running:
+            self.proc.send_signal(SIGINT)
+            self.proc.wait()
+        self.proc = None
+
+    def segments(self):
+        """Returns ``(path, start, end)`` of the finished segments"""
+        if not os.path.exists(self.segment_list):
+            return []
+        segments = []
+        with open(self.segment_list) as f:
+            for row in csv.reader(f):
+                if len(row) == 3:
+                    segments.append(
+                        (os.path.join(self.directory, row[0]), float(row[1]), float(row[2])))
+        return segments
+
+    def covers(self, end):
+        """Returns whether the finished segments reach the wall clock time"""
+        segments = self.segments()
+        return bool(segments) and segments[-1][2] >= end - self.started
+
+    def cut(self, filename, start, end):
+        """Cuts the clip of the wall clock time range out of the finished segments
+
+        Returns:
+            Whether the clip was written.
+        """
+        if self.started is None:
+            return False
+        plan = clip_plan(self.segments(), start - self.started, end - self.started)
+        if plan is None:
+            return False
+        paths, seek, duration = plan
+        cmd_line = ['ffmpeg', '-loglevel', 'error', '-y',
+                    '-ss', '{:.3f}'.format(seek), '-i', 'concat:{}'.format('|'.join(paths)),
+                    '-t', '{:.3f}'.format(duration), '-c', 'copy', str(filename)]
+        return subprocess.call(cmd_line) == 0
@@ -3,6 +3,7 @@
 import pytest
 
 from cfme.utils.providers import get_crud
+from fixtures import vm_pool
 from fixtures.pytest_store import store
 from novaclient.exceptions import OverLimit as OSOverLimit
 from ovirtsdk.infrastructure.errors import RequestError as RHEVRequestError
@@ -42,6 +43,12 @@ def deploy_template(provider_key, vm_name, template_name=None, timeout=900, **de
     else:
         deploy_args.update(template=template_name)
 
+    # Deploys with special arguments can not use the VMs cloned ahead
+    if vm_pool.pool is not None and set(deploy_args) == {'vm_name', 'template'}:
+        pooled_name = vm_pool.pool.take(provider_key, deploy_args['template'], vm_name)
+        if pooled_name is not None:
+            return pooled_name
+
     deploy_args.update(provider_crud.deployment_helper(deploy_args))
 
     logger.info("Getting ready to deploy VM/instance %s from template %s on provider %s",
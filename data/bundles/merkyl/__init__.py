@@ -1,9 +1,14 @@
-from bottle import request, route, run, template
+from bottle import request, response, route, run, template
+from SocketServer import ThreadingMixIn
+from StringIO import StringIO
+from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer
 import os
 import subprocess
 import tempfile
 import sys
 import cgi
+import gzip
+import json
 import signal
 
 try:
@@ -27,7 +32,10 @@ class Log(object):
         if not first_run:
             self.f.close()
         self.f = tempfile.NamedTemporaryFile()
-        self.proc = subprocess.Popen(['/usr/bin/tail', '-f', self.fname], stdout=self.f)
+        # A restarted capture starts empty, so that its offsets start at the reset
+        lines = '10' if first_run else '0'
+        self.proc = subprocess.Popen(
+            ['/usr/bin/tail', '--lines', lines, '-f', self.fname], stdout=self.f)
         self.running = True
 
     def stop(self):
@@ -46,6 +54,19 @@ class Log(object):
         with open(self.f.name, "rb") as infile:
             return infile.read()
 
+    def offset(self):
+        return os.path.getsize(self.f.name)
+
+    def read(self, start, end=None):
+        """Reads the captured data between the offsets, from the start if it got reset"""
+        with open(self.f.name, "rb") as infile:
+            if start > self.offset():
+                start = 0
+            infile.seek(start)
+            if end is None or end < start:
+                return infile.read()
+            return infile.read(end - start)
+
     def size(self):
         if self.running:
             return os.path.getsize(self.f.name)
@@ -131,6 +152,37 @@ def get(name):
     return Loggers[name].get()
 
 
+@route('/offsets')
+def offsets():
+    """Returns the current offsets of all the logs as JSON {name: offset}"""
+    response.content_type = 'application/json'
+    return json.dumps({name: logger.offset() for name, logger in Loggers.items()})
+
+
+@route('/delta', method='POST')
+def delta():
+    """Returns the data of the logs between the offsets
+
+    Takes JSON {name: [start, end]}, end can be null for the current end of the log. Returns JSON
+    {name: data}, the data is decoded as latin-1 to keep all the bytes. Compressed when the
+    client accepts gzip.
+    """
+    ranges = request.json or {}
+    data = {}
+    for name, (start, end) in ranges.items():
+        if name in Loggers:
+            data[name] = Loggers[name].read(start, end).decode('latin-1')
+    body = json.dumps(data)
+    response.content_type = 'application/json'
+    if 'gzip' in request.get_header('Accept-Encoding', ''):
+        buf = StringIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+            f.write(body)
+        body = buf.getvalue()
+        response.set_header('Content-Encoding', 'gzip')
+    return body
+
+
 @route('/reset/<name>')
 def reset(name):
     Loggers[name].reset()
@@ -173,8 +225,40 @@ def quit():
     sys.stderr.close()
 
 
+class KeepAliveServerHandler(ServerHandler):
+    http_version = '1.1'
+
+
+class KeepAliveHandler(WSGIRequestHandler):
+    """Serves all the requests of a connection, so the clients can keep it alive"""
+    protocol_version = 'HTTP/1.1'
+
+    def address_string(self):
+        return self.client_address[0]
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+    def handle(self):
+        while True:
+            self.raw_requestline = self.rfile.readline(65537)
+            if not self.raw_requestline or not self.parse_request():
+                return
+            handler = KeepAliveServerHandler(
+                self.rfile, self.wfile, self.get_stderr(), self.get_environ())
+            handler.request_handler = self
+            handler.run(self.server.get_app())
+            if self.close_connection:
+                return
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
 def main():
-    run(host='0.0.0.0', port=sys.argv[1])
+    run(host='0.0.0.0', port=sys.argv[1], server_class=ThreadingWSGIServer,
+        handler_class=KeepAliveHandler)
 
 
 if __name__ == "__main__":
@@ -31,7 +31,7 @@ import pytest
 from artifactor import ArtifactorClient
 from cfme.utils.blockers import BZ, Blocker
 from cfme.utils.conf import env, credentials
-from cfme.utils.log import logger
+from cfme.utils.log import artifactor_handler, logger
 from cfme.utils.net import random_port, net_check
 from cfme.utils.wait import wait_for
 from fixtures.pytest_store import write_line, store
@@ -131,7 +131,6 @@ def pytest_configure(config):
         art_client.ready = True
     else:
         config._art_proc = None
-    from cfme.utils.log import artifactor_handler
     artifactor_handler.artifactor = art_client
     if store.slave_manager:
         artifactor_handler.slaveid = store.slaveid
@@ -216,6 +215,8 @@ def pytest_runtest_protocol(item):
                 blockers.append(Blocker.parse(blocker).url)
     else:
         blockers = []
+    # the records logged so far belong to the previous test
+    artifactor_handler.flush()
     fire_art_test_hook(
         item, 'pre_start_test',
         slaveid=store.slaveid, ip=ip)
@@ -231,6 +232,7 @@ def pytest_runtest_teardown(item, nextitem):
     holder = item.config.pluginmanager.getplugin('appliance-holder')
     app = holder.held_appliance
     ip = app.hostname
+    artifactor_handler.flush()
     fire_art_test_hook(
         item, 'finish_test',
         slaveid=store.slaveid, ip=ip, wait_for_task=True)
@@ -295,6 +297,7 @@ lock = RLock()
 
 
 def shutdown(config):
+    artifactor_handler.flush()
     holder = config.pluginmanager.getplugin('appliance-holder')
     if holder:
         app = holder.held_appliance
@@ -303,6 +306,8 @@ def shutdown(config):
             if proc:
                 if not store.slave_manager:
                     write_line('collecting artifacts')
+                    # The logs of the last tests are fetched in the background
+                    fire_art_hook(config, 'flush_merkyl', wait_for_task=True)
                     fire_art_hook(config, 'finish_session')
                 fire_art_hook(config, 'teardown_merkyl',
                               ip=app.hostname)
@@ -132,6 +132,27 @@ def pytest_sessionfinish(session, exitstatus):
         outfile.write(failed_tests_report)
 
 
+def pytest_miq_slave_stats(config):
+    from cfme.utils.appliance.implementations.ui import navigation_cache
+    return {'navigation_timings': navigation_cache.timings}
+
+
+def pytest_miq_slave_stats_received(config, slaveid, stats):
+    from cfme.utils.appliance.implementations.ui import navigation_cache
+    navigation_cache.merge(stats.get('navigation_timings', {}))
+
+
+def pytest_terminal_summary(terminalreporter):
+    from cfme.utils.appliance.implementations.ui import navigation_cache
+    lines = navigation_cache.summary()
+    if not lines:
+        return
+    terminalreporter.write_line('Navigation time by destination:')
+    for line in lines:
+        logger.info('Navigation time: %s', line)
+        terminalreporter.write_line('  {}'.format(line))
+
+
 @pytest.fixture(scope='session')
 def browser(appliance):
     from cfme.utils.appliance import DummyAppliance
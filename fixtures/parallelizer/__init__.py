@@ -175,6 +175,7 @@ class ParallelSession(object):
                 use_sprout=False,   # Slaves don't use sprout
             ),
             'zmq_endpoint': zmq_endpoint,
+            'slave_count': len(self.appliances),
         }
         if hasattr(self, "slave_appliances_data"):
             conf.runtime['slave_config']["appliance_data"] = self.slave_appliances_data
@@ -457,6 +458,9 @@ class ParallelSession(object):
                     self.print_message(event_data['message'], slave, purple=True)
                     self.kill(slave)
                 elif event_name == 'shutdown':
+                    self.config.hook.pytest_miq_slave_stats_received(
+                        config=self.config, slaveid=slave.id,
+                        stats=event_data.get('stats', {}))
                     self.config.hook.pytest_miq_node_shutdown(
                         config=self.config, nodeinfo=slave.appliance.url)
                     self.ack(slave, event_name)
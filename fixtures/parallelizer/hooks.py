@@ -13,3 +13,22 @@ def pytest_parallel_configured(parallel_session):
     If running standalone, ``parallel_session`` will be None.
 
     """
+
+
+def pytest_miq_slave_stats(config):
+    """called on a slave when it shuts down
+
+    Returns a dictionary of JSON serializable statistics, keyed by names unique to the plugin.
+    They are sent to the master, see :py:func:`pytest_miq_slave_stats_received`.
+
+    """
+
+
+def pytest_miq_slave_stats_received(config, slaveid, stats):
+    """called on the master with the statistics of a slave that shut down
+
+    ``stats`` is the union of the dictionaries returned by :py:func:`pytest_miq_slave_stats` on the
+    slave. The plugins add them to their own, so that their terminal summary covers all the
+    slaves.
+
+    """
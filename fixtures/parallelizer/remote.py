@@ -15,6 +15,9 @@ SLAVEID = None
 class SlaveManager(object):
     """SlaveManager which coordinates with the master process for parallel testing"""
     def __init__(self, config, slaveid, appliance_config, zmq_endpoint):
+        # fixtures.parallelizer, which adds its hooks in the master, is blocked in the slaves
+        import hooks
+        config.pluginmanager.add_hookspecs(hooks)
         self.config = config
         self.session = None
         self.collection = None
@@ -140,7 +143,10 @@ class SlaveManager(object):
 
     def shutdown(self):
         self.message('shutting down')
-        self.send_event('shutdown')
+        stats = {}
+        for plugin_stats in self.config.hook.pytest_miq_slave_stats(config=self.config):
+            stats.update(plugin_stats)
+        self.send_event('shutdown', stats=stats)
         self.quit_signaled = True
 
     def _test_generator(self):
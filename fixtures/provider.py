@@ -41,7 +41,7 @@ import random
 import six
 from collections import defaultdict
 
-from cfme.common.provider import BaseProvider, all_types
+from cfme.common.provider import BaseProvider, all_types, refresh_durations
 from fixtures.artifactor_plugin import fire_art_test_hook
 from fixtures.pytest_store import store
 from fixtures.templateloader import TEMPLATES
@@ -56,6 +56,9 @@ _problematic_providers = set()
 _setup_failures = defaultdict(lambda: 0)
 # Once limit is reached, no furter attempts at setting up a given provider are made
 SETUP_FAIL_LIMIT = 3
+# Number of providers actually added to the appliances, see fixtures.provider_order. The
+# master adds up the numbers of the slaves.
+setup_stats = {'created': 0}
 
 
 def pytest_addoption(parser):
@@ -67,6 +70,27 @@ def pytest_addoption(parser):
             "Use 1 or 2 when running on a single appliance, depending on HW configuration."))
 
 
+def pytest_miq_slave_stats(config):
+    return {
+        'provider_setups': setup_stats['created'],
+        'refresh_durations': dict(refresh_durations),
+    }
+
+
+def pytest_miq_slave_stats_received(config, slaveid, stats):
+    setup_stats['created'] += stats.get('provider_setups', 0)
+    for key, seconds in stats.get('refresh_durations', {}).items():
+        refresh_durations[key] += seconds
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not refresh_durations:
+        return
+    terminalreporter.write_line('Time spent waiting for provider refreshes:')
+    for key, seconds in sorted(refresh_durations.items(), key=lambda item: -item[1]):
+        terminalreporter.write_line('  {}: {:.0f}s'.format(key, seconds))
+
+
 def _artifactor_skip_providers(request, providers, skip_msg):
     skip_data = {
         'type': 'provider',
@@ -114,7 +138,8 @@ def _setup_provider_verbose(request, provider, appliance=None):
         store.terminalreporter.write_line(
             "Trying to set up provider {}\n".format(provider.key), green=True)
         enable_provider_regions(provider)
-        provider.setup()
+        if provider.setup():
+            setup_stats['created'] += 1
         return True
     except Exception as e:
         logger.exception(e)
@@ -0,0 +1,180 @@
+"""Reorders the collected tests to set the providers up as few times as possible
+
+With ``--provider-limit`` set, :py:func:`fixtures.provider._setup_provider_verbose` removes the
+other providers from the appliance whenever a test needs one that is not there. Tests
+parametrized by provider come out of the collection interleaved (``test_a[p1]``, ``test_a[p2]``,
+``test_b[p1]``, ...), so the same providers keep being deleted and added again, and every add
+means waiting for the provider refresh.
+
+This plugin groups the tests by the providers they set up:
+
+* Inside every module or class the tests are stably grouped by provider, starting with the
+  providers that are on the appliance at that point. Modules and classes themselves are kept
+  together so their fixtures are not set up again.
+* Modules are picked greedily so the next one reuses as many of the resident providers as
+  possible.
+
+Blocks of tests using ``requires_test`` are left in the collected order, and modules are not
+moved at all when any test uses it. The number of provider setups is estimated for both the
+collected and the new order and the actual count is reported at the end of the run.
+
+The reordering is on when ``--provider-limit`` is greater than 0, use ``--no-provider-order`` to
+keep the collected order.
+"""
+from collections import OrderedDict
+
+import pytest
+
+from cfme.utils.log import logger
+from cfme.utils.pytest_shortcuts import extract_fixtures_values
+from fixtures.provider import setup_stats
+from fixtures.pytest_store import store
+
+#: Fixtures that set up the provider coming from testgen
+SETUP_FIXTURES = frozenset([
+    'setup_provider', 'setup_provider_modscope', 'setup_provider_clsscope',
+    'setup_provider_funcscope'])
+
+_stats = {}
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('cfme')
+    group.addoption('--no-provider-order', dest='provider_order', action='store_false',
+                    default=True,
+                    help='Do not reorder the tests to minimize the provider setups.')
+
+
+class ProviderResidency(object):
+    """Simulates which providers are on the appliance.
+
+    When a provider has to be added and the limit is reached, the least recently used provider
+    is removed. The real setup removes a random one, so this is an estimate.
+
+    Args:
+        limit: The ``--provider-limit``, 0 means no limit.
+        resident: Provider keys on the appliance at the start, least recently used first.
+    """
+    def __init__(self, limit, resident=()):
+        self.limit = limit
+        self.resident = list(resident)
+
+    def require(self, keys):
+        """Marks the providers as used, returns how many of them had to be set up."""
+        setups = 0
+        for key in sorted(keys):
+            if key in self.resident:
+                self.resident.remove(key)
+            else:
+                setups += 1
+                if self.limit > 0:
+                    evictable = [k for k in self.resident if k not in keys]
+                    while evictable and len(self.resident) >= self.limit:
+                        self.resident.remove(evictable.pop(0))
+            self.resident.append(key)
+        return setups
+
+
+def required_providers(item):
+    """Returns frozenset of the provider keys the test item sets up."""
+    if SETUP_FIXTURES.isdisjoint(getattr(item, 'fixturenames', ())):
+        return frozenset()
+    provider = extract_fixtures_values(item).get('provider')
+    if provider is None or not hasattr(provider, 'key'):
+        return frozenset()
+    return frozenset([provider.key])
+
+
+def count_setups(requirements, limit, resident=()):
+    """Estimates the number of provider setups for the requirements in the given order."""
+    residency = ProviderResidency(limit, resident)
+    return sum(residency.require(required) for required in requirements)
+
+
+def _order_block(block, requirements, residency):
+    """Groups the block by the required providers, the resident ones first."""
+    groups = OrderedDict()
+    for item in block:
+        groups.setdefault(requirements[item], []).append(item)
+    # Tests not setting up a provider from testgen do not care, run them first
+    ordered = groups.pop(frozenset(), [])
+    while groups:
+        resident = set(residency.resident)
+        # max() keeps the first one of the equal, that is the collected order
+        required = max(groups, key=lambda keys: len(keys & resident))
+        residency.require(required)
+        ordered.extend(groups.pop(required))
+    return ordered
+
+
+def _split(items, key):
+    """Splits the items into runs of consecutive items with the same key."""
+    runs = []
+    for item in items:
+        if runs and key(runs[-1][0]) == key(item):
+            runs[-1].append(item)
+        else:
+            runs.append([item])
+    return runs
+
+
+def reorder(items, requirements, limit, resident=()):
+    """Returns the items in the order needing the least provider setups.
+
+    Args:
+        items: Collected test items.
+        requirements: Dictionary of item -> frozenset of the provider keys it sets up.
+        limit: The ``--provider-limit``.
+        resident: Provider keys already on the appliance.
+    """
+    def has_requires(block):
+        return any('requires_test' in item.keywords for item in block)
+
+    move_modules = not has_requires(items)
+    modules = [
+        (module, frozenset().union(*(requirements[item] for item in module)))
+        for module in _split(items, lambda item: item.module)]
+    residency = ProviderResidency(limit, resident)
+    ordered = []
+    while modules:
+        index = 0
+        if move_modules:
+            resident = set(residency.resident)
+            index = max(range(len(modules)), key=lambda i: len(modules[i][1] & resident))
+        module, _ = modules.pop(index)
+        for block in _split(module, lambda item: item.parent):
+            if has_requires(block):
+                for item in block:
+                    residency.require(requirements[item])
+                ordered.extend(block)
+            else:
+                ordered.extend(_order_block(block, requirements, residency))
+    return ordered
+
+
+@pytest.mark.trylast
+def pytest_collection_modifyitems(session, config, items):
+    limit = config.getoption('provider_limit')
+    if not config.getoption('provider_order') or limit <= 0 or not items:
+        return
+    requirements = {item: required_providers(item) for item in items}
+    if not any(requirements.values()):
+        return
+    before = count_setups([requirements[item] for item in items], limit)
+    items[:] = reorder(items, requirements, limit)
+    after = count_setups([requirements[item] for item in items], limit)
+    _stats.update(estimated_before=before, estimated_after=after)
+    message = 'Reordered tests by provider: estimated {} provider setups instead of {}'.format(
+        after, before)
+    logger.info(message)
+    store.terminalreporter.write_line(message)
+
+
+def pytest_terminal_summary(terminalreporter):
+    if not _stats:
+        return
+    terminalreporter.write_line(
+        'Provider setups: {} done, {} estimated after reordering, {} estimated without '
+        '(saved {})'.format(
+            setup_stats['created'], _stats['estimated_after'], _stats['estimated_before'],
+            _stats['estimated_before'] - setup_stats['created']))
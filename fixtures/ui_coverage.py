@@ -29,9 +29,11 @@ Note the .resultset.json format is documented in the ruby Coverage libraries doc
 
     http://ruby-doc.org/stdlib-2.1.0/libdoc/coverage/rdoc/Coverage.html
 
-All of the individual process' results are then manually merged (coverage_merger) into one
-big json result, and handed back to simplecov which generates the compiled html
-(for humans) and rcov (for jenkins) reports.
+Every appliance reduces the results of all its processes to the compact line hits format of
+:py:mod:`cfme.utils.coverage_hits` on its own, in parallel with the others. The reduced results
+are fetched and merged locally as each appliance finishes, and the merged result is written out
+as one ``.resultset.json`` that can be handed back to simplecov, which generates the compiled
+html (for humans) and rcov (for jenkins) reports.
 
 Workflow Overview
 -----------------
@@ -49,26 +51,29 @@ Post-testing (``pytest_unconfigure`` hook):
 
 1. Stop EVM, but nicely this time so the coverage atexit hooks run:
    ``systemctl stop evmserverd``
-2. Pull the coverage dir back for parsing and archiving
+2. Reduce the coverage dir on the appliance, pull the reduced results back and merge them
+   into the local merged results (every slave does this for its own appliance)
+3. On master/standalone, write out the merged ``.resultset.json`` and archive it
 
 Post-testing (e.g. ci environment): *** This is changing ***
 
 1. Use the generated rcov report with the ruby stats plugin to get a coverage graph
 2. Zip up and archive the entire coverage dir for review
 """
-import subprocess
-from threading import Thread
+import fcntl
+import json
+import tarfile
+from contextlib import contextmanager
 
 import pytest
 from py.error import ENOENT
 from py.path import local
 
 from fixtures.pytest_store import store
-from cfme.utils import conf, version
+from cfme.utils import version
+from cfme.utils.coverage_hits import LineHits
 from cfme.utils.log import create_sublogger
-from cfme.utils.path import conf_path, log_path, scripts_data_path
-from cfme.utils.quote import quote
-from cfme.utils.wait import wait_for, TimedOutError
+from cfme.utils.path import log_path, project_path, scripts_data_path
 
 # paths to all of the coverage-related files
 
@@ -77,6 +82,8 @@ from cfme.utils.wait import wait_for, TimedOutError
 rails_root = local('/var/www/miq/vmdb')
 #: coverage root, should match what's in the coverage hook and merger scripts
 appliance_coverage_root = rails_root.join('coverage')
+appliance_coverage_reducer = local('/tmp/coverage_hits.py')
+appliance_coverage_hits = local('/tmp/ui-coverage-hits.jsonl.gz')
 
 # local
 coverage_data = scripts_data_path.join('coverage')
@@ -84,10 +91,12 @@ gemfile = coverage_data.join('coverage_gem.rb')
 bundler_d = rails_root.join('bundler.d')
 coverage_hook_file_name = 'coverage_hook.rb'
 coverage_hook = coverage_data.join(coverage_hook_file_name)
-coverage_merger = coverage_data.join('coverage_merger.rb')
+coverage_reducer = project_path.join('cfme', 'utils', 'coverage_hits.py')
 coverage_output_dir = log_path.join('coverage')
 coverage_results_archive = coverage_output_dir.join('coverage-results.tgz')
-coverage_appliance_conf = conf_path.join('.ui-coverage')
+#: Line hits of all the appliances collected so far, see :py:mod:`cfme.utils.coverage_hits`
+coverage_merged_hits = coverage_output_dir.join('merged-hits.jsonl.gz')
+coverage_merged_resultset = coverage_output_dir.join('merged', '.resultset.json')
 
 # This is set in sessionfinish, and should be reliably readable
 # in post-yield sessionfinish hook wrappers and all hooks thereafter
@@ -106,6 +115,28 @@ def manager():
     return store.current_appliance.coverage
 
 
+@contextmanager
+def _merge_lock():
+    """Serializes the merging of the reduced results between the slave processes"""
+    with coverage_output_dir.join('.merge.lock').open('w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def merge_hits(hits_file):
+    """Merges reduced results of one appliance into the local merged results"""
+    with _merge_lock():
+        hits = LineHits()
+        if coverage_merged_hits.check():
+            hits.read(coverage_merged_hits.strpath)
+        hits.read(hits_file.strpath)
+        hits.write(coverage_merged_hits.strpath)
+    return hits
+
+
 # you probably don't want to instantiate this manually
 # instead, use the "manager" function above
 class CoverageManager(object):
@@ -117,16 +148,6 @@ class CoverageManager(object):
             sublogger_name = 'coverage'
         self.log = create_sublogger(sublogger_name)
 
-    @property
-    def collection_appliance(self):
-        # if parallelized, this is decided in sessionstart and written to the conf
-        if store.parallelizer_role == 'slave':
-            from cfme.utils.appliance import IPAppliance
-            return IPAppliance.from_url(conf['.ui-coverage']['collection_appliance'])
-        else:
-            # otherwise, coverage only happens on one appliance
-            return store.current_appliance
-
     def print_message(self, message):
         self.log.info(message)
         message = 'coverage: {}'.format(message)
@@ -152,15 +173,7 @@ class CoverageManager(object):
     def merge(self):
         self.print_message('merging reports')
         try:
-            self._retrieve_coverage_reports()
-            # If the appliance runs out of memory, these can take *days* to complete,
-            # so for now we'll just collect the raw coverage data and figure the merging
-            # out later
-            # Edit, 10-Feb-2016:
-            # Currently, the reports are merged using the {stream}-reports job
-            # which utilizes the 'jjb/scripts/stream_reporter.sh' script instead
-            # self._merge_coverage_reports()
-            # self._retrieve_merged_reports()
+            self._write_merged_reports()
         except Exception as exc:
             self.log.error('Error merging coverage reports')
             self.log.exception(exc)
@@ -210,46 +223,32 @@ class CoverageManager(object):
     def _collect_reports(self):
         # restart evm to stop the proccesses and let the simplecov exit hook run
         self.ipapp.ssh_client.run_command('systemctl stop evmserverd')
-        # collect back to the collection appliance if parallelized
-        if store.current_appliance != self.collection_appliance:
-            self.print_message('sending reports to {}'.format(self.collection_appliance.hostname))
-            result = self.ipapp.ssh_client.run_command(
-                'sshpass -p {passwd} '
-                'scp -o StrictHostKeyChecking=no '
-                '-r /var/www/miq/vmdb/coverage/* '
-                '{addr}:/var/www/miq/vmdb/coverage/'.format(
-                    addr=self.collection_appliance.hostname,
-                    passwd=quote(self.ipapp.ssh_client._connect_kwargs['password'])),
-                timeout=1800)
-            if not result:
-                self.print_message('There was an error sending reports: ' + str(result))
-
-    def _retrieve_coverage_reports(self):
-        # Before merging, archive and collect all the raw coverage results
-        ssh_client = self.collection_appliance.ssh_client
-        ssh_client.run_command('cd /var/www/miq/vmdb/;'
-            'tar czf /tmp/ui-coverage-raw.tgz coverage/')
-        ssh_client.get_file('/tmp/ui-coverage-raw.tgz', coverage_results_archive.strpath)
-
-    def _upload_coverage_merger(self):
-        ssh_client = self.collection_appliance.ssh_client
-        ssh_client.put_file(coverage_merger.strpath, rails_root.strpath)
-
-    def _merge_coverage_reports(self):
-        # run the merger on the appliance to generate the simplecov report
-        # This has been failing, presumably due to oom errors :(
-        self._upload_coverage_merger()
-        ssh_client = self.collection_appliance.ssh_client
-        ssh_client.run_rails_command(coverage_merger.basename)
-
-    def _retrieve_merged_reports(self):
-        # Now bring the report back (tar it, get it, untar it)
-        ssh_client = self.collection_appliance.ssh_client
-        ssh_client.run_command('cd /var/www/miq/vmdb/coverage;'
-            'tar czf /tmp/ui-coverage-results.tgz merged/')
-        ssh_client.get_file('/tmp/ui-coverage-results.tgz', coverage_results_archive.strpath)
-        subprocess.Popen(['/usr/bin/env', 'tar', '-xaf', coverage_results_archive.strpath,
-            '-C', coverage_output_dir.strpath]).wait()
+        # reduce the results of all the processes on the appliance itself
+        ssh_client = self.ipapp.ssh_client
+        ssh_client.put_file(coverage_reducer.strpath, appliance_coverage_reducer.strpath)
+        result = ssh_client.run_command(
+            'python {} reduce {} {}'.format(
+                appliance_coverage_reducer, appliance_coverage_root, appliance_coverage_hits),
+            timeout=1800)
+        if not result:
+            self.print_message('There was an error reducing reports: ' + str(result))
+            return
+        hits_file = coverage_output_dir.join('{}-hits.jsonl.gz'.format(self.ipapp.hostname))
+        ssh_client.get_file(appliance_coverage_hits.strpath, hits_file.strpath)
+        # merge right away, so the master does not have to wait for all of them at the end
+        hits = merge_hits(hits_file)
+        self.print_message('merged reports, {} files covered so far'.format(len(hits)))
+
+    def _write_merged_reports(self):
+        # turn the merged line hits into a resultset simplecov can generate the reports from
+        hits = LineHits()
+        if coverage_merged_hits.check():
+            hits.read(coverage_merged_hits.strpath)
+        coverage_merged_resultset.dirpath().ensure(dir=True)
+        with coverage_merged_resultset.open('w') as f:
+            json.dump(hits.resultset(), f)
+        with tarfile.open(coverage_results_archive.strpath, 'w:gz') as tar:
+            tar.add(coverage_merged_resultset.dirpath().strpath, arcname='merged')
 
 
 class UiCoveragePlugin(object):
@@ -257,16 +256,6 @@ class UiCoveragePlugin(object):
         # cleanup cruft from previous runs
         if store.parallelizer_role != 'slave':
             clean_coverage_dir()
-        coverage_appliance_conf.check() and coverage_appliance_conf.remove()
-
-    def pytest_sessionstart(self, session):
-        # master knows all the appliance URLs now, so name the first one as our
-        # report recipient for merging at the end. Need to to write this out to a conf file
-        # since all the slaves are going to use to to know where to ship their reports
-        if store.parallelizer_role == 'master':
-            collection_appliance_address = manager().collection_appliance.hostname
-            conf.runtime['.ui-coverage']['collection_appliance'] = collection_appliance_address
-            conf.save('.ui-coverage')
 
     @pytest.mark.hookwrapper
     def pytest_collection_finish(self):
@@ -276,7 +265,7 @@ class UiCoveragePlugin(object):
             manager().install()
 
     def pytest_sessionfinish(self, exitstatus):
-        # Now master/standalone needs to move all the reports to an appliance for the source report
+        # Every slave/standalone reduces the reports of its appliance and merges them in
         if store.parallelizer_role != 'master':
             manager().collect()
 
@@ -284,7 +273,7 @@ class UiCoveragePlugin(object):
         if store.parallelizer_role == 'slave':
             return
 
-        # on master/standalone, merge all the collected reports and bring them back
+        # on master/standalone, write out the merged reports
         manager().merge()
 
 # TODO
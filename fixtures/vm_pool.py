@@ -0,0 +1,262 @@
+"""Clones the test VMs ahead of the tests that need them
+
+:py:func:`cfme.utils.virtual_machines.deploy_template` (and so ``create_on_provider`` of the
+VMs and instances) waits for the whole clone of the template, which takes minutes on vSphere,
+RHV and OpenStack. This plugin keeps a few VMs cloned from the ``small_template`` and
+``full_template`` of the providers the collected tests use. The clones run in background threads
+while the tests run. When a test deploys one of those templates without any special deploy
+arguments, a pooled VM is renamed to the requested name and handed out, and another clone is
+started if more tests still need it.
+
+The demand is estimated from the collected tests: tests parametrized with one of the supported
+providers that use the template fixtures (``small_template``, ``full_template`` and their module
+scoped versions). No more than ``--vm-pool-size`` VMs are kept per provider and template in the
+whole session, and no more than the tests still to run can use. The parallelizer slaves each
+collect the whole session, so they split both the size and the demand by the number of slaves, a
+slave whose share of the size is zero does not pool. If the provider can not rename the VM, the
+pool stops for that provider and the tests deploy as before. VMs left in the pool are deleted at
+the end of the session.
+
+The pool is off unless ``--vm-pool-size`` is set.
+"""
+import time
+from collections import defaultdict
+from threading import Lock, Semaphore, Thread
+
+import pytest
+
+from cfme.utils import conf
+from cfme.utils.generators import random_vm_name
+from cfme.utils.log import logger
+from cfme.utils.providers import get_crud
+from cfme.utils.pytest_shortcuts import extract_fixtures_values
+from fixtures.pytest_store import store
+
+#: Provider types the VMs are pooled on, the ones that can rename a VM
+POOL_PROVIDER_TYPES = frozenset(['virtualcenter', 'rhevm', 'openstack'])
+
+#: Fixtures giving the templates from the provider data that are pooled -> template key
+POOL_TEMPLATE_FIXTURES = {
+    'small_template': 'small_template',
+    'small_template_modscope': 'small_template',
+    'full_template': 'full_template',
+    'full_template_modscope': 'full_template',
+}
+
+#: The pool of the session, ``None`` when it is off
+pool = None
+
+
+class VMPool(object):
+    """VMs cloned in advance, keyed by ``(provider key, template name)``.
+
+    Args:
+        size: Maximum number of VMs kept ready or cloning per key.
+        workers: Maximum number of clones running at once.
+    """
+    def __init__(self, size=2, workers=4):
+        self.size = size
+        self._lock = Lock()
+        self._clones = Semaphore(workers)
+        self._threads = []
+        self.closed = False
+        #: key -> [(vm name, seconds the clone took)]
+        self.ready = defaultdict(list)
+        #: key -> number of clones running
+        self.cloning = defaultdict(int)
+        #: key -> number of the tests still to run that may take a VM
+        self.demand = defaultdict(int)
+        #: keys that failed to clone or rename, not pooled anymore
+        self.broken = set()
+        self.stats = {'handed_out': 0, 'missed': 0, 'saved': 0.0, 'reaped': 0, 'failed': 0}
+
+    def fill(self, key=None):
+        """Starts the clones needed to have the pool full for the key, or for all the keys."""
+        keys = [key] if key is not None else list(self.demand)
+        with self._lock:
+            for key in keys:
+                if self.closed or key in self.broken:
+                    continue
+                wanted = min(self.size, self.demand[key])
+                missing = wanted - len(self.ready[key]) - self.cloning[key]
+                for _ in range(max(missing, 0)):
+                    self.cloning[key] += 1
+                    thread = Thread(target=self._clone, args=(key,), name='vm-pool')
+                    thread.daemon = True
+                    self._threads.append(thread)
+                    thread.start()
+
+    def _delete(self, provider_key, vm_name):
+        try:
+            get_crud(provider_key).mgmt.delete_vm(vm_name)
+        except Exception:
+            logger.exception('VM pool: could not delete %s on %s', vm_name, provider_key)
+
+    def _clone(self, key):
+        provider_key, template = key
+        vm_name = None
+        try:
+            with self._clones:
+                if self.closed:
+                    return
+                provider_crud = get_crud(provider_key)
+                vm_name = random_vm_name('pool')
+                deploy_args = {'vm_name': vm_name, 'template': template}
+                deploy_args.update(provider_crud.deployment_helper(deploy_args))
+                logger.info('VM pool: cloning %s from %s on %s', vm_name, template, provider_key)
+                start = time.time()
+                vm_name = provider_crud.mgmt.deploy_template(timeout=900, **deploy_args)
+                duration = time.time() - start
+        except Exception:
+            logger.exception('VM pool: cloning %s on %s failed, not pooling it anymore', *key)
+            with self._lock:
+                self.cloning[key] -= 1
+                self.broken.add(key)
+                self.stats['failed'] += 1
+            if vm_name is not None:
+                self._delete(provider_key, vm_name)
+            return
+        with self._lock:
+            self.cloning[key] -= 1
+            closed = self.closed
+            if closed:
+                self.stats['reaped'] += 1
+            else:
+                self.ready[key].append((vm_name, duration))
+        if closed:
+            self._delete(provider_key, vm_name)
+
+    def take(self, provider_key, template, vm_name):
+        """Renames a pooled VM to vm_name and returns its name, ``None`` if there is none ready.
+        """
+        key = (provider_key, template)
+        with self._lock:
+            if key not in self.demand or key in self.broken or self.closed:
+                return None
+            if not self.ready[key]:
+                self.stats['missed'] += 1
+                return None
+            pooled_name, clone_duration = self.ready[key].pop(0)
+        start = time.time()
+        try:
+            new_name = get_crud(provider_key).mgmt.rename_vm(pooled_name, vm_name) or vm_name
+        except Exception:
+            logger.exception(
+                'VM pool: could not rename %s to %s on %s, not pooling it anymore',
+                pooled_name, vm_name, provider_key)
+            with self._lock:
+                self.broken.add(key)
+            self._delete(provider_key, pooled_name)
+            return None
+        with self._lock:
+            self.stats['handed_out'] += 1
+            self.stats['saved'] += max(clone_duration - (time.time() - start), 0)
+        logger.info('VM pool: handed out %s as %s on %s', pooled_name, new_name, provider_key)
+        self.fill(key)
+        return new_name
+
+    def consume(self, keys):
+        """Marks that a test that might have taken a VM for the keys is done."""
+        with self._lock:
+            for key in keys:
+                self.demand[key] = max(self.demand[key] - 1, 0)
+
+    def close(self, timeout=900):
+        """Stops cloning and deletes the VMs left in the pool."""
+        with self._lock:
+            self.closed = True
+            leftovers = [(key, name) for key, vms in self.ready.items() for name, _ in vms]
+            self.ready.clear()
+        for (provider_key, _), vm_name in leftovers:
+            self._delete(provider_key, vm_name)
+        self.stats['reaped'] += len(leftovers)
+        # Clones in progress delete their VM when they finish
+        deadline = time.time() + timeout
+        for thread in self._threads:
+            thread.join(max(deadline - time.time(), 0))
+
+
+def pool_keys(item):
+    """Returns the ``(provider key, template name)`` pairs the test item may take VMs for."""
+    template_keys = {
+        POOL_TEMPLATE_FIXTURES[name] for name in getattr(item, 'fixturenames', ())
+        if name in POOL_TEMPLATE_FIXTURES}
+    if not template_keys:
+        return ()
+    provider = extract_provider(item)
+    if provider is None or getattr(provider, 'type_name', None) not in POOL_PROVIDER_TYPES:
+        return ()
+    templates = provider.data.get('templates', {})
+    return tuple(
+        (provider.key, templates[template_key]['name']) for template_key in sorted(template_keys)
+        if templates.get(template_key, {}).get('name'))
+
+
+def slave_count():
+    """Number of the processes running the tests of the session"""
+    if store.parallelizer_role == 'slave':
+        return conf.slave_config.get('slave_count', 1)
+    return 1
+
+
+def extract_provider(item):
+    provider = extract_fixtures_values(item).get('provider')
+    return provider if hasattr(provider, 'key') and hasattr(provider, 'data') else None
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('cfme')
+    group.addoption('--vm-pool-size', dest='vm_pool_size', type=int, default=0,
+                    help='How many VMs to clone ahead per provider and template in the whole '
+                         'session, split among the parallelizer slaves, 0 (default) turns the '
+                         'pooling off.')
+    group.addoption('--vm-pool-workers', dest='vm_pool_workers', type=int, default=4,
+                    help='How many VMs can the pool clone at once.')
+
+
+@pytest.mark.trylast
+def pytest_collection_finish(session):
+    global pool
+    # The master only hands the tests out, the slaves run them
+    if store.parallelizer_role == 'master' or session.config.option.collectonly:
+        return
+    slaves = slave_count()
+    size = session.config.getoption('vm_pool_size') // slaves
+    if size <= 0:
+        return
+    demand = defaultdict(int)
+    for item in session.items:
+        for key in pool_keys(item):
+            demand[key] += 1
+    # Every slave collects the whole session but runs only its share of it
+    demand = {key: -(-count // slaves) for key, count in demand.items()}
+    if not demand:
+        return
+    pool = VMPool(size=size, workers=session.config.getoption('vm_pool_workers'))
+    pool.demand.update(demand)
+    logger.info('VM pool: cloning ahead for %s', ', '.join(
+        '{}/{} ({} tests)'.format(key[0], key[1], count) for key, count in demand.items()))
+    pool.fill()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    yield
+    if pool is not None:
+        pool.consume(pool_keys(item))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if pool is not None:
+        pool.close()
+
+
+def pytest_terminal_summary(terminalreporter):
+    if pool is None:
+        return
+    stats = pool.stats
+    terminalreporter.write_line(
+        'VM pool: {} VMs handed out, saved {:.1f} min of cloning, {} deploys not served, '
+        '{} clones failed, {} VMs reaped'.format(
+            stats['handed_out'], stats['saved'] / 60.0, stats['missed'], stats['failed'],
+            stats['reaped']))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python2
+"""Benchmark of loading the configuration from the compiled snapshot
+
+Compares loading every configuration of the config dir from the yaml files, which every pytest
+process (master, slaves, artifactor) used to do, with loading it from the snapshot compiled by
+:py:meth:`cfme.test_framework.config.SnapshotConfig.compile_snapshot`. Does not need an appliance.
+
+.. code-block:: bash
+
+    python scripts/benchmark_config_snapshot.py --repeat 3
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import tempfile
+import time
+
+import yaycl
+
+from cfme.test_framework.config import SnapshotConfig
+from cfme.utils import path
+
+
+def load_seconds(config, key):
+    start = time.time()
+    config[key]
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--config-dir', default=path.conf_path.strpath,
+                        help='Directory with the yaml configuration')
+    parser.add_argument('--crypt-key-file', default=path.project_path.join('.yaml_key').strpath,
+                        help='Key of the encrypted yaml files')
+    parser.add_argument('--repeat', type=int, default=3, help='Loads per measurement')
+    args = parser.parse_args()
+    kwargs = {'config_dir': args.config_dir}
+    if os.path.exists(args.crypt_key_file):
+        kwargs['crypt_key_file'] = args.crypt_key_file
+
+    snapshot_file = os.path.join(tempfile.mkdtemp(), 'config_snapshot.pickle')
+    start = time.time()
+    keys = SnapshotConfig(snapshot_file=snapshot_file, **kwargs).compile_snapshot()
+    print('compiled the snapshot of {} configurations in {:.2f} s, {} kB'.format(
+        len(keys), time.time() - start, os.path.getsize(snapshot_file) // 1024))
+
+    totals = {'yaml': 0.0, 'snapshot': 0.0}
+    for key in keys:
+        seconds = {}
+        for label, factory in [
+                ('yaml', lambda: yaycl.Config(**kwargs)),
+                ('snapshot', lambda: SnapshotConfig(snapshot_file=snapshot_file, **kwargs))]:
+            seconds[label] = min(load_seconds(factory(), key) for _ in range(args.repeat))
+            totals[label] += seconds[label]
+        print('{:30} yaml: {:7.3f} s  snapshot: {:7.3f} s'.format(
+            key, seconds['yaml'], seconds['snapshot']))
+    print('{:30} yaml: {:7.3f} s  snapshot: {:7.3f} s  per process'.format(
+        'all', totals['yaml'], totals['snapshot']))
+    os.remove(snapshot_file)
+    os.rmdir(os.path.dirname(snapshot_file))
+
+
+if __name__ == '__main__':
+    main()
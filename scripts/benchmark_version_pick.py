@@ -0,0 +1,50 @@
+#!/usr/bin/env python2
+"""Microbenchmark of :py:func:`cfme.utils.version.pick`
+
+Compares the per-call cost of the compiled dispatch with converting and sorting the keys on
+every call, which is how ``pick`` used to work. Does not need an appliance.
+
+.. code-block:: bash
+
+    python scripts/benchmark_version_pick.py --number 100000
+"""
+from __future__ import print_function
+
+import argparse
+import timeit
+
+from cfme.utils.version import LOWEST, Version, get_version, pick
+
+
+def pick_uncompiled(v_dict, active_version):
+    v_dict = {get_version(k): v for (k, v) in v_dict.items()}
+    versions = v_dict.keys()
+    sorted_matching_versions = sorted((v for v in versions if v <= active_version),
+                                      reverse=True)
+    return v_dict.get(sorted_matching_versions[0]) if sorted_matching_versions else None
+
+
+CASES = {
+    'two keys': {LOWEST: 'Remove this Provider', '5.9': 'Remove this Provider from Inventory'},
+    'five keys': {LOWEST: 1, '5.7': 2, '5.8': 3, '5.9': 4, 'upstream': 5},
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=100000, help='Calls per measurement')
+    parser.add_argument('--version', default='5.9.2.4', help='Active version to pick for')
+    args = parser.parse_args()
+    active_version = Version(args.version)
+
+    for name, v_dict in sorted(CASES.items()):
+        assert pick(v_dict, active_version) == pick_uncompiled(v_dict, active_version)
+        for label, function in [('uncompiled', pick_uncompiled), ('compiled', pick)]:
+            seconds = min(timeit.repeat(
+                lambda: function(v_dict, active_version), number=args.number, repeat=3))
+            print('{:10} {:10}: {:8.2f} us per call'.format(
+                name, label, seconds / args.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
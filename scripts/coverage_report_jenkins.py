@@ -18,7 +18,7 @@ from cfme.test_framework.sprout.client import SproutClient
 from cfme.utils.appliance import IPAppliance
 from cfme.utils.conf import credentials, env
 from cfme.utils.log import logger, add_stdout_handler
-from cfme.utils.path import log_path
+from cfme.utils.path import log_path, scripts_data_path
 from cfme.utils.quote import quote
 from cfme.utils.version import Version
 
@@ -602,7 +602,8 @@ def setup_appliance_for_merger(appliance, ssh):
 
     # Upload the merger
     logger.info('Installing coverage merger')
-    appliance.coverage._upload_coverage_merger()
+    appliance.ssh_client.put_file(
+        scripts_data_path.join('coverage', 'coverage_merger.rb').strpath, '/var/www/miq/vmdb')
 
     ssh_run_cmd(
         ssh=ssh,
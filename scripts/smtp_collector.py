@@ -2,11 +2,14 @@
 # -*- coding: utf-8 -*-
 """Script used to catch and expose e-mails from CFME"""
 
-from bottle import route, run, response, request
-from collections import namedtuple
+from bottle import route, run, response, request, ServerAdapter
+from collections import defaultdict, namedtuple
 from datetime import datetime
+from itertools import count
 from jinja2 import Environment, FileSystemLoader
 from smtpd import SMTPServer
+from SocketServer import ThreadingMixIn
+from wsgiref.simple_server import make_server, WSGIRequestHandler, WSGIServer
 from cfme.utils.path import log_path, template_path
 from cfme.utils.timeutil import parsetime
 import asyncore
@@ -16,26 +19,38 @@ import re
 import sqlite3
 import sys
 import threading
+import time
 
 
 TIME_FORMAT = "%Y-%m-%d-%H-%M-%S"
 ROWS = ("from_address", "to_address", "subject", "time", "text")
+# Longest time a /messages/wait request can block
+WAIT_MAX = 120
 
 # Shared variable with all messages
 db_lock = threading.RLock()
+# Notified with every e-mail stored
+new_email = threading.Condition(db_lock)
 connection = sqlite3.connect(":memory:", check_same_thread=False)
 cur = connection.cursor()
 cur.execute(
     """
     CREATE TABLE emails (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
         from_address TEXT,
         to_address TEXT,
         subject TEXT,
         time TIMESTAMP DEFAULT (datetime('now','localtime')),
-        text TEXT
+        text TEXT,
+        test_name TEXT
     )
     """
 )
+# Every test gets its own partition of the store, the exact filters use the indexes
+cur.execute("CREATE INDEX emails_test_name ON emails (test_name, time)")
+cur.execute("CREATE INDEX emails_from_address ON emails (from_address)")
+cur.execute("CREATE INDEX emails_to_address ON emails (to_address)")
+cur.execute("CREATE INDEX emails_subject ON emails (subject)")
 connection.commit()
 
 # To write the e-mails into the files
@@ -43,6 +58,7 @@ files_lock = threading.RLock()  # To prevent filename collisions
 test_name = None                # Name of the test which currently runs
 email_path = log_path.join("emails")
 email_folder = None             # Name of the root folder for testing
+file_counters = defaultdict(count)  # Next file number per test folder
 
 template_env = Environment(
     loader=FileSystemLoader(template_path.strpath)
@@ -71,37 +87,42 @@ class EmailServer(SMTPServer):
             # Message can have multiple payloads, so let's join them for simplicity
             payload = "\n".join([x.get_payload().strip() for x in payload])
         d = dict(message.items())
+        with files_lock:
+            current_test_name = test_name or "default-test"
         with db_lock:
             global connection
             cursor = connection.cursor()
             cursor.execute(
-                "INSERT INTO emails VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?)",
+                "INSERT INTO emails ({}, test_name) "
+                "VALUES (?, ?, ?, CURRENT_TIMESTAMP, ?, ?)".format(", ".join(ROWS)),
                 (
                     d["From"],
                     ",".join([address.strip() for address in d["To"].strip().split(",")]),
                     d["Subject"],
-                    payload)
+                    payload,
+                    current_test_name)
             )
             connection.commit()
+            new_email.notify_all()
         if email_folder is not None:
             with files_lock:
                 # Create directories if they don't exist
-                current_test_folder = email_folder.join(test_name or "default-test")
+                current_test_folder = email_folder.join(current_test_name)
                 if not current_test_folder.exists():
                     current_test_folder.mkdir()
                 arrived = datetime.now()
-
-                def _getfname(counter):
-                    return current_test_folder\
-                        .join("%s-%d.eml" % (arrived.strftime("%Y%m%d%H%M%S"), int(counter)))
-                cnt = 0
-                while _getfname(cnt).exists():
-                    cnt += 1
-                with _getfname(cnt).open("w") as output:
+                fname = current_test_folder.join("%s-%d.eml" % (
+                    arrived.strftime("%Y%m%d%H%M%S"), next(file_counters[current_test_name])))
+                with fname.open("w") as output:
                     # Dump the raw e-mail data
                     output.write(data)
 
 
+def _partition(name):
+    """Test name as used for the folder and the partition of the store"""
+    return re.sub(r"[/?!]", ":", name)
+
+
 @route("/set_test_name")
 def set_test_name():
     """ Sets a test name for subsequent e-mails"""
@@ -109,55 +130,66 @@ def set_test_name():
     if request.query.test_name:
         with files_lock:    # things under files_lock work with this one
             global test_name
-            test_name = re.sub(r"[/?!]", ":", request.query.test_name)
+            test_name = _partition(request.query.test_name)
             return json.dumps(True)
     else:
         return json.dumps(False)
 
 
-@route("/messages")
-def all_messages():
-    """Return a JSON with all e-mails (eventually filtered)"""
-    response.content_type = "application/json"
+def _messages_query(query):
+    """Builds the SQL selecting the e-mails matching the request query
 
+    Returns: Tuple ``(sql, bindings)``
+    """
     # Build SQL
-    sql = 'SELECT * FROM emails'
+    sql = 'SELECT {} FROM emails'.format(", ".join(ROWS))
 
     # Build WHERE clause(s)
     bindings = ()
     where_clause = list()
-    if request.query.from_address:
+    if query.test_name:
+        where_clause.append("test_name = ?")
+        bindings += (_partition(query.test_name),)
+    if query.from_address:
         where_clause.append("from_address = ?")
-        bindings += (request.query.from_address,)
-    if request.query.to_address:
+        bindings += (query.from_address,)
+    if query.to_address:
         where_clause.append("to_address = ?")
-        bindings += (request.query.to_address,)
-    if request.query.subject:
+        bindings += (query.to_address,)
+    if query.subject:
         where_clause.append("subject = ?")
-        bindings += (request.query.subject,)
-    if request.query.subject_like:
+        bindings += (query.subject,)
+    if query.subject_like:
         where_clause.append("subject LIKE ?")
-        bindings += (request.query.subject_like,)
-    if request.query.text_like:
+        bindings += (query.subject_like,)
+    if query.text_like:
         where_clause.append("text LIKE ?")
-        bindings += (request.query.text_like,)
-    if request.query.text:
+        bindings += (query.text_like,)
+    if query.text:
         where_clause.append("text = ?")
-        bindings += (request.query.text,)
-    if request.query.time_from:
-        time = parsetime.from_request_format(request.query.time_from)
+        bindings += (query.text,)
+    if query.time_from:
+        timestamp = parsetime.from_request_format(query.time_from)
         where_clause.append("time >= ?")
-        bindings += (time,)
-    if request.query.time_to:
-        time = parsetime.from_request_format(request.query.time_to)
+        bindings += (timestamp,)
+    if query.time_to:
+        timestamp = parsetime.from_request_format(query.time_to)
         where_clause.append("time <= ?")
-        bindings += (time,)
+        bindings += (timestamp,)
 
     if where_clause:
         sql += ' WHERE {}'.format(" AND ".join(where_clause))
 
     # Order by time arrived
-    sql += " ORDER BY time ASC"
+    sql += " ORDER BY time ASC, id ASC"
+    return sql, bindings
+
+
+@route("/messages")
+def all_messages():
+    """Return a JSON with all e-mails (eventually filtered)"""
+    response.content_type = "application/json"
+    sql, bindings = _messages_query(request.query)
 
     with db_lock:
         global connection
@@ -169,29 +201,73 @@ def all_messages():
         return json.dumps([dict(zip(ROWS, row)) for row in rows])
 
 
+@route("/messages/wait")
+def wait_for_messages():
+    """Return a JSON with the e-mails like ``/messages`` once there is enough of them
+
+    Blocks until at least ``count`` (default 1) e-mails match the filter or ``timeout`` seconds
+    (default 30, at most :py:data:`WAIT_MAX`) pass. The e-mails matching at that point are
+    returned either way.
+    """
+    response.content_type = "application/json"
+    sql, bindings = _messages_query(request.query)
+    wanted = int(request.query.count or 1)
+    deadline = time.time() + min(float(request.query.timeout or 30), WAIT_MAX)
+
+    with new_email:
+        while True:
+            rows = connection.cursor().execute(sql, bindings).fetchall()
+            remaining = deadline - time.time()
+            if len(rows) >= wanted or remaining <= 0:
+                break
+            new_email.wait(remaining)
+        return json.dumps([dict(zip(ROWS, row)) for row in rows])
+
+
 @route("/messages.html")
 def all_messages_in_html():
     response.content_type = "text/html"
     emails = []
     Email = namedtuple("Email", ["source", "destination", "subject", "received", "body"])
     with db_lock:
-        emails = map(Email._make, connection.cursor().execute("SELECT * FROM emails").fetchall())
+        emails = map(
+            Email._make,
+            connection.cursor().execute(
+                "SELECT {} FROM emails".format(", ".join(ROWS))).fetchall())
 
     return template_env.get_template("smtp_result.html").render(emails=emails)
 
 
 @route("/messages", method="DELETE")
 def clear_database():
-    """Clear the e-mail database"""
+    """Clear the e-mail database, or only the partition of ``test_name`` if passed"""
     response.content_type = "application/json"
     with db_lock:
         global connection
         cursor = connection.cursor()
-        cursor.execute("DELETE FROM emails")
+        if request.query.test_name:
+            cursor.execute(
+                "DELETE FROM emails WHERE test_name = ?", (_partition(request.query.test_name),))
+        else:
+            cursor.execute("DELETE FROM emails")
         connection.commit()
     return json.dumps(True)
 
 
+class ThreadingWSGIRefServer(ServerAdapter):
+    """bottle's default server handles one request at a time, that would not work with the
+    long-polling /messages/wait"""
+    def run(self, app):
+        class Server(ThreadingMixIn, WSGIServer):
+            daemon_threads = True
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_request(*args, **kwargs):
+                pass
+
+        make_server(self.host, self.port, app, Server, QuietHandler).serve_forever()
+
+
 def run_email_server(port=1025):
     EmailServer(("0.0.0.0", port), None)
     try:
@@ -202,7 +278,7 @@ def run_email_server(port=1025):
 
 def run_email_query(port=1026):
     try:
-        run(host="0.0.0.0", port=port, quiet=True)
+        run(server=ThreadingWSGIRefServer, host="0.0.0.0", port=port, quiet=True)
     except KeyboardInterrupt:
         pass
 
@@ -2,6 +2,7 @@
 import inspect
 import json
 import re
+import time
 from celery import chain
 from celery.result import AsyncResult
 from datetime import datetime
@@ -18,35 +19,40 @@ from appliances.tasks import (
     connect_direct_lun, disconnect_direct_lun, mark_appliance_ready, wait_appliance_ready)
 from sprout.log import create_logger
 
+# Long polling of the pool status. The wait holds a sync gunicorn worker, so it is kept well under
+# the worker timeout; the clients back off between the calls.
+REQUEST_CHECK_WAIT_MAX = 5
+REQUEST_CHECK_WAIT_DELAY = 2
+
 
 def json_response(data):
     return HttpResponse(json.dumps(data), content_type="application/json")
 
 
 def json_exception(e):
-    return json_response({
+    return {
         "status": "exception",
         "result": {
             "class": type(e).__name__,
             "message": str(e)
         }
-    })
+    }
 
 
 def json_autherror(message):
-    return json_response({
+    return {
         "status": "autherror",
         "result": {
             "message": str(message)
         }
-    })
+    }
 
 
 def json_success(result):
-    return json_response({
+    return {
         "status": "success",
         "result": result
-    })
+    }
 
 
 class JSONMethod(object):
@@ -100,15 +106,21 @@ class JSONApi(object):
     def doc(self, request):
         return render(request, 'appliances/apidoc.html', {})
 
-    def __call__(self, request):
-        if request.method != 'POST':
-            return json_success({
-                "available_methods": sorted(
-                    map(lambda m: m.description, self._methods.itervalues()),
-                    key=lambda m: m["name"]),
-            })
+    def _authenticate(self, data):
+        """Returns ``(user, None)`` or ``(None, error message)`` if the credentials are wrong."""
+        username, password = data["auth"]
+        try:
+            user = User.objects.get(username=username)
+        except ObjectDoesNotExist:
+            return None, "User {} does not exist!".format(username)
+        if not user.check_password(password):
+            return None, "Wrong password for user {}!".format(username)
+        return user, None
+
+    def _call(self, data, ipaddr, user=None, autherror=None):
+        """Calls one method described by ``data`` and returns the response payload."""
+        method = None
         try:
-            data = json.loads(request.body)
             method_name = data["method"]
             args = data["args"]
             kwargs = data["kwargs"]
@@ -116,18 +128,12 @@ class JSONApi(object):
                 method = self._methods[method_name]
             except KeyError:
                 raise NameError("Method {} not found!".format(method_name))
-            ipaddr = get_ip(request)
             create_logger(method).info(
                 "Calling with parameters {!r}{!r} from {!r}".format(tuple(args), kwargs, ipaddr))
             if method.auth:
-                if "auth" in data:
-                    username, password = data["auth"]
-                    try:
-                        user = User.objects.get(username=username)
-                    except ObjectDoesNotExist:
-                        return json_autherror("User {} does not exist!".format(username))
-                    if not user.check_password(password):
-                        return json_autherror("Wrong password for user {}!".format(username))
+                if autherror is not None:
+                    return json_autherror(autherror)
+                elif user is not None:
                     create_logger(method).info(
                         "Called by user {}/{}".format(user.id, user.username))
                     return json_success(method(user, *args, **kwargs))
@@ -142,6 +148,27 @@ class JSONApi(object):
         else:
             create_logger(method).info("Call finished")
 
+    def __call__(self, request):
+        if request.method != 'POST':
+            return json_response(json_success({
+                "available_methods": sorted(
+                    map(lambda m: m.description, self._methods.itervalues()),
+                    key=lambda m: m["name"]),
+            }))
+        user = autherror = None
+        try:
+            data = json.loads(request.body)
+            if "auth" in data:
+                user, autherror = self._authenticate(data)
+        except Exception as e:
+            return json_response(json_exception(e))
+        ipaddr = get_ip(request)
+        if "calls" in data:
+            # Multiple method invocations in one request, results are returned in the same order
+            return json_response(json_success(
+                [self._call(call, ipaddr, user, autherror) for call in data["calls"]]))
+        return json_response(self._call(data, ipaddr, user, autherror))
+
 
 jsonapi = JSONApi()
 
@@ -182,11 +209,9 @@ def list_appliances(used=False):
         query = query.exclude(appliance_pool__owner=None)
     else:
         query = query.filter(appliance_pool__owner=None)
-    result = []
-    for appliance in query:
-        result.append(appliance.serialized)
-
-    return result
+    return [
+        Appliance.serialize_values(values)
+        for values in query.values(*Appliance.SERIALIZED_VALUES)]
 
 
 @jsonapi.authenticated_method
@@ -242,26 +267,48 @@ def request_appliances(
         ram, cpu, provider_type, template_type).id
 
 
-@jsonapi.authenticated_method
-def request_check(user, request_id):
-    """Return status of the appliance pool"""
-    request = AppliancePool.objects.get(id=request_id)
+def _request_check(user, request_id):
+    request = AppliancePool.objects.select_related('owner').get(id=request_id)
     if user != request.owner and not user.is_staff:
         raise Exception("This pool belongs to a different user!")
+    status = request.status
     return {
-        "fulfilled": request.fulfilled,
+        "fulfilled": status.fulfilled,
         "finished": request.finished,
         "preconfigured": request.preconfigured,
         "yum_update": request.yum_update,
-        "progress": int(round(request.percent_finished * 100)),
-        "appliances": [
-            appliance.serialized
-            for appliance
-            in request.appliances
-        ],
+        "progress": status.progress,
+        "appliances": status.serialized_appliances,
     }
 
 
+@jsonapi.authenticated_method
+def request_check(user, request_id):
+    """Return status of the appliance pool"""
+    return _request_check(user, request_id)
+
+
+@jsonapi.authenticated_method
+def request_check_wait(user, request_id, progress=None, timeout=REQUEST_CHECK_WAIT_MAX):
+    """Return status of the appliance pool once its progress differs from the one passed.
+
+    Long-polling variant of ``request_check``. It returns as soon as the pool is finished or its
+    progress is different from ``progress``, otherwise when ``timeout`` seconds pass.
+
+    Args:
+        request_id: Pool id.
+        progress: Progress the caller knows about, ``None`` returns immediately.
+        timeout: How many seconds to wait at most (capped at ``REQUEST_CHECK_WAIT_MAX``).
+    """
+    deadline = time.time() + min(timeout, REQUEST_CHECK_WAIT_MAX)
+    while True:
+        result = _request_check(user, request_id)
+        if (progress is None or result["progress"] != progress or result["finished"] or
+                time.time() >= deadline):
+            return result
+        time.sleep(max(0, min(REQUEST_CHECK_WAIT_DELAY, deadline - time.time())))
+
+
 @jsonapi.authenticated_method
 def prolong_appliance_lease(user, id, minutes=60):
     """Prolongs the appliance's lease time by specified amount of minutes from current time."""
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Forecasting of the appliance pool demand for the shepherd.
+
+The demand is learned from :py:class:`appliances.models.AppliancePoolRecord` as an average
+number of requested appliances for every hour of the week. The shepherd then keeps more
+appliances spinned up ahead of the predicted bursts and lets the pool shrink back afterwards.
+
+Everything here works on plain ``(datetime, count)`` pairs so it can be backtested offline, see
+:py:func:`backtest` and the ``backtest_shepherd`` management command.
+"""
+from __future__ import division
+
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+
+class DemandForecast(object):
+    """Average appliance demand per weekday and hour.
+
+    Until the history covers a whole week, the demand is averaged per hour of the day only.
+
+    Args:
+        records: Iterable of ``(created_on, num_appliances)`` pairs.
+    """
+    def __init__(self, records):
+        self._weekly = defaultdict(int)
+        self._daily = defaultdict(int)
+        first = last = None
+        for created_on, count in records:
+            self._weekly[(created_on.weekday(), created_on.hour)] += count
+            self._daily[created_on.hour] += count
+            if first is None or created_on < first:
+                first = created_on
+            if last is None or created_on > last:
+                last = created_on
+        self.days = 0
+        self._weekdays = [0] * 7
+        if first is not None:
+            # How many times each of the weekdays occurred in the history
+            self.days = (last.date() - first.date()).days + 1
+            for day in range(self.days):
+                self._weekdays[(first.weekday() + day) % 7] += 1
+
+    def __nonzero__(self):
+        return self.days > 0
+    __bool__ = __nonzero__
+
+    def hourly(self, at):
+        """Average number of appliances requested in the hour ``at`` falls into."""
+        if not self.days:
+            return 0.0
+        elif self.days < 7:
+            return self._daily[at.hour] / self.days
+        else:
+            return self._weekly[(at.weekday(), at.hour)] / self._weekdays[at.weekday()]
+
+    def peak(self, start, lead):
+        """The highest hourly demand expected from ``start`` until ``start + lead``."""
+        hour = start.replace(minute=0, second=0, microsecond=0)
+        result = 0.0
+        while hour <= start + lead:
+            result = max(result, self.hourly(hour))
+            hour += timedelta(hours=1)
+        return result
+
+
+def prewarm_size(base_size, forecast, now, lead, max_prewarm):
+    """How many appliances should the shepherd keep at the moment.
+
+    Args:
+        base_size: The configured pool size of the shepherd.
+        forecast: :py:class:`DemandForecast`
+        now: Current time.
+        lead: :py:class:`datetime.timedelta` how far ahead to look for a burst. It has to cover the
+            time needed to clone the extra appliances, not just one.
+        max_prewarm: Maximum of appliances to add above ``base_size``.
+
+    Returns:
+        Number of appliances, never below ``base_size``.
+    """
+    if not max_prewarm or not forecast:
+        return base_size
+    wanted = int(math.ceil(forecast.peak(now, lead)))
+    return base_size + min(max_prewarm, max(0, wanted - base_size))
+
+
+def _replay(records, wanted_size, clone_time, step, max_parallel):
+    """Replays the pool requests against a simulated shepherd.
+
+    Returns:
+        A tuple ``(waits, idle)`` - list of waits for the pools in minutes and the number of
+        minutes the shepherd appliances spent waiting to be taken.
+    """
+    records = sorted(records)
+    now = records[0][0]
+    end = records[-1][0]
+    ready = 0
+    cloning = []
+    waits = []
+    idle = 0.0
+    i = 0
+    while i < len(records) or now <= end:
+        finished = [t for t in cloning if t <= now]
+        cloning = [t for t in cloning if t > now]
+        ready += len(finished)
+        while i < len(records) and records[i][0] <= now:
+            count = records[i][1]
+            taken = min(count, ready)
+            ready -= taken
+            waits.append(0.0 if taken == count else clone_time.total_seconds() / 60)
+            i += 1
+        target = wanted_size(now, records[:i])
+        if ready > target:
+            # Scale back down
+            ready = target
+        while ready + len(cloning) < target and len(cloning) < max_parallel:
+            cloning.append(now + clone_time)
+        idle += ready * step.total_seconds() / 60
+        now += step
+    return waits, idle
+
+
+def backtest(records, base_size, max_prewarm, history=timedelta(weeks=4),
+             lead=timedelta(hours=3), clone_time=timedelta(minutes=30),
+             step=timedelta(minutes=5), max_parallel=5):
+    """Compares the fixed shepherd pool size with the forecast-driven one on stored pool history.
+
+    The forecast at any moment is learned only from the records created before that moment and
+    not older than ``history``.
+
+    Args:
+        records: List of ``(created_on, num_appliances)`` pairs.
+        base_size: The configured pool size of the shepherd.
+        max_prewarm: See :py:func:`prewarm_size`.
+        history: How far back to learn the demand from.
+        lead: See :py:func:`prewarm_size`.
+        clone_time: How long it takes to provision one appliance.
+        step: Simulation step.
+        max_parallel: How many appliances can be provisioned at once for the shepherd.
+
+    Returns:
+        A dictionary with the mean pool wait in minutes and idle appliance hours for both modes.
+    """
+    if not records:
+        return None
+
+    def fixed(now, past):
+        return base_size
+
+    def forecasted(now, past):
+        forecast = DemandForecast(r for r in past if r[0] >= now - history)
+        return prewarm_size(base_size, forecast, now, lead, max_prewarm)
+
+    result = {}
+    for name, wanted_size in [('fixed', fixed), ('forecast', forecasted)]:
+        waits, idle = _replay(records, wanted_size, clone_time, step, max_parallel)
+        result[name] = {
+            'mean_wait': sum(waits) / len(waits),
+            'idle_hours': idle / 60,
+        }
+    return result
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from appliances.forecast import backtest
+from appliances.models import GroupShepherd
+
+
+class Command(BaseCommand):
+    help = 'Backtests the forecast-driven shepherd pre-warming against the stored pool history.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shepherd', type=int, action='append', dest='shepherds',
+                            help='GroupShepherd id, all shepherds if not specified')
+        parser.add_argument('--max-prewarm', type=int, default=None,
+                            help='Override the max_prewarm_size of the shepherds')
+        parser.add_argument('--clone-minutes', type=int, default=30,
+                            help='How long it takes to provision an appliance')
+        parser.add_argument('--history-weeks', type=int, default=4,
+                            help='How far back to learn the demand from')
+        parser.add_argument('--lead-minutes', type=int, default=180,
+                            help='How far ahead to pre-warm')
+
+    def handle(self, *args, **options):
+        shepherds = GroupShepherd.objects.all()
+        if options['shepherds']:
+            shepherds = shepherds.filter(id__in=options['shepherds'])
+        for gs in shepherds:
+            for preconfigured in [True, False]:
+                base_size = (
+                    gs.template_pool_size if preconfigured else gs.unconfigured_template_pool_size)
+                max_prewarm = options['max_prewarm']
+                if max_prewarm is None:
+                    max_prewarm = gs.max_prewarm_size
+                result = backtest(
+                    gs.pool_history(preconfigured), base_size, max_prewarm,
+                    history=timedelta(weeks=options['history_weeks']),
+                    lead=timedelta(minutes=options['lead_minutes']),
+                    clone_time=timedelta(minutes=options['clone_minutes']))
+                if result is None:
+                    continue
+                self.stdout.write(
+                    '{} ({}): mean pool wait {:.1f} -> {:.1f} min, '
+                    'idle appliance hours {:.1f} -> {:.1f}'.format(
+                        gs, 'configured' if preconfigured else 'unconfigured',
+                        result['fixed']['mean_wait'], result['forecast']['mean_wait'],
+                        result['fixed']['idle_hours'], result['forecast']['idle_hours']))
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from appliances.models import Group, Provider, Template
+from appliances.tasks import reconcile_template_existence, reconcile_template_usability
+
+BENCHMARK_ID = 'benchmark-reconcile'
+
+
+class Rollback(Exception):
+    pass
+
+
+def timed(function, *args):
+    """Returns the seconds and the number of queries the call took"""
+    with CaptureQueriesContext(connection) as context:
+        started = time.time()
+        function(*args)
+        seconds = time.time() - started
+    return seconds, len(context.captured_queries)
+
+
+class Command(BaseCommand):
+    help = ('Benchmarks the template reconciliation on a synthetic inventory. Everything is '
+            'created in a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--templates', type=int, action='append', dest='sizes',
+                            help='Number of templates, 1000 and 5000 if not specified')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.benchmark(options['sizes'] or [1000, 5000], options['repeat'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def benchmark(self, sizes, repeat):
+        group = Group.objects.create(id=BENCHMARK_ID)
+        provider = Provider.objects.create(id=BENCHMARK_ID, working=True)
+        for size in sizes:
+            results = {'existence': [], 'usability': []}
+            for run in range(repeat):
+                Template.objects.filter(provider=provider).delete()
+                Template.objects.bulk_create(
+                    Template(
+                        provider=provider, template_group=group, version='5.9.2.1',
+                        date=date(2018, 5, 1), original_name='cfme-{}'.format(i),
+                        name='cfme-{}'.format(i), preconfigured=False, exists=i % 2 == 0,
+                        usable=i % 3 == 0)
+                    for i in range(size))
+                # Every other template exists, the first ten change their existence
+                names = ['cfme-{}'.format(i) for i in range(size) if (i % 2 == 0) != (i < 10)]
+                results['existence'].append(timed(reconcile_template_existence, provider, names))
+                usability = {
+                    (BENCHMARK_ID, 'cfme-{}'.format(i)): i < size // 2 for i in range(size)}
+                results['usability'].append(timed(
+                    reconcile_template_usability, usability, {BENCHMARK_ID: provider}))
+            for name, runs in sorted(results.items()):
+                seconds, queries = min(runs)
+                self.stdout.write('{:6} templates, {:9}: {:7.3f} s, {} queries'.format(
+                    size, name, seconds, queries))
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('appliances', '0048_openshift_project_made_bigger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppliancePoolRecord',
+            fields=[
+                ('id', models.AutoField(
+                    auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pool_id', models.IntegerField(blank=True, null=True)),
+                ('preconfigured', models.BooleanField(default=True)),
+                ('num_appliances', models.IntegerField()),
+                ('created_on', models.DateTimeField(
+                    db_index=True, default=django.utils.timezone.now)),
+                ('fulfilled_on', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('template_group', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE, to='appliances.Group')),
+            ],
+            options={
+                'ordering': ['created_on'],
+            },
+        ),
+        migrations.AddField(
+            model_name='groupshepherd',
+            name='max_prewarm_size',
+            field=models.IntegerField(
+                default=0,
+                help_text=b'How many appliances can be spinned over the pool size ahead of '
+                          b'forecast demand.'),
+        ),
+    ]
@@ -321,6 +321,16 @@ class Provider(MetadataMixin):
         with self.edit_metadata as metadata:
             metadata["template_name_length"] = value
 
+    @property
+    def appliance_refresh_stats(self):
+        """Statistics of the last appliance refresh, see ``refresh_appliances_provider``."""
+        return self.metadata.get("appliance_refresh_stats", {})
+
+    @appliance_refresh_stats.setter
+    def appliance_refresh_stats(self, value):
+        with self.edit_metadata as metadata:
+            metadata["appliance_refresh_stats"] = value
+
     @property
     def appliances_manage_this_provider(self):
         return self.metadata.get("appliances_manage_this_provider", [])
@@ -494,6 +504,8 @@ class GroupShepherd(MetadataMixin):
         help_text="How many appliances to keep spinned for quick taking.")
     unconfigured_template_pool_size = models.IntegerField(default=0,
         help_text="How many appliances to keep spinned for quick taking - unconfigured ones.")
+    max_prewarm_size = models.IntegerField(default=0,
+        help_text="How many appliances can be spinned over the pool size ahead of forecast demand.")
 
     class Meta:
         ordering = ['template_group', 'user_group', 'id']
@@ -522,6 +534,15 @@ class GroupShepherd(MetadataMixin):
             return 100
         return int(round((float(appliances_in_shepherd) / float(wanted_pool_size)) * 100.0))
 
+    def pool_history(self, preconfigured, since=None):
+        """Returns ``(created_on, num_appliances)`` of the pools this shepherd could serve."""
+        records = AppliancePoolRecord.objects.filter(
+            template_group=self.template_group, owner__groups=self.user_group,
+            preconfigured=preconfigured)
+        if since is not None:
+            records = records.filter(created_on__gte=since)
+        return list(records.order_by('created_on').values_list('created_on', 'num_appliances'))
+
     def shepherd_appliances(self, preconfigured=True):
         return self.appliances.filter(
             appliance_pool=None, ready=True, marked_for_deletion=False,
@@ -850,45 +871,62 @@ class Appliance(MetadataMixin):
         except NotImplementedError:
             pass
 
-    @property
-    def serialized(self):
-        try:
-            pool_id = self.appliance_pool.id
-        except AttributeError:
-            pool_id = None
+    #: What is needed from the database to serialize the appliance, see :py:meth:`serialize_values`
+    SERIALIZED_VALUES = (
+        'id', 'appliance_pool', 'ready', 'name', 'ip_address', 'status', 'power_state',
+        'description', 'status_changed', 'datetime_leased', 'leased_until', 'marked_for_deletion',
+        'uuid', 'lun_disk_connected', 'ram', 'cpu', 'created_on', 'modified_on',
+        'openshift_project', 'openshift_ext_ip', 'template', 'template__original_name',
+        'template__provider', 'template__version', 'template__date', 'template__template_group',
+        'template__name', 'template__preconfigured', 'template__container')
+
+    @classmethod
+    def serialize_values(cls, values):
+        """Serializes the appliance from a ``values(*Appliance.SERIALIZED_VALUES)`` row."""
         return dict(
-            id=self.id,
-            pool_id=pool_id,
-            ready=self.ready,
-            name=self.name,
-            ip_address=self.ip_address,
-            status=self.status,
-            power_state=self.power_state,
-            description=self.description,
-            status_changed=apply_if_not_none(self.status_changed, "isoformat"),
-            datetime_leased=apply_if_not_none(self.datetime_leased, "isoformat"),
-            leased_until=apply_if_not_none(self.leased_until, "isoformat"),
-            template_name=self.template.original_name,
-            template_id=self.template.id,
-            provider=self.template.provider.id,
-            marked_for_deletion=self.marked_for_deletion,
-            uuid=self.uuid,
-            template_version=self.template.version,
-            template_build_date=self.template.date.isoformat(),
-            template_group=self.template.template_group.id,
-            template_sprout_name=self.template.name,
-            preconfigured=self.preconfigured,
-            lun_disk_connected=self.lun_disk_connected,
-            container=self.template.container,
-            ram=self.ram,
-            cpu=self.cpu,
-            created_on=apply_if_not_none(self.created_on, "isoformat"),
-            modified_on=apply_if_not_none(self.modified_on, "isoformat"),
-            project=self.openshift_project,
-            db_host=self.openshift_ext_ip,
-            url=self.url,
+            id=values['id'],
+            pool_id=values['appliance_pool'],
+            ready=values['ready'],
+            name=values['name'],
+            ip_address=values['ip_address'],
+            status=values['status'],
+            power_state=values['power_state'],
+            description=values['description'],
+            status_changed=apply_if_not_none(values['status_changed'], "isoformat"),
+            datetime_leased=apply_if_not_none(values['datetime_leased'], "isoformat"),
+            leased_until=apply_if_not_none(values['leased_until'], "isoformat"),
+            template_name=values['template__original_name'],
+            template_id=values['template'],
+            provider=values['template__provider'],
+            marked_for_deletion=values['marked_for_deletion'],
+            uuid=values['uuid'],
+            template_version=values['template__version'],
+            template_build_date=values['template__date'].isoformat(),
+            template_group=values['template__template_group'],
+            template_sprout_name=values['template__name'],
+            preconfigured=values['template__preconfigured'],
+            lun_disk_connected=values['lun_disk_connected'],
+            container=values['template__container'],
+            ram=values['ram'],
+            cpu=values['cpu'],
+            created_on=apply_if_not_none(values['created_on'], "isoformat"),
+            modified_on=apply_if_not_none(values['modified_on'], "isoformat"),
+            project=values['openshift_project'],
+            db_host=values['openshift_ext_ip'],
+            url="https://{}/".format(values['ip_address']),
         )
 
+    @property
+    def serialized(self):
+        values = {}
+        for field in self.SERIALIZED_VALUES:
+            obj = self
+            for attr in field.split('__'):
+                # Foreign keys are represented by their ids in the values
+                obj = getattr(obj, attr)
+            values[field] = obj.pk if isinstance(obj, models.Model) else obj
+        return self.serialize_values(values)
+
     @property
     @contextmanager
     def kill_lock(self):
@@ -955,6 +993,11 @@ class Appliance(MetadataMixin):
                 self.logger.info("Status changed: {}".format(status))
 
     def set_power_state(self, power_state):
+        """Sets the power state on the object without saving it.
+
+        Returns:
+            A :py:class:`set` of field names that were changed.
+        """
         if power_state != self.power_state:
             self.logger.info("Changed power state to {}".format(power_state))
             self.power_state = power_state
@@ -963,6 +1006,9 @@ class Appliance(MetadataMixin):
                 # Reset some values
                 self.swap = 0
                 self.ssh_failed = False
+                return {'power_state', 'power_state_changed', 'swap', 'ssh_failed'}
+            return {'power_state', 'power_state_changed'}
+        return set()
 
     def __unicode__(self):
         return "{} {} @ {}".format(type(self).__name__, self.name, self.template.provider.id)
@@ -1274,6 +1320,9 @@ class AppliancePool(MetadataMixin):
         if not req.possible_templates:
             raise Exception("No possible templates! (pool params: {})".format(str(req_params)))
         req.save()
+        AppliancePoolRecord.objects.create(
+            pool_id=req.id, template_group=group, owner=owner, preconfigured=preconfigured,
+            num_appliances=num_appliances)
         cls.class_logger(req.pk).info("Created")
         if num_appliances > 0:
             # Only if we have any appliances to request
@@ -1346,38 +1395,27 @@ class AppliancePool(MetadataMixin):
     def single_or_none_appliance(self):
         return self.appliances.count() <= 1
 
+    @property
+    def status(self):
+        """:py:class:`PoolStatus` of the pool, retrieved with a single query."""
+        return PoolStatus(self)
+
     @property
     def current_count(self):
-        return len(self.appliances)
+        return self.status.current_count
 
     @property
     def percent_finished(self):
-        if self.total_count is None:
-            return 0.0
-        total = 4 * self.total_count
-        if total == 0:
-            return 1.0
-        finished = 0
-        for appliance in self.appliances:
-            if appliance.power_state not in {Appliance.Power.UNKNOWN, Appliance.Power.ORPHANED}:
-                finished += 1
-            if appliance.power_state == Appliance.Power.ON:
-                finished += 1
-            if appliance.ip_address is not None:
-                finished += 1
-            if appliance.ready:
-                finished += 1
-        return float(finished) / float(total)
+        return self.status.percent_finished
 
     @property
     def appliance_ips(self):
-        return [ap.ip_address for ap in filter(lambda a: a.ip_address is not None, self.appliances)]
+        return self.status.appliance_ips
 
     @property
     def fulfilled(self):
         try:
-            return len(self.appliance_ips) == self.total_count\
-                and all(a.ready for a in self.appliances)
+            return self.status.fulfilled
         except ObjectDoesNotExist:
             return False
 
@@ -1505,6 +1543,81 @@ class AppliancePool(MetadataMixin):
             self.id, self.group.id, self.total_count)
 
 
+class PoolStatus(object):
+    """Projection of the pool's appliances and the aggregates computed from them.
+
+    All the appliances are retrieved by one ``values()`` query joining the templates, so the
+    number of queries does not grow with the pool size.
+    """
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = list(
+            Appliance.objects
+            .filter(appliance_pool=pool)
+            .order_by('id')
+            .values(*Appliance.SERIALIZED_VALUES))
+
+    @property
+    def current_count(self):
+        return len(self.rows)
+
+    @property
+    def percent_finished(self):
+        if self.pool.total_count is None:
+            return 0.0
+        total = 4 * self.pool.total_count
+        if total == 0:
+            return 1.0
+        finished = 0
+        for row in self.rows:
+            if row['power_state'] not in {Appliance.Power.UNKNOWN, Appliance.Power.ORPHANED}:
+                finished += 1
+            if row['power_state'] == Appliance.Power.ON:
+                finished += 1
+            if row['ip_address'] is not None:
+                finished += 1
+            if row['ready']:
+                finished += 1
+        return float(finished) / float(total)
+
+    @property
+    def progress(self):
+        return int(round(self.percent_finished * 100))
+
+    @property
+    def appliance_ips(self):
+        return [row['ip_address'] for row in self.rows if row['ip_address'] is not None]
+
+    @property
+    def fulfilled(self):
+        return len(self.appliance_ips) == self.pool.total_count\
+            and all(row['ready'] for row in self.rows)
+
+    @property
+    def serialized_appliances(self):
+        return [Appliance.serialize_values(row) for row in self.rows]
+
+
+class AppliancePoolRecord(models.Model):
+    """Keeps the history of requested pools after the pools themselves are gone."""
+    pool_id = models.IntegerField(null=True, blank=True)
+    template_group = models.ForeignKey(Group, on_delete=models.CASCADE)
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    preconfigured = models.BooleanField(default=True)
+    num_appliances = models.IntegerField()
+    created_on = models.DateTimeField(default=timezone.now, db_index=True)
+    fulfilled_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_on']
+
+    @property
+    def wait_time(self):
+        if self.fulfilled_on is None:
+            return None
+        return self.fulfilled_on - self.created_on
+
+
 class MismatchVersionMailer(models.Model):
     provider = models.ForeignKey(Provider, on_delete=models.CASCADE)
     template_name = models.CharField(max_length=64)
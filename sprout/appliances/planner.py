@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Batch placement of appliance provisioning demand onto providers.
+
+The planner works on plain data snapshots so it does not touch the database itself. The tasks
+gather all the pending demand and the provider capacity once per tick, let :py:func:`plan`
+assign the demand to templates and then dispatch the resulting clones together.
+
+The module can be also run as a script to replay recorded demand through the planner:
+
+.. code-block:: bash
+
+    python -m appliances.planner recorded_demand.yaml
+
+The YAML file looks like this (``at`` is in minutes from the start of the recording):
+
+.. code-block:: yaml
+
+    providers:
+      - {id: rhos11, provisioning_slots: 8, appliance_limit: 60, managing: 20, clone_minutes: 12}
+      - {id: vsphere65, provisioning_slots: 4, clone_minutes: 25}
+    templates:
+      - {id: 1, provider: rhos11, version: 5.9.2.1, date: 2018-05-01}
+      - {id: 2, provider: vsphere65, version: 5.9.2.1, date: 2018-05-01}
+    requests:
+      - {at: 0, count: 20}
+      - {at: 3, count: 2, templates: [2]}
+"""
+from __future__ import division, print_function
+
+import argparse
+from collections import namedtuple
+
+import yaml
+
+
+#: One appliance that has to be provisioned. ``key`` identifies the demand for the caller (eg. the
+#: :py:class:`appliances.models.DelayedProvisionTask` id), ``candidates`` is a list of
+#: :py:class:`Candidate` that the appliance can be cloned from.
+Demand = namedtuple('Demand', ['key', 'pool_id', 'lease_time', 'avoid_provider', 'candidates'])
+
+#: A template usable for the demand.
+Candidate = namedtuple('Candidate', ['template_id', 'provider_id', 'version', 'date'])
+
+#: Result of the planning, ``candidate`` is the :py:class:`Candidate` picked for the demand.
+Placement = namedtuple('Placement', ['demand', 'candidate'])
+
+
+class ProviderCapacity(object):
+    """Snapshot of a provider's free capacity that gets consumed while planning.
+
+    Args:
+        provider_id: Provider's key.
+        provisioning_slots: How many more appliances can start provisioning on the provider.
+        appliance_limit: Hard limit of the appliances on the provider or ``None``.
+        num_managing: How many appliances does the provider currently hold.
+    """
+    def __init__(self, provider_id, provisioning_slots, appliance_limit=None, num_managing=0):
+        self.provider_id = provider_id
+        self.provisioning_slots = max(provisioning_slots, 0)
+        self.appliance_limit = appliance_limit
+        self.num_managing = num_managing
+
+    @property
+    def free(self):
+        return self.provisioning_slots > 0
+
+    @property
+    def appliance_load(self):
+        if not self.appliance_limit:
+            return 0.0
+        return self.num_managing / self.appliance_limit
+
+    def take(self):
+        self.provisioning_slots -= 1
+        self.num_managing += 1
+
+    def __repr__(self):
+        return '<ProviderCapacity {} slots: {}, load: {:.2f}>'.format(
+            self.provider_id, self.provisioning_slots, self.appliance_load)
+
+
+def plan(demands, capacities):
+    """Assigns as much of the demand as possible to the providers' capacity.
+
+    Demand is processed in the order given, so pass it oldest first. Each appliance goes to the
+    newest template on the least loaded provider, the same rule the one-by-one placement used, but
+    the load is taken from the snapshot and updated after every assignment instead of being
+    queried again. Appliances of one pool stay on the version and date picked for the pool's first
+    appliance in the batch, like :py:func:`appliances.tasks.clone_template_to_pool` does.
+
+    Args:
+        demands: Iterable of :py:class:`Demand`.
+        capacities: Dictionary of provider id -> :py:class:`ProviderCapacity`. It is modified.
+
+    Returns:
+        A tuple ``(placements, unplaced)`` - list of :py:class:`Placement` and list of the
+        :py:class:`Demand` that could not be placed.
+    """
+    placements = []
+    unplaced = []
+    pool_pins = {}
+    for demand in demands:
+        candidates = [
+            c for c in demand.candidates
+            if c.provider_id in capacities and capacities[c.provider_id].free]
+        if demand.pool_id in pool_pins:
+            candidates = [c for c in candidates if (c.version, c.date) == pool_pins[demand.pool_id]]
+        if demand.avoid_provider is not None:
+            # If there is no other provider to provision on, the original list is used
+            candidates = [
+                c for c in candidates if c.provider_id != demand.avoid_provider] or candidates
+        if not candidates:
+            unplaced.append(demand)
+            continue
+        candidate = max(
+            candidates,
+            key=lambda c: (c.date, 1.0 - capacities[c.provider_id].appliance_load))
+        capacities[candidate.provider_id].take()
+        pool_pins.setdefault(demand.pool_id, (candidate.version, candidate.date))
+        placements.append(Placement(demand, candidate))
+    return placements, unplaced
+
+
+def simulate(recording, tick_seconds=20):
+    """Replays recorded demand through :py:func:`plan`.
+
+    Every request of the recording becomes a pool. Each tick the planner gets all the unfulfilled
+    demand and the current capacity, clones take ``clone_minutes`` of their provider to finish.
+
+    Args:
+        recording: Dictionary with the structure described in the module docstring.
+        tick_seconds: How often the planner runs.
+
+    Returns:
+        A dictionary with the time-to-fulfil in minutes per pool and its summary.
+    """
+    tick = tick_seconds / 60
+    providers = {p['id']: p for p in recording['providers']}
+    managing = {p['id']: p.get('managing', 0) for p in recording['providers']}
+    candidates = [
+        Candidate(t['id'], t['provider'], str(t.get('version')), t.get('date'))
+        for t in recording['templates']]
+    requests = sorted(enumerate(recording['requests']), key=lambda item: item[1]['at'])
+    pending = []
+    provisioning = []  # (finishes_at, provider_id, pool_id)
+    remaining = {}
+    fulfilled = {}
+    now = 0.0
+    while requests or pending or provisioning:
+        while requests and requests[0][1]['at'] <= now:
+            pool_id, request = requests.pop(0)
+            allowed = request.get('templates')
+            pool_candidates = [c for c in candidates if allowed is None or c.template_id in allowed]
+            remaining[pool_id] = request['count']
+            pending.extend(
+                Demand((pool_id, i), pool_id, None, None, pool_candidates)
+                for i in range(request['count']))
+        for item in [item for item in provisioning if item[0] <= now]:
+            provisioning.remove(item)
+            remaining[item[2]] -= 1
+            if remaining[item[2]] == 0:
+                fulfilled[item[2]] = now - recording['requests'][item[2]]['at']
+        capacities = {}
+        for provider_id, provider in providers.items():
+            busy = len([item for item in provisioning if item[1] == provider_id])
+            slots = provider['provisioning_slots'] - busy
+            if provider.get('appliance_limit') is not None:
+                slots = min(slots, provider['appliance_limit'] - managing[provider_id])
+            capacities[provider_id] = ProviderCapacity(
+                provider_id, slots, provider.get('appliance_limit'), managing[provider_id])
+        placements, pending = plan(pending, capacities)
+        for placement in placements:
+            provider_id = placement.candidate.provider_id
+            managing[provider_id] += 1
+            provisioning.append(
+                (now + providers[provider_id]['clone_minutes'], provider_id,
+                 placement.demand.pool_id))
+        if pending and not provisioning and not requests:
+            # Nothing will ever free up, the rest is unplaceable
+            break
+        now += tick
+    times = sorted(fulfilled.values())
+    return {
+        'pools': fulfilled,
+        'unfulfilled': sorted(set(remaining) - set(fulfilled)),
+        'mean_time_to_fulfil': sum(times) / len(times) if times else None,
+        'max_time_to_fulfil': times[-1] if times else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded demand through the planner')
+    parser.add_argument('recording', help='YAML file with the recorded demand')
+    parser.add_argument('--tick', type=int, default=20, help='Planner period in seconds')
+    args = parser.parse_args()
+    with open(args.recording) as f:
+        result = simulate(yaml.safe_load(f), tick_seconds=args.tick)
+    for pool_id, minutes in sorted(result['pools'].items()):
+        print('Pool {}: fulfilled in {:.1f} minutes'.format(pool_id, minutes))
+    for pool_id in result['unfulfilled']:
+        print('Pool {}: not fulfilled'.format(pool_id))
+    if result['mean_time_to_fulfil'] is not None:
+        print('Mean time to fulfil: {:.1f} minutes, max: {:.1f} minutes'.format(
+            result['mean_time_to_fulfil'], result['max_time_to_fulfil']))
+
+
+if __name__ == '__main__':
+    main()
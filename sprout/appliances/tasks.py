@@ -7,6 +7,7 @@ import hashlib
 import iso8601
 import random
 import re
+import time
 import command
 import yaml
 from contextlib import closing
@@ -14,9 +15,9 @@ from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.mail import send_mail
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.utils import timezone
-from celery import chain, chord, shared_task
+from celery import chain, chord, group as task_group, shared_task
 from celery.exceptions import MaxRetriesExceededError
 from datetime import datetime, timedelta
 from functools import wraps
@@ -27,8 +28,10 @@ from urllib2 import urlopen, HTTPError
 import socket
 
 from appliances.models import (
-    Provider, Group, Template, Appliance, AppliancePool, DelayedProvisionTask,
-    MismatchVersionMailer, User, GroupShepherd)
+    Provider, Group, Template, Appliance, AppliancePool, AppliancePoolRecord,
+    DelayedProvisionTask, MismatchVersionMailer, User, GroupShepherd)
+from appliances.forecast import DemandForecast, prewarm_size
+from appliances.planner import Candidate, Demand, ProviderCapacity, plan
 from sprout import settings, redis
 from sprout.irc_bot import send_message
 from sprout.log import create_logger
@@ -57,6 +60,9 @@ VERSION_REGEXPS = [
 VERSION_REGEXPS = map(re.compile, VERSION_REGEXPS)
 VERSION_REGEXP_UPSTREAM = re.compile(r'^miq-stable-([^-]+)-')
 TRACKERBOT_PAGINATE = 100
+TRACKERBOT_WORKERS = 4
+#: Keeps the ``pk__in`` lists of bulk updates under the SQLite query variable limit
+BULK_UPDATE_CHUNK = 500
 
 
 def retrieve_cfme_appliance_version(template_name):
@@ -87,6 +93,24 @@ def provider_error_logger():
     return create_logger("provider_errors")
 
 
+def bulk_update(model, pks, **values):
+    """Sets the values on all the objects with the given primary keys, in as few UPDATEs as
+    possible. Returns the number of updated rows."""
+    pks = list(pks)
+    updated = 0
+    for i in range(0, len(pks), BULK_UPDATE_CHUNK):
+        updated += model.objects.filter(pk__in=pks[i:i + BULK_UPDATE_CHUNK]).update(**values)
+    return updated
+
+
+def get_or_create_all(model, ids):
+    """Returns dict of id -> object for all the ids, creating the missing objects."""
+    objects = model.objects.in_bulk(list(ids))
+    for missing in set(ids) - set(objects):
+        objects[missing], _ = model.objects.get_or_create(id=missing)
+    return objects
+
+
 def logged_task(*args, **kwargs):
     kwargs["bind"] = True
 
@@ -208,14 +232,9 @@ def kill_appliance_delete(self, appliance_id, _delete_already_issued=False):
             exc=e, countdown=5, max_retries=60)
 
 
-@singleton_task()
-def poke_trackerbot(self):
-    """This beat-scheduled task periodically polls the trackerbot if there are any new templates.
-    """
-    template_usability = []
-    # Extract data from trackerbot
-    tbapi = trackerbot()
-    objects = depaginate(tbapi, tbapi.providertemplate().get(limit=TRACKERBOT_PAGINATE))["objects"]
+def interleave_trackerbot_templates(objects):
+    """Groups the trackerbot provider templates by the template group, newest first, and
+    interleaves the groups so that no group has to wait for another one to be processed."""
     per_group = {}
     for obj in objects:
         if obj["template"]["group"]["name"] == 'unknown':
@@ -235,37 +254,110 @@ def poke_trackerbot(self):
         for key in per_group.iterkeys():
             if per_group[key]:
                 objects.append(per_group[key].pop(0))
+    return objects
+
+
+def reconcile_template_usability(template_usability, providers):
+    """Sets the usability of the templates as trackerbot says in two bulk updates.
+
+    Args:
+        template_usability: Dict of (provider id, original template name) -> usability.
+        providers: Dict of provider id -> :py:class:`appliances.models.Provider`.
+
+    Returns:
+        List of primary keys of the templates that are not usable.
+    """
+    provider_ids = [
+        provider.id for provider in providers.itervalues()
+        if provider.working and not provider.disabled]
+    changes = {True: [], False: []}
+    unusable = []
+    templates = Template.objects.filter(provider__in=provider_ids).values_list(
+        'pk', 'provider_id', 'original_name', 'usable')
+    for pk, provider_id, original_name, usable in templates:
+        usability = template_usability.get((provider_id, original_name))
+        if usability is None:
+            continue
+        if usable != usability:
+            changes[usability].append(pk)
+        if not usability:
+            unusable.append(pk)
+    with transaction.atomic():
+        for usability, pks in changes.iteritems():
+            bulk_update(Template, pks, usable=usability)
+    return unusable
+
+
+@singleton_task()
+def poke_trackerbot(self):
+    """This beat-scheduled task periodically polls the trackerbot if there are any new templates.
+
+    The trackerbot templates are reconciled with the sprout ones as sets. The existing templates
+    are loaded at once, the differences are computed in memory and then written in bulk.
+    """
+    started = time.time()
+    # Extract data from trackerbot
+    tbapi = trackerbot()
+    objects = depaginate(
+        tbapi, tbapi.providertemplate().get(limit=TRACKERBOT_PAGINATE),
+        workers=TRACKERBOT_WORKERS)["objects"]
+    objects = interleave_trackerbot_templates(objects)
+    fetched = time.time()
+    configured_providers = set(conf.cfme_data.management_systems.keys())
+    template_usability = {}
     for template in objects:
-        if template["provider"]["key"] not in conf.cfme_data.management_systems.keys():
+        if template["provider"]["key"] not in configured_providers:
             # If we don't use that provider in yamls, set the template as not usable
             # 1) It will prevent adding this template if not added
             # 2) It'll mark the template as unusable if it already exists
             template["usable"] = False
-        template_usability.append(
-            (
-                template["provider"]["key"],
-                template["template"]["name"],
-                template["usable"]
-            )
-        )
-        if not template["usable"]:
-            continue
-        group, create = Group.objects.get_or_create(id=template["template"]["group"]["name"])
+        template_usability[template["provider"]["key"], template["template"]["name"]] = (
+            template["usable"])
+    objects = [template for template in objects if template["usable"]]
+    providers = get_or_create_all(Provider, {key for key, _ in template_usability})
+    groups = get_or_create_all(Group, {o["template"]["group"]["name"] for o in objects})
+
+    # Everything needed from the sprout side, loaded at once
+    provider_templates = {}  # provider id -> names of templates in the provider, from metadata
+    provider_data = {}
+    for provider in providers.itervalues():
+        if provider.is_working:
+            provider_templates[provider.id] = set(provider.templates)
+            provider_data[provider.id] = provider.provider_data
+    originals = {}  # (provider id, group id, template name) -> [Template]
+    preconfigured = {}  # (provider id, group id, original name) -> [Template]
+    for tpl in Template.objects.filter(provider__in=list(provider_templates)).only(
+            'id', 'provider', 'template_group', 'original_name', 'name', 'preconfigured',
+            'ga_released', 'custom_data', 'container', 'template_type'):
+        key = (tpl.provider_id, tpl.template_group_id, tpl.original_name)
+        if tpl.preconfigured:
+            preconfigured.setdefault(key, []).append(tpl)
+        elif tpl.name == tpl.original_name:
+            originals.setdefault(key, []).append(tpl)
+
+    # Compute the differences
+    ga_released_changes = {True: [], False: []}
+    openshift_changes = []
+    new_templates = []
+    to_configure = []
+    for template in objects:
+        group = groups[template["template"]["group"]["name"]]
         # Check if the template is already obsolete
         if group.template_obsolete_days is not None:
             build_date = parsetime.from_iso_date(template["template"]["datestamp"])
             if build_date <= (parsetime.today() - timedelta(days=group.template_obsolete_days)):
                 # It is already obsolete, so ignore it
                 continue
-        provider, create = Provider.objects.get_or_create(id=template["provider"]["key"])
+        provider = providers[template["provider"]["key"]]
         if not provider.is_working:
             continue
-        if "sprout" not in provider.provider_data:
+        data = provider_data[provider.id]
+        if "sprout" not in data:
             continue
-        if not provider.provider_data.get("use_for_sprout", False):
+        if not data.get("use_for_sprout", False):
             continue
         if not provider.provider_type:
-            provider.provider_type = provider.provider_data.get('type')
+            provider.provider_type = data.get('type')
             provider.save(update_fields=['provider_type'])
         template_name = template["template"]["name"]
         ga_released = template['template']['ga_released']
@@ -280,84 +372,93 @@ def poke_trackerbot(self):
         if not date:
             # Not a CFME/MIQ template, ignore it.
             continue
+        key = (provider.id, group.id, template_name)
+        in_provider = template_name in provider_templates[provider.id]
         # Original one
-        original_template = None
-        try:
-            original_template = Template.objects.get(
+        if key in originals:
+            for tpl in originals[key]:
+                if tpl.pk is not None and tpl.ga_released != ga_released:
+                    ga_released_changes[ga_released].append(tpl.pk)
+                if provider.provider_type == 'openshift' and tpl.pk is not None and (
+                        tpl.custom_data != processed_custom_data or
+                        tpl.container != 'cloudforms-0' or
+                        tpl.template_type != Template.OPENSHIFT_POD):
+                    openshift_changes.append((tpl.pk, processed_custom_data))
+                    tpl.custom_data = processed_custom_data
+        elif in_provider:
+            template_version = retrieve_cfme_appliance_version(template_name)
+            if template_version is None:
+                # Make up a faux version
+                # First 3 fields of version get parsed as a zstream
+                # therefore ... makes it a "nil" stream
+                template_version = "...{}".format(date.strftime("%Y%m%d"))
+            tpl = Template(
                 provider=provider, template_group=group, original_name=template_name,
-                name=template_name, preconfigured=False)
-            if original_template.ga_released != ga_released:
-                original_template.ga_released = ga_released
-                original_template.save(update_fields=['ga_released'])
+                name=template_name, preconfigured=False, date=date, ready=True, exists=True,
+                usable=True, version=template_version, ga_released=ga_released)
             if provider.provider_type == 'openshift':
-                if original_template.custom_data != custom_data:
-                    original_template.custom_data = processed_custom_data
-                original_template.template_type = Template.OPENSHIFT_POD
-                original_template.container = 'cloudforms-0'
-                original_template.save(update_fields=['custom_data',
-                                                      'container',
-                                                      'template_type'])
-        except ObjectDoesNotExist:
-            if template_name in provider.templates:
-                date = parse_template(template_name).datestamp
-                if date is None:
-                    self.logger.warning(
-                        "Ignoring template {} because it does not have a date!".format(
-                            template_name))
-                    continue
-                template_version = retrieve_cfme_appliance_version(template_name)
-                if template_version is None:
-                    # Make up a faux version
-                    # First 3 fields of version get parsed as a zstream
-                    # therefore ... makes it a "nil" stream
-                    template_version = "...{}".format(date.strftime("%Y%m%d"))
-                with transaction.atomic():
-                    tpl = Template(
-                        provider=provider, template_group=group, original_name=template_name,
-                        name=template_name, preconfigured=False, date=date, ready=True, exists=True,
-                        usable=True, version=template_version)
-                    tpl.save()
-                    if provider.provider_type == 'openshift':
-                        tpl.custom_data = processed_custom_data
-                        tpl.container = 'cloudforms-0'
-                        tpl.template_type = Template.OPENSHIFT_POD
-                        tpl.save(update_fields=['container', 'template_type', 'custom_data'])
-                    original_template = tpl
-                    self.logger.info("Created a new template #{}".format(tpl.id))
+                tpl.custom_data = processed_custom_data
+                tpl.container = 'cloudforms-0'
+                tpl.template_type = Template.OPENSHIFT_POD
+            new_templates.append(tpl)
+            originals[key] = [tpl]
         # If the provider is set to not preconfigure templates, do not bother even doing it.
         if provider.num_simultaneous_configuring > 0 and provider.provider_type != 'openshift':
             # Preconfigured one
-            try:
-                preconfigured_template = Template.objects.get(
-                    provider=provider, template_group=group, original_name=template_name,
-                    preconfigured=True)
-                if preconfigured_template.ga_released != ga_released:
-                    preconfigured_template.ga_released = ga_released
-                    preconfigured_template.save(update_fields=['ga_released'])
-            except ObjectDoesNotExist:
-                if template_name in provider.templates:
-                    original_id = original_template.id if original_template is not None else None
-                    create_appliance_template.delay(
-                        provider.id, group.id, template_name, source_template_id=original_id)
+            if key in preconfigured:
+                for tpl in preconfigured[key]:
+                    if tpl.ga_released != ga_released:
+                        ga_released_changes[ga_released].append(tpl.pk)
+            elif in_provider:
+                to_configure.append(key)
+                preconfigured[key] = []
+
+    # Apply them
+    with transaction.atomic():
+        for ga_released, pks in ga_released_changes.iteritems():
+            bulk_update(Template, pks, ga_released=ga_released)
+        # custom_data differs per template, these are rare enough to update one by one
+        for pk, custom_data in openshift_changes:
+            Template.objects.filter(pk=pk).update(
+                custom_data=custom_data, container='cloudforms-0',
+                template_type=Template.OPENSHIFT_POD)
+        Template.objects.bulk_create(new_templates)
+    # Django<1.10 does not set the primary keys in bulk_create
+    created = {}
+    if new_templates:
+        created_names = {tpl.original_name for tpl in new_templates}
+        for tpl in Template.objects.filter(
+                provider__in=list(provider_templates), preconfigured=False,
+                original_name__in=list(created_names)).only(
+                'id', 'provider', 'template_group', 'original_name'):
+            created[tpl.provider_id, tpl.template_group_id, tpl.original_name] = tpl.id
+        for tpl in new_templates:
+            self.logger.info("Created a new template #{}".format(
+                created.get((tpl.provider_id, tpl.template_group_id, tpl.original_name))))
+    for provider_id, group_id, template_name in to_configure:
+        original_ids = [
+            tpl.pk if tpl.pk is not None else created.get((provider_id, group_id, template_name))
+            for tpl in originals.get((provider_id, group_id, template_name), [])]
+        create_appliance_template.delay(
+            provider_id, group_id, template_name,
+            source_template_id=original_ids[0] if original_ids else None)
+
     # If any of the templates becomes unusable, let sprout know about it
     # Similarly if some of them becomes usable ...
-    for provider_id, template_name, usability in template_usability:
-        provider, create = Provider.objects.get_or_create(id=provider_id)
-        if not provider.working or provider.disabled:
-            continue
-        with transaction.atomic():
-            for template in Template.objects.filter(provider=provider, original_name=template_name):
-                template.usable = usability
-                template.save(update_fields=['usable'])
-                # Kill all shepherd appliances if they were acidentally spun up
-                if not usability:
-                    for appliance in Appliance.objects.filter(
-                            template=template, marked_for_deletion=False,
-                            appliance_pool=None):
-                        self.logger.info(
-                            'Killing an appliance {}/{} because its template was marked as unusable'
-                            .format(appliance.id, appliance.name))
-                        Appliance.kill(appliance)
+    unusable = reconcile_template_usability(template_usability, providers)
+    # Kill all shepherd appliances if they were acidentally spun up
+    for appliance in Appliance.objects.filter(
+            template__in=unusable, marked_for_deletion=False, appliance_pool=None):
+        self.logger.info(
+            'Killing an appliance {}/{} because its template was marked as unusable'
+            .format(appliance.id, appliance.name))
+        Appliance.kill(appliance)
+    self.logger.info(
+        "Reconciled {} trackerbot templates: {} created, {} ga_released changes, {} to configure"
+        ", fetching took {:.2f}s, total {:.2f}s".format(
+            len(template_usability), len(new_templates),
+            sum(len(pks) for pks in ga_released_changes.itervalues()), len(to_configure),
+            fetched - started, time.time() - started))
 
 
 @logged_task()
@@ -617,21 +718,19 @@ def prepare_template_delete_on_error(self, template_id):
 @logged_task()
 def request_appliance_pool(self, appliance_pool_id, time_minutes):
     """This task gives maximum possible amount of spinned-up appliances to the specified pool and
-    then if there is need to spin up another appliances, it spins them up via clone_template_to_pool
-    task."""
+    then if there is need to spin up another appliances, it queues them as delayed provisioning
+    tasks and kicks the placement planner in process_delayed_provision_tasks."""
     self.logger.info(
         "Appliance pool {} requested for {} minutes.".format(appliance_pool_id, time_minutes))
     pool = AppliancePool.objects.get(id=appliance_pool_id)
     n = Appliance.give_to_pool(pool)
-    for i in range(pool.total_count - n):
-        tpls = pool.possible_provisioning_templates
-        if tpls:
-            template_id = tpls[0].id
-            clone_template_to_pool(template_id, pool.id, time_minutes)
-        else:
-            with transaction.atomic():
+    missing = pool.total_count - n
+    if missing > 0:
+        with transaction.atomic():
+            for i in range(missing):
                 task = DelayedProvisionTask(pool=pool, lease_time=time_minutes)
                 task.save()
+        process_delayed_provision_tasks.delay()
     apply_lease_times_after_pool_fulfilled.delay(appliance_pool_id, time_minutes)
 
 
@@ -645,6 +744,8 @@ def apply_lease_times_after_pool_fulfilled(self, appliance_pool_id, time_minutes
         with transaction.atomic():
             pool.finished = True
             pool.save(update_fields=['finished'])
+        AppliancePoolRecord.objects.filter(pool_id=pool.id, fulfilled_on=None).update(
+            fulfilled_on=timezone.now())
     else:
         # Look whether we can swap any provisioning appliance with some in shepherd
         unfinished = list(
@@ -665,47 +766,100 @@ def apply_lease_times_after_pool_fulfilled(self, appliance_pool_id, time_minutes
             pool.kill()
 
 
+def _provider_capacities():
+    """Takes a snapshot of the free capacity of all usable providers in a few queries.
+
+    Returns:
+        A dictionary of provider id -> :py:class:`appliances.planner.ProviderCapacity`
+    """
+    managing = {
+        row['template__provider']: row['count']
+        for row in Appliance.objects.values('template__provider').annotate(count=Count('id'))}
+    provisioning = {
+        row['template__provider']: row['count']
+        for row in Appliance.objects.filter(
+            ready=False, marked_for_deletion=False, ip_address=None
+        ).values('template__provider').annotate(count=Count('id'))}
+    capacities = {}
+    for provider in Provider.objects.filter(working=True, disabled=False):
+        num_managing = managing.get(provider.id, 0)
+        # Same as Provider.remaining_provisioning_slots
+        slots = provider.num_simultaneous_provisioning - provisioning.get(provider.id, 0)
+        if provider.appliance_limit is not None:
+            slots = min(slots, provider.appliance_limit - num_managing)
+        capacities[provider.id] = ProviderCapacity(
+            provider.id, slots, provider.appliance_limit, num_managing)
+    return capacities
+
+
+def _dispatch_placements(placements):
+    """Creates the appliances for all the placements and the delayed tasks they satisfied in one
+    transaction, then launches the clone chains together."""
+    templates = Template.objects.select_related('template_group').in_bulk(
+        list({placement.candidate.template_id for placement in placements}))
+    clones = []
+    with transaction.atomic():
+        for placement in placements:
+            appliance = _new_pool_appliance(
+                templates[placement.candidate.template_id], placement.demand.pool_id)
+            DelayedProvisionTask.objects.filter(id=placement.demand.key).delete()
+            if appliance is not None:
+                clones.append(clone_template_to_appliance.si(
+                    appliance.id, placement.demand.lease_time, appliance.appliance_pool.yum_update))
+    if clones:
+        task_group(clones)()
+
+
 @singleton_task()
 def process_delayed_provision_tasks(self):
     """This picks up the provisioning tasks that were delayed due to ocncurrency limit of provision.
 
-    Goes one task by one and when some of them can be provisioned, it starts the provisioning and
-    then deletes the task.
+    Gives the pools what is available in shepherd first, then takes one snapshot of the providers'
+    capacity and places all the remaining tasks in one batch using
+    :py:func:`appliances.planner.plan`, oldest tasks first. Placed tasks are deleted and their
+    clones started together.
     """
-    for task in DelayedProvisionTask.objects.order_by("id"):
-        if task.pool.not_needed_anymore:
-            task.delete()
+    pools = {}
+    pool_tasks = {}
+    for task in DelayedProvisionTask.objects.select_related('pool').order_by("id"):
+        pools[task.pool.id] = task.pool
+        pool_tasks.setdefault(task.pool.id, []).append(task)
+    demands = []
+    for pool_id, tasks in pool_tasks.items():
+        pool = pools[pool_id]
+        if pool.not_needed_anymore:
+            DelayedProvisionTask.objects.filter(pool=pool).delete()
             continue
         # Try retrieve from shepherd
-        appliances_given = Appliance.give_to_pool(task.pool, 1)
-        if appliances_given == 0:
-            # No free appliance in shepherd, so do it on our own
-            tpls = task.pool.possible_provisioning_templates
-            if task.provider_to_avoid is not None:
-                filtered_tpls = filter(lambda tpl: tpl.provider != task.provider_to_avoid, tpls)
-                if filtered_tpls:
-                    # There are other providers to provision on, so try one of them
-                    tpls = filtered_tpls
-                # If there is no other provider to provision on, we will use the original list.
-                # This will cause additional rejects until the provider quota is met
-            if tpls:
-                clone_template_to_pool(tpls[0].id, task.pool.id, task.lease_time)
-                task.delete()
-            else:
-                # Try freeing up some space in provider
-                for provider in task.pool.possible_providers:
-                    appliances = provider.free_shepherd_appliances.exclude(
-                        **task.pool.appliance_filter_params)
-                    if appliances:
-                        appl = random.choice(appliances)
-                        self.logger.info(
-                            'Freeing some space in provider by killing appliance {}/{}'
-                            .format(appl.id, appl.name))
-                        Appliance.kill(appl)
-                        break  # Just one
-        else:
-            # There was a free appliance in shepherd, so we took it and we don't need this task more
-            task.delete()
+        appliances_given = Appliance.give_to_pool(pool, len(tasks))
+        if appliances_given:
+            DelayedProvisionTask.objects.filter(
+                id__in=[task.id for task in tasks[:appliances_given]]).delete()
+        candidates = [
+            Candidate(tpl.id, tpl.provider_id, tpl.version, tpl.date)
+            for tpl in pool.possible_templates]
+        for task in tasks[appliances_given:]:
+            demands.append(
+                Demand(task.id, pool_id, task.lease_time, task.provider_to_avoid_id, candidates))
+    if not demands:
+        return
+    demands.sort(key=lambda demand: demand.key)
+    placements, unplaced = plan(demands, _provider_capacities())
+    self.logger.info(
+        "Placed {} of {} delayed provisioning tasks".format(len(placements), len(demands)))
+    _dispatch_placements(placements)
+    for demand in unplaced:
+        # Try freeing up some space in provider
+        pool = pools[demand.pool_id]
+        for provider in pool.possible_providers:
+            appliances = provider.free_shepherd_appliances.exclude(**pool.appliance_filter_params)
+            if appliances:
+                appl = random.choice(appliances)
+                self.logger.info(
+                    'Freeing some space in provider by killing appliance {}/{}'
+                    .format(appl.id, appl.name))
+                Appliance.kill(appl)
+                break  # Just one
 
 
 @logged_task()
@@ -724,8 +878,8 @@ def replace_clone_to_pool(
     clone_template_to_pool(template.id, appliance_pool_id, time_minutes)
 
 
-def clone_template_to_pool(template_id, appliance_pool_id, time_minutes):
-    template = Template.objects.get(id=template_id)
+def _new_pool_appliance(template, appliance_pool_id):
+    """Creates the appliance object for the pool. Returns ``None`` if the pool is not needed."""
     if template.template_type != Template.OPENSHIFT_POD:
         appliance_format = settings.APPLIANCE_FORMAT
     else:
@@ -738,7 +892,7 @@ def clone_template_to_pool(template_id, appliance_pool_id, time_minutes):
     with transaction.atomic():
         pool = AppliancePool.objects.get(id=appliance_pool_id)
         if pool.not_needed_anymore:
-            return
+            return None
         # Apply also username
         new_appliance_name = "{}_{}".format(pool.owner.username, new_appliance_name)
         if template.template_type == Template.OPENSHIFT_POD:
@@ -751,7 +905,16 @@ def clone_template_to_pool(template_id, appliance_pool_id, time_minutes):
         pool.version = template.version
         pool.date = template.date
         pool.save(update_fields=['version', 'date'])
-    clone_template_to_appliance.delay(appliance.id, time_minutes, pool.yum_update)
+    return appliance
+
+
+def clone_template_to_pool(template_id, appliance_pool_id, time_minutes):
+    template = Template.objects.get(id=template_id)
+    appliance = _new_pool_appliance(template, appliance_pool_id)
+    if appliance is None:
+        return
+    clone_template_to_appliance.delay(
+        appliance.id, time_minutes, appliance.appliance_pool.yum_update)
 
 
 @logged_task()
@@ -1109,46 +1272,94 @@ def refresh_appliances(self):
         refresh_appliances_provider.delay(provider.id)
 
 
+def _reconcile_appliance(appliance, vm):
+    """Compares the stored state of the appliance with the VM listed by the provider and applies
+    the differences on the object without saving it.
+
+    Args:
+        appliance: :py:class:`appliances.models.Appliance` instance.
+        vm: VM object from the provider's ``all_vms`` listing or ``None`` if the VM is gone.
+
+    Returns:
+        A :py:class:`set` of field names that were changed.
+    """
+    if vm is None:
+        return appliance.set_power_state(Appliance.Power.ORPHANED)
+    changed = set()
+    for field, value in [('name', vm.name), ('uuid', vm.uuid), ('ip_address', vm.ip)]:
+        if getattr(appliance, field) != value:
+            setattr(appliance, field, value)
+            changed.add(field)
+    changed |= appliance.set_power_state(
+        Appliance.POWER_STATES_MAPPING.get(vm.power_state, Appliance.Power.UNKNOWN))
+    return changed
+
+
 @singleton_task(soft_time_limit=180)
 def refresh_appliances_provider(self, provider_id):
     """Downloads the list of VMs from the provider, then matches them by name or UUID with
     appliances stored in database.
+
+    Only the appliances whose uuid, name, ip or power state differ from the provider's listing
+    are written back, all of them in a single transaction. Latency and change counts of the
+    refresh are stored in the provider's ``appliance_refresh_stats``.
     """
     self.logger.info("Refreshing appliances in {}".format(provider_id))
     provider = Provider.objects.get(id=provider_id, working=True, disabled=False)
     if not hasattr(provider.api, "all_vms"):
         # Ignore this provider
         return
+    started = time.time()
     vms = provider.api.all_vms()
+    listed = time.time()
     dict_vms = {}
     uuid_vms = {}
     for vm in vms:
         dict_vms[vm.name] = vm
         if vm.uuid:
             uuid_vms[vm.uuid] = vm
+    updates = []
+    total = orphaned = 0
     for appliance in Appliance.objects.filter(template__provider=provider):
+        total += 1
         if appliance.uuid is not None and appliance.uuid in uuid_vms:
-            vm = uuid_vms[appliance.uuid]
             # Using the UUID and change the name if it changed
-            appliance.name = vm.name
-            appliance.ip_address = vm.ip
-            appliance.set_power_state(Appliance.POWER_STATES_MAPPING.get(
-                vm.power_state, Appliance.Power.UNKNOWN))
-            appliance.save()
+            vm = uuid_vms[appliance.uuid]
         elif appliance.name in dict_vms:
-            vm = dict_vms[appliance.name]
             # Using the name, and then retrieve uuid
-            appliance.uuid = vm.uuid
-            appliance.ip_address = vm.ip
-            appliance.set_power_state(Appliance.POWER_STATES_MAPPING.get(
-                vm.power_state, Appliance.Power.UNKNOWN))
-            appliance.save()
-            self.logger.info("Retrieved UUID for appliance {}/{}: {}".format(
-                appliance.id, appliance.name, appliance.uuid))
+            vm = dict_vms[appliance.name]
         else:
             # Orphaned :(
-            appliance.set_power_state(Appliance.Power.ORPHANED)
-            appliance.save()
+            vm = None
+            orphaned += 1
+        changed = _reconcile_appliance(appliance, vm)
+        if not changed:
+            continue
+        if 'uuid' in changed:
+            self.logger.info("Retrieved UUID for appliance {}/{}: {}".format(
+                appliance.id, appliance.name, appliance.uuid))
+        changed.add('modified_on')
+        appliance.modified_on = timezone.now()
+        updates.append((appliance.pk, {field: getattr(appliance, field) for field in changed}))
+    # Django<1.10 has no bulk_update, so issue only the UPDATEs needed in one transaction
+    with transaction.atomic():
+        for appliance_pk, values in updates:
+            Appliance.objects.filter(pk=appliance_pk).update(**values)
+    finished = time.time()
+    stats = {
+        'finished_on': timezone.now().isoformat(),
+        'list_time': listed - started,
+        'total_time': finished - started,
+        'num_vms': len(dict_vms),
+        'num_appliances': total,
+        'num_changed': len(updates),
+        'num_orphaned': orphaned,
+    }
+    provider.appliance_refresh_stats = stats
+    self.logger.info(
+        "Refreshed appliances in {}: {num_changed}/{num_appliances} changed, {num_orphaned} "
+        "orphaned, listing took {list_time:.2f}s, total {total_time:.2f}s".format(
+            provider_id, **stats))
 
 
 @singleton_task()
@@ -1177,19 +1388,38 @@ def check_templates_in_provider(self, provider_id):
         return
     # Check Sprout template existence
     # expiration_time = (timezone.now() - timedelta(**settings.BROKEN_APPLIANCE_GRACE_TIME))
-    for template in Template.objects.filter(provider=provider):
-        with transaction.atomic():
-            tpl = Template.objects.get(pk=template.pk)
-            exists = tpl.name in templates
-            tpl.exists = exists
-            tpl.save(update_fields=['exists'])
-        # if not exists:
-        #     if len(Appliance.objects.filter(template=template).all()) == 0\
-        #             and template.status_changed < expiration_time:
-        #         # No other appliance is made from this template so no need to keep it
-        #         with transaction.atomic():
-        #             tpl = Template.objects.get(pk=template.pk)
-        #             tpl.delete()
+    # if not exists:
+    #     if len(Appliance.objects.filter(template=template).all()) == 0\
+    #             and template.status_changed < expiration_time:
+    #         # No other appliance is made from this template so no need to keep it
+    #         with transaction.atomic():
+    #             tpl = Template.objects.get(pk=template.pk)
+    #             tpl.delete()
+    found, lost = reconcile_template_existence(provider, templates)
+    if found or lost:
+        self.logger.info("Templates of {}: {} found, {} lost".format(provider_id, found, lost))
+
+
+def reconcile_template_existence(provider, template_names):
+    """Sets ``exists`` of the provider's templates in two bulk updates.
+
+    Args:
+        provider: :py:class:`appliances.models.Provider` the templates are in.
+        template_names: Names of all the templates in the provider.
+
+    Returns:
+        Tuple of the number of templates found and lost.
+    """
+    template_names = set(template_names)
+    changes = {True: [], False: []}
+    for pk, name, exists in Template.objects.filter(provider=provider).values_list(
+            'pk', 'name', 'exists'):
+        if (name in template_names) != exists:
+            changes[not exists].append(pk)
+    with transaction.atomic():
+        for exists, pks in changes.iteritems():
+            bulk_update(Template, pks, exists=exists)
+    return len(changes[True]), len(changes[False])
 
 
 @singleton_task()
@@ -1271,6 +1501,15 @@ def generic_shepherd(self, preconfigured):
             continue  # Ignore this group, no templates detected yet
 
         filter_keep.update(prov_filter)
+        pool_size = gs.template_pool_size if preconfigured else gs.unconfigured_template_pool_size
+        base_pool_size = pool_size
+        if gs.max_prewarm_size:
+            now = timezone.now()
+            forecast = DemandForecast(gs.pool_history(
+                preconfigured, since=now - timedelta(**settings.SHEPHERD_FORECAST_HISTORY)))
+            pool_size = prewarm_size(
+                pool_size, forecast, now, timedelta(**settings.SHEPHERD_PREWARM_LEAD),
+                gs.max_prewarm_size)
         for filt in filters_kill:
             filt.update(prov_filter)
         # Keeping current appliances
@@ -1290,26 +1529,34 @@ def generic_shepherd(self, preconfigured):
         # If we then want to delete some templates, better kill the eldest. status_changed
         # says which one was provisioned when, because nothing else then touches that field.
         appliances.sort(key=lambda appliance: appliance.status_changed)
-        pool_size = gs.template_pool_size if preconfigured else gs.unconfigured_template_pool_size
         if len(appliances) < pool_size and possible_templates_for_provision:
             # There must be some templates in order to run the provisioning
             # Provision ONE appliance at time for each group, that way it is possible to maintain
-            # reasonable balancing
-            new_appliance_name = settings.APPLIANCE_FORMAT.format(
-                group=template.template_group.id,
-                date=template.date.strftime("%y%m%d"),
-                rnd=fauxfactory.gen_alphanumeric(8))
-            with transaction.atomic():
-                # Now look for templates that are on non-busy providers
-                tpl_free = filter(
-                    lambda t: t.provider.free,
-                    possible_templates_for_provision)
-                if tpl_free:
-                    appliance = Appliance(
-                        template=sorted(tpl_free, key=lambda t: t.provider.appliance_load)[0],
-                        name=new_appliance_name)
-                    appliance.save()
-            if tpl_free:
+            # reasonable balancing. When pre-warming for a forecast burst, fill the whole gap as
+            # far as the providers' capacity allows.
+            if pool_size > base_pool_size:
+                num_to_add = pool_size - len(appliances)
+                self.logger.info("Pre-warming shepherd {} to {} appliances ({} configured)".format(
+                    gs.id, pool_size, base_pool_size))
+            else:
+                num_to_add = 1
+            for _ in range(num_to_add):
+                new_appliance_name = settings.APPLIANCE_FORMAT.format(
+                    group=template.template_group.id,
+                    date=template.date.strftime("%y%m%d"),
+                    rnd=fauxfactory.gen_alphanumeric(8))
+                with transaction.atomic():
+                    # Now look for templates that are on non-busy providers
+                    tpl_free = filter(
+                        lambda t: t.provider.free,
+                        possible_templates_for_provision)
+                    if tpl_free:
+                        appliance = Appliance(
+                            template=sorted(tpl_free, key=lambda t: t.provider.appliance_load)[0],
+                            name=new_appliance_name)
+                        appliance.save()
+                if not tpl_free:
+                    break
                 self.logger.info(
                     "Adding an appliance to shepherd: {}/{}".format(appliance.id, appliance.name))
                 clone_template_to_appliance.delay(appliance.id, None)
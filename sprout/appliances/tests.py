@@ -1,4 +1,300 @@
 # -*- coding: utf-8 -*-
-# from django.test import TestCase
+from datetime import date, datetime, timedelta
 
-# Create your tests here.
+import mock
+from django.contrib.auth.models import Group as DjangoGroup
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import utc
+
+from appliances.api import _request_check
+from appliances.forecast import DemandForecast, backtest, prewarm_size
+from appliances.planner import Candidate, Demand, ProviderCapacity, plan, simulate
+from appliances.tasks import (
+    process_delayed_provision_tasks, reconcile_template_existence, reconcile_template_usability)
+from appliances.models import (
+    Appliance, AppliancePool, AppliancePoolRecord, DelayedProvisionTask, Group, GroupShepherd,
+    Provider, Template, User)
+
+
+class PoolStatusTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sprout', password='sprout')
+        self.user.groups.add(DjangoGroup.objects.create(name='sprout'))
+        self.group = Group.objects.create(id='downstream-59z')
+        self.provider = Provider.objects.create(id='rhos11', working=True)
+        self.template = Template.objects.create(
+            provider=self.provider, template_group=self.group, version='5.9.2.1',
+            date=date(2018, 5, 1), original_name='cfme-5921-0501', name='s_tpl_0501',
+            ready=True, usable=True)
+
+    def create_pool(self, num_appliances):
+        pool = AppliancePool.objects.create(
+            group=self.group, owner=self.user, total_count=num_appliances)
+        for i in range(num_appliances):
+            Appliance.objects.create(
+                template=self.template, appliance_pool=pool, name='appliance_{}'.format(i),
+                ip_address='10.0.0.{}'.format(i), power_state=Appliance.Power.ON, ready=True)
+        return pool
+
+    def request_check(self, pool):
+        with CaptureQueriesContext(connection) as context:
+            result = _request_check(self.user, pool.id)
+        return len(context.captured_queries), result
+
+    def test_request_check_query_count(self):
+        small, small_result = self.request_check(self.create_pool(1))
+        large, large_result = self.request_check(self.create_pool(30))
+        self.assertEqual(small, large)
+        self.assertTrue(large_result['fulfilled'])
+        self.assertEqual(large_result['progress'], 100)
+        self.assertEqual(len(large_result['appliances']), 30)
+
+    def test_serialized_matches_values(self):
+        pool = self.create_pool(1)
+        appliance = Appliance.objects.get(appliance_pool=pool)
+        self.assertEqual(appliance.serialized, pool.status.serialized_appliances[0])
+
+
+class TemplateReconcileTestCase(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(id='downstream-59z')
+        self.provider = Provider.objects.create(id='rhos11', working=True)
+
+    def create_templates(self, num_templates):
+        Template.objects.bulk_create(
+            Template(
+                provider=self.provider, template_group=self.group, version='5.9.2.1',
+                date=date(2018, 5, 1), original_name='cfme-{}'.format(i),
+                name='cfme-{}'.format(i), preconfigured=False, exists=i % 2 == 0,
+                usable=i % 3 == 0)
+            for i in range(num_templates))
+
+    def reconcile_existence(self, num_templates):
+        self.create_templates(num_templates)
+        # Every other template exists, the first ten change their existence
+        names = ['cfme-{}'.format(i) for i in range(num_templates) if (i % 2 == 0) != (i < 10)]
+        with CaptureQueriesContext(connection) as context:
+            result = reconcile_template_existence(self.provider, names)
+        return len(context.captured_queries), result
+
+    def test_reconcile_existence_query_count(self):
+        small, _ = self.reconcile_existence(20)
+        Template.objects.all().delete()
+        large, result = self.reconcile_existence(5000)
+        self.assertEqual(small, large)
+        self.assertEqual(result, (5, 5))
+        self.assertEqual(Template.objects.filter(exists=True).count(), 2500)
+
+    def test_reconcile_usability(self):
+        self.create_templates(3000)
+        usability = {('rhos11', 'cfme-{}'.format(i)): i < 1500 for i in range(3000)}
+        with CaptureQueriesContext(connection) as context:
+            unusable = reconcile_template_usability(usability, {'rhos11': self.provider})
+        self.assertLess(len(context.captured_queries), 12)
+        self.assertEqual(len(unusable), 1500)
+        self.assertEqual(Template.objects.filter(usable=True).count(), 1500)
+
+
+class PlannerTestCase(SimpleTestCase):
+    old = Candidate(1, 'rhos11', '5.9.2.1', date(2018, 5, 1))
+    new = Candidate(2, 'vsphere65', '5.9.3.0', date(2018, 6, 1))
+
+    def demands(self, pool_ids, candidates, avoid_provider=None, first_key=0):
+        return [
+            Demand(first_key + i, pool_id, None, avoid_provider, candidates)
+            for i, pool_id in enumerate(pool_ids)]
+
+    def placed(self, placements):
+        return [(p.demand.key, p.candidate.provider_id) for p in placements]
+
+    def test_capacity_limits(self):
+        same_date = self.new._replace(version='5.9.2.1', date=self.old.date)
+        capacities = {
+            'rhos11': ProviderCapacity('rhos11', 2),
+            # Slots already limited by the caller to what the appliance limit allows
+            'vsphere65': ProviderCapacity('vsphere65', 1, appliance_limit=10, num_managing=9),
+            'rhevm': ProviderCapacity('rhevm', -2)}
+        candidates = [self.old, same_date, Candidate(3, 'rhevm', '5.9.2.1', self.old.date)]
+        placements, unplaced = plan(self.demands([1] * 5, candidates), capacities)
+        self.assertEqual(
+            self.placed(placements), [(0, 'rhos11'), (1, 'rhos11'), (2, 'vsphere65')])
+        self.assertEqual([demand.key for demand in unplaced], [3, 4])
+        self.assertFalse(any(capacity.free for capacity in capacities.values()))
+        self.assertEqual(capacities['vsphere65'].num_managing, 10)
+
+    def test_unknown_provider_not_placed(self):
+        placements, unplaced = plan(
+            self.demands([1], [self.old]), {'vsphere65': ProviderCapacity('vsphere65', 5)})
+        self.assertEqual(placements, [])
+        self.assertEqual(len(unplaced), 1)
+
+    def test_oldest_demand_first(self):
+        capacities = {'rhos11': ProviderCapacity('rhos11', 1)}
+        demands = self.demands([1, 2], [self.old])
+        placements, unplaced = plan(demands, capacities)
+        self.assertEqual(self.placed(placements), [(0, 'rhos11')])
+        self.assertEqual(unplaced, demands[1:])
+
+    def test_least_loaded_provider(self):
+        capacities = {
+            'rhos11': ProviderCapacity('rhos11', 3, appliance_limit=10, num_managing=5),
+            'vsphere65': ProviderCapacity('vsphere65', 3, appliance_limit=10, num_managing=2)}
+        same_date = self.new._replace(version='5.9.2.1', date=self.old.date)
+        placements, unplaced = plan(
+            self.demands([1, 2, 3, 4], [self.old, same_date]), capacities)
+        # The load is updated after each placement, the fourth one is out of vsphere65 slots
+        self.assertEqual(
+            self.placed(placements),
+            [(0, 'vsphere65'), (1, 'vsphere65'), (2, 'vsphere65'), (3, 'rhos11')])
+        self.assertEqual(unplaced, [])
+
+    def test_pool_pinned_to_first_version(self):
+        capacities = {
+            'rhos11': ProviderCapacity('rhos11', 5), 'vsphere65': ProviderCapacity('vsphere65', 1)}
+        demands = self.demands([1, 1, 1, 2], [self.old, self.new])
+        placements, unplaced = plan(demands, capacities)
+        # Pool 1 got the newest template, the rest of it cannot go to another version
+        self.assertEqual(
+            [(p.demand.key, p.candidate.template_id) for p in placements], [(0, 2), (3, 1)])
+        self.assertEqual([demand.key for demand in unplaced], [1, 2])
+
+    def test_avoid_provider(self):
+        capacities = {
+            'rhos11': ProviderCapacity('rhos11', 5), 'vsphere65': ProviderCapacity('vsphere65', 5)}
+        placements, _ = plan(
+            self.demands([1], [self.old, self.new], avoid_provider='vsphere65'), capacities)
+        self.assertEqual(self.placed(placements), [(0, 'rhos11')])
+        # No other provider available, the avoided one is used
+        placements, _ = plan(
+            self.demands([2], [self.new], avoid_provider='vsphere65'), capacities)
+        self.assertEqual(self.placed(placements), [(0, 'vsphere65')])
+
+    def test_simulate(self):
+        recording = {
+            'providers': [{'id': 'rhos11', 'provisioning_slots': 2, 'clone_minutes': 10}],
+            'templates': [{'id': 1, 'provider': 'rhos11', 'version': '5.9.2.1'}],
+            'requests': [
+                {'at': 0, 'count': 3},
+                {'at': 5, 'count': 1},
+                {'at': 0, 'count': 1, 'templates': [2]}]}
+        result = simulate(recording, tick_seconds=60)
+        # Two clones at a time, the third appliance of the first pool and the second pool's one
+        # start when the first two finish at 10 minutes
+        self.assertEqual(result['pools'], {0: 20, 1: 15})
+        self.assertEqual(result['unfulfilled'], [2])
+        self.assertEqual(result['mean_time_to_fulfil'], 17.5)
+        self.assertEqual(result['max_time_to_fulfil'], 20)
+
+
+class DelayedProvisionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sprout', password='sprout')
+        user_group = DjangoGroup.objects.create(name='sprout')
+        self.user.groups.add(user_group)
+        self.group = Group.objects.create(id='downstream-59z')
+        self.rhos = Provider.objects.create(
+            id='rhos11', working=True, num_simultaneous_provisioning=2)
+        self.vsphere = Provider.objects.create(id='vsphere65', working=True, appliance_limit=10)
+        templates = {}
+        for provider in [self.rhos, self.vsphere]:
+            provider.user_groups.add(user_group)
+            templates[provider.id] = Template.objects.create(
+                provider=provider, template_group=self.group, version='5.9.2.1',
+                date=date(2018, 5, 1), original_name='cfme-5921-0501',
+                name='s_tpl_0501_{}'.format(provider.id), ready=True, usable=True)
+        # vsphere65 is one appliance short of its limit
+        busy_pool = AppliancePool.objects.create(group=self.group, owner=self.user, total_count=9)
+        for i in range(9):
+            Appliance.objects.create(
+                template=templates['vsphere65'], appliance_pool=busy_pool,
+                name='appliance_{}'.format(i), ip_address='10.0.0.{}'.format(i),
+                power_state=Appliance.Power.ON, ready=True)
+        self.pool = AppliancePool.objects.create(group=self.group, owner=self.user, total_count=4)
+        self.tasks = [DelayedProvisionTask.objects.create(pool=self.pool) for i in range(4)]
+
+    def test_batch_placement(self):
+        with mock.patch('appliances.tasks.cache'), \
+                mock.patch('appliances.tasks.task_group') as task_group:
+            process_delayed_provision_tasks()
+        task_group.assert_called_once()
+        self.assertEqual(len(task_group.call_args[0][0]), 3)
+        # The newest task is left for the next run
+        self.assertEqual(
+            list(DelayedProvisionTask.objects.values_list('id', flat=True)), [self.tasks[-1].id])
+        self.assertEqual(self.pool.appliances.filter(template__provider=self.rhos).count(), 2)
+        self.assertEqual(self.pool.appliances.filter(template__provider=self.vsphere).count(), 1)
+
+
+def at(day, hour, minute=0):
+    """May 2018, the 7th is a Monday"""
+    return datetime(2018, 5, day, hour, minute, tzinfo=utc)
+
+
+class ForecastTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('sprout', password='sprout')
+        user_group = DjangoGroup.objects.create(name='sprout')
+        self.user.groups.add(user_group)
+        self.group = Group.objects.create(id='downstream-59z')
+        self.shepherd = GroupShepherd.objects.create(
+            template_group=self.group, user_group=user_group, template_pool_size=2,
+            max_prewarm_size=3)
+
+    def record(self, created_on, num_appliances, preconfigured=True):
+        AppliancePoolRecord.objects.create(
+            template_group=self.group, owner=self.user, preconfigured=preconfigured,
+            num_appliances=num_appliances, created_on=created_on)
+
+    def weekly_history(self):
+        # Two Monday morning bursts and a Sunday afternoon pool, two whole weeks
+        self.record(at(7, 9, 10), 6)
+        self.record(at(14, 9, 20), 8)
+        self.record(at(20, 15), 1)
+        self.record(at(14, 9), 20, preconfigured=False)
+        return DemandForecast(self.shepherd.pool_history(True))
+
+    def test_weekly_average(self):
+        forecast = self.weekly_history()
+        self.assertEqual(forecast.days, 14)
+        self.assertEqual(forecast.hourly(at(21, 9, 30)), 7)
+        self.assertEqual(forecast.hourly(at(27, 15)), 0.5)
+        self.assertEqual(forecast.hourly(at(22, 9)), 0)
+
+    def test_daily_average_first_week(self):
+        self.record(at(7, 9, 10), 6)
+        forecast = DemandForecast(self.shepherd.pool_history(True))
+        self.assertEqual(forecast.days, 1)
+        # Less than a week of history, every day looks the same
+        self.assertEqual(forecast.hourly(at(11, 9)), 6)
+
+    def test_prewarm_capped(self):
+        forecast = self.weekly_history()
+        monday = at(21, 7)
+        lead = timedelta(hours=3)
+        self.assertEqual(prewarm_size(2, forecast, monday, lead, 10), 7)
+        self.assertEqual(prewarm_size(2, forecast, monday, lead, 3), 5)
+        self.assertEqual(prewarm_size(2, forecast, monday, lead, 0), 2)
+        self.assertEqual(prewarm_size(2, DemandForecast([]), monday, lead, 10), 2)
+
+    def test_prewarm_lead_time(self):
+        forecast = self.weekly_history()
+        self.assertEqual(prewarm_size(2, forecast, at(21, 5), timedelta(hours=3), 10), 2)
+        self.assertEqual(prewarm_size(2, forecast, at(21, 5), timedelta(hours=4), 10), 7)
+        # The burst is over
+        self.assertEqual(prewarm_size(2, forecast, at(21, 10), timedelta(hours=3), 10), 2)
+
+    def test_backtest(self):
+        self.record(at(7, 9), 3)
+        self.record(at(8, 9), 3)
+        history = self.shepherd.pool_history(True)
+        # The fixed shepherd of one appliance makes both pools wait for a clone. The forecast,
+        # learned from the first pool only, tops the shepherd up to three an hour before the second.
+        self.assertEqual(backtest(history, 1, 5, lead=timedelta(hours=1)), {
+            'fixed': {'mean_wait': 30, 'idle_hours': 23.5},
+            'forecast': {'mean_wait': 15, 'idle_hours': 25.5}})
+        # Capped to one extra appliance, which is not enough for the second pool
+        self.assertEqual(backtest(history, 1, 1, lead=timedelta(hours=1))['forecast'], {
+            'mean_wait': 30, 'idle_hours': 24.5})
+        self.assertIsNone(backtest([], 1, 5))
@@ -166,6 +166,15 @@ ORPHANED_APPLIANCE_GRACE_TIME = dict(
     minutes=45,
 )
 
+# How far back the shepherd learns the pool demand from and how far ahead it pre-warms
+SHEPHERD_FORECAST_HISTORY = dict(
+    weeks=4,
+)
+
+SHEPHERD_PREWARM_LEAD = dict(
+    hours=3,
+)
+
 # Celery beat
 CELERYBEAT_SCHEDULE = {
     'check-templates': {
@@ -484,6 +484,91 @@ class Table(VanillaTable):
             self.click_sort(column)
             self.logger.debug('sort_by(%r, %r): order already selected', column, order)
 
+    def read_content(self):
+        """Reads the headers and cell texts of the currently displayed page in one call.
+
+        Reading the table through :py:meth:`rows` costs a WebDriver round trip per cell, which
+        makes reading big reports take ages. This serializes the whole table in the browser.
+
+        Returns:
+            A tuple ``(headers, rows)``. ``headers`` is a tuple of header texts (``None`` for the
+            empty ones), ``rows`` is a list of dictionaries with keys ``cells`` (tuple of cell
+            texts) and ``spanned`` (``True`` if any of the cells spans more columns or rows, eg.
+            the "Totals" rows of the reports).
+        """
+        self.browser.plugin.ensure_page_safe()
+        result = self.browser.execute_script(jsmin('''
+            var table = arguments[0];
+            function text(cell) {
+                return (cell.innerText || cell.textContent || "").trim();
+            }
+            function children(parent, tag) {
+                var result = [];
+                for (var i = 0; i < parent.children.length; i++) {
+                    if (parent.children[i].tagName.toLowerCase() === tag) {
+                        result.push(parent.children[i]);
+                    }
+                }
+                return result;
+            }
+            var headers = [];
+            var thead = children(table, "thead");
+            var header_trs = thead.length ? children(thead[0], "tr") : children(table, "tr");
+            for (var i = 0; i < header_trs.length; i++) {
+                var ths = children(header_trs[i], "th");
+                if (ths.length === 0 && thead.length) {
+                    ths = children(header_trs[i], "td");
+                }
+                for (var j = 0; j < ths.length; j++) {
+                    headers.push(text(ths[j]) || null);
+                }
+            }
+            var sections = [table].concat(children(table, "tbody"));
+            var rows = [];
+            for (var i = 0; i < sections.length; i++) {
+                var trs = children(sections[i], "tr");
+                for (var j = 0; j < trs.length; j++) {
+                    var tds = children(trs[j], "td");
+                    if (tds.length === 0 || children(trs[j], "th").length > 0) {
+                        continue;
+                    }
+                    var cells = [];
+                    var spanned = false;
+                    for (var k = 0; k < tds.length; k++) {
+                        cells.push(text(tds[k]));
+                        spanned = spanned || tds[k].colSpan > 1 || tds[k].rowSpan > 1;
+                    }
+                    rows.push({cells: cells, spanned: spanned});
+                }
+            }
+            return {headers: headers, rows: rows};
+        '''), self.browser.element(self))
+        headers = tuple(result['headers'])
+        rows = [
+            {'cells': tuple(row['cells']), 'spanned': row['spanned']}
+            for row in result['rows']]
+        self.logger.debug('read_content: %d headers, %d rows', len(headers), len(rows))
+        return headers, rows
+
+    def read_pages(self, paginator=None, skip_spanned=True):
+        """Reads the table on all the pages of the paginator with one script call per page.
+
+        Args:
+            paginator: Pagination pane to iterate over. If not passed, only the current page is
+                read.
+            skip_spanned: Whether to leave out the rows with cells spanning multiple columns.
+
+        Returns:
+            A tuple ``(headers, rows)`` where ``rows`` is a list of tuples of the cell texts.
+        """
+        headers = ()
+        rows = []
+        for _ in (paginator.pages() if paginator is not None else [None]):
+            headers, page_rows = self.read_content()
+            rows.extend(
+                row['cells'] for row in page_rows if not (skip_spanned and row['spanned']))
+        return headers, rows
+
 
 class SummaryTable(VanillaTable):
     """Table used in Provider, VM, Host, ... summaries.
@@ -1461,6 +1546,16 @@ class NonJSPaginationPane(View):
             items_text = '{} items'.format(value)
         self.items_on_page.select_by_visible_text(items_text)
 
+    @property
+    def max_items_per_page(self):
+        """The largest number of items per page offered by the page size selector."""
+        return max(
+            int(re.sub(r'\s+items', '', option.text)) for option in self.items_on_page.all_options)
+
+    def set_max_items_per_page(self):
+        """Selects the largest page size, so the least pages have to be walked through."""
+        self.set_items_per_page(self.max_items_per_page)
+
     def _parse_pages(self):
         min_item, max_item, item_amt = self.paginator.page_info()
 
@@ -3773,18 +3868,81 @@ class Splitter(Widget):
             self.pull_right()
 
 
+class DriftSnapshot(object):
+    """Drift Analysis grid read at one moment, see :py:meth:`DriftComparison.snapshot`.
+
+    Sections are looked up by name, which can be a partial text like in the XPath based lookups
+    of :py:class:`DriftComparison`.
+
+    Args:
+        rows: List of dictionaries with keys ``id`` (``data-exp-id``), ``parent``
+            (``data-parent``), ``name`` and ``changed`` for all the grid rows in document order.
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        self._by_parent = {}
+        for row in rows:
+            if row['parent'] is not None:
+                self._by_parent.setdefault(row['parent'], []).append(row)
+        self._lookups = {}
+
+    @property
+    def sections(self):
+        return [row for row in self.rows if row['id'] is not None]
+
+    def _section_index(self, drift_section):
+        if drift_section not in self._lookups:
+            matching = [
+                i for i, row in enumerate(self.rows)
+                if row['id'] is not None and drift_section in row['name']]
+            if not matching:
+                raise NoSuchElementException(
+                    'Drift section {!r} not found'.format(drift_section))
+            self._lookups[drift_section] = matching[0]
+        return self._lookups[drift_section]
+
+    def is_changed(self, drift_section):
+        return self.rows[self._section_index(drift_section)]['changed']
+
+    def _attributes(self, index):
+        # Attributes are the rows sharing the parent of the row following the section
+        if index + 1 >= len(self.rows) or self.rows[index + 1]['parent'] is None:
+            return []
+        return self._by_parent[self.rows[index + 1]['parent']]
+
+    def parent_id(self, drift_section):
+        index = self._section_index(drift_section) + 1
+        return self.rows[index]['parent'] if index < len(self.rows) else None
+
+    def section_attributes(self, drift_section):
+        return [row['name'] for row in self._attributes(self._section_index(drift_section))]
+
+    @property
+    def section_values(self):
+        return {section['name']: section['changed'] for section in self.sections}
+
+    def read(self):
+        return {
+            row['name']: {
+                'changed': row['changed'],
+                'attributes': {attr['name']: attr['changed'] for attr in self._attributes(i)}}
+            for i, row in enumerate(self.rows) if row['id'] is not None}
+
+
 class DriftComparison(Widget):
     """Represents Drift Analysis Sections Comparison Table
 
+    The grid is read in one script call into a :py:class:`DriftSnapshot`. The toolbar buttons
+    of the Drift Analysis re-render the grid, so every query takes a fresh snapshot. Take one with
+    :py:meth:`snapshot` when asking about many sections at once.
+
         Args:
         locator: Locator for Drift Analysis Sections Comparison Table.
     """
 
     ROOT = ParametrizedLocator('{@locator}')
     ALL_SECTIONS = ".//tr[@data-exp-id]"
-    CELLS = "./td//i"
     SECTION = ".//th[contains(text(), {})]/ancestor::tr"
-    INDENT = ".//tr[contains(@data-parent, {id})]"
 
     def __init__(self, parent, locator, logger=None):
         Widget.__init__(self, parent, logger=logger)
@@ -3804,6 +3962,33 @@ class DriftComparison(Widget):
         """
         return self.browser.element(self.SECTION.format(quote(drift_section)))
 
+    def snapshot(self):
+        """ Reads the whole grid in one script call
+            Return:
+                :py:class:`DriftSnapshot`
+        """
+        rows = self.browser.execute_script(jsmin('''
+            var rows = arguments[0].querySelectorAll("tr");
+            var result = [];
+            for (var i = 0; i < rows.length; i++) {
+                var row = rows[i];
+                var header = row.querySelector("th");
+                var changed = false;
+                var icons = row.querySelectorAll("td i");
+                for (var j = 0; j < icons.length && !changed; j++) {
+                    changed = icons[j].classList.contains("drift-delta");
+                }
+                result.push({
+                    id: row.getAttribute("data-exp-id"),
+                    parent: row.getAttribute("data-parent"),
+                    name: (header || row).textContent.trim(),
+                    changed: changed
+                });
+            }
+            return result;
+        '''), self.browser.element(self))
+        return DriftSnapshot(rows)
+
     def is_changed(self, drift_section):
         """ Check if section was changed
             Args:
@@ -3811,10 +3996,7 @@ class DriftComparison(Widget):
             Return:
                 bool: True if changed, otherwise False
         """
-        cells = self.browser.elements(
-            self.CELLS, parent=self.section_element(drift_section))
-        attrs = [self.browser.get_attribute("class", cell) for cell in cells]
-        return "drift-delta" in attrs
+        return self.snapshot().is_changed(drift_section)
 
     def parent_id(self, drift_section):
         """
@@ -3823,20 +4005,16 @@ class DriftComparison(Widget):
             Return:
                 int: id numder
         """
-        elements = self.browser.elements("{}/following-sibling::tr".format(
-            self.SECTION.format(quote(drift_section))), parent=self)
-        return self.browser.get_attribute("data-parent", elements[0])
+        return self.snapshot().parent_id(drift_section)
 
     def section_attributes(self, drift_section):
-        """ Children elements under section
+        """ Attributes under section
             Args:
                 drift_section: name for section(Can be partial text)
             Return:
-                list: attributes elements
+                list: attribute names
         """
-        att_id = self.parent_id(drift_section)
-        return [child for child in self.browser.elements(self.INDENT.format(
-            id=quote(att_id)), parent=self)]
+        return self.snapshot().section_attributes(drift_section)
 
     def check_section_attribute_availability(self, drift_section):
         """Check if at least one attribute is available in the DOM
@@ -3847,17 +4025,19 @@ class DriftComparison(Widget):
                 bool: True if available, otherwise False
         """
         try:
-            self.section_attributes(drift_section)
-            return True
-        except AttributeError:
+            return bool(self.section_attributes(drift_section))
+        except NoSuchElementException:
             return False
 
     @property
     def section_values(self):
-        return {section.text: self.is_changed(section.text) for section in self.available_sections}
+        return self.snapshot().section_values
 
     def read(self):
-        return self.section_values
+        """ Return:
+                dict: section name -> ``{'changed': bool, 'attributes': {name: changed}}``
+        """
+        return self.snapshot().read()
 
 
 class FakeWidget(Widget):